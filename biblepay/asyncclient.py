@@ -0,0 +1,202 @@
+import json
+import time
+import base64
+import socket
+import http.client
+import asyncio
+import decimal
+from django.conf import settings
+from bitcoinrpc.authproxy import JSONRPCException, EncodeDecimal
+from biblepay.clients import BiblePayRpcClient
+from biblepay.nodes import ROLE_READ, NoNodeAvailable, is_node_error, get_node_pool, get_nodes_settings
+
+# An asyncio version of the read calls of the BiblePayRpcClient, for the validator
+# service (see purepool.models.solution.validator). Hundreds of calls can wait for
+# biblepayd at the same time, without a thread for every call.
+#
+# The http requests are written directly on asyncio streams, as biblepayd only needs
+# a simple POST with keep-alive. Everything else is done by the NodePool of the process
+# (see biblepay.nodes), like for the BiblePayRpcClient: the choice of the node, the
+# nodes that do not answer or lag behind, the timeouts and the circuit breaker.
+# Every node gets at most POOL_VALIDATOR_RPC_CONNECTIONS connections at once.
+
+class HttpError(http.client.HTTPException):
+    pass
+
+class AsyncRpcConnections(object):
+    """ the connections to one biblepayd """
+
+    def __init__(self, host, port, user, password, max_connections, max_idle):
+        self.host = host
+        self.port = port
+        self.auth_header = 'Basic ' + base64.b64encode(('%s:%s' % (user, password)).encode('utf8')).decode('ascii')
+        self.max_idle = max_idle
+
+        self.semaphore = asyncio.Semaphore(max_connections)
+        self.idle = [] # (reader, writer, released_at), the newest last
+
+    def get_connection(self):
+        """ an idle connection as (reader, writer), or None """
+
+        now = time.monotonic()
+        while self.idle:
+            reader, writer, released_at = self.idle.pop()
+            if now - released_at < self.max_idle and not reader.at_eof():
+                return reader, writer
+            writer.close()
+
+        return None
+
+    async def call(self, method, params, timeout):
+        try:
+            async with self.semaphore:
+                return await asyncio.wait_for(self.request(method, params), timeout)
+        except asyncio.TimeoutError:
+            # the errors of the http.client connections, so is_node_error knows them
+            raise socket.timeout('timed out')
+        except asyncio.IncompleteReadError:
+            raise ConnectionResetError('connection closed by biblepayd')
+
+    async def request(self, method, params):
+        body = json.dumps({
+            'version': '1.1',
+            'method': method,
+            'params': params,
+            'id': 1,
+        }, default=EncodeDecimal).encode('utf8')
+
+        connection = self.get_connection()
+        if connection is not None:
+            try:
+                return await self.send(connection, body)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                # closed by biblepayd while idle, so it is tried again with a new one
+                pass
+
+        connection = await asyncio.open_connection(self.host, self.port)
+        return await self.send(connection, body)
+
+    async def send(self, connection, body):
+        reader, writer = connection
+
+        try:
+            writer.write((
+                'POST / HTTP/1.1\r\n'
+                'Host: %s\r\n'
+                'Authorization: %s\r\n'
+                'Content-Type: application/json\r\n'
+                'Content-Length: %s\r\n'
+                '\r\n' % (self.host, self.auth_header, len(body))
+            ).encode('ascii') + body)
+            await writer.drain()
+
+            status = (await reader.readuntil(b'\r\n')).split(None, 2)
+            headers = {}
+            while True:
+                line = await reader.readuntil(b'\r\n')
+                if line == b'\r\n':
+                    break
+                name, value = line.decode('latin-1').split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+
+            if not 'content-length' in headers:
+                raise HttpError('Answer without Content-Length')
+
+            data = await reader.readexactly(int(headers['content-length']))
+        except BaseException:
+            writer.close()
+            raise
+
+        if headers.get('connection', '').lower() == 'close':
+            writer.close()
+        else:
+            self.idle.append((reader, writer, time.monotonic()))
+
+        # biblepayd answers errors with status 500, but with the error in the json
+        try:
+            response = json.loads(data.decode('utf8'), parse_float=decimal.Decimal)
+        except ValueError:
+            raise HttpError('No json answer, status %s' % status[1:2])
+
+        if response.get('error', None) is not None:
+            raise JSONRPCException(response['error'])
+
+        return response['result']
+
+    def close(self):
+        for reader, writer, released_at in self.idle:
+            writer.close()
+        self.idle = []
+
+class AsyncBiblePayRpcClient(object):
+    """ the read calls of the BiblePayRpcClient, as coroutines. The client keeps its
+        connections, so it should be used for the whole life of the event loop """
+
+    def __init__(self, network):
+        self.node_pool = get_node_pool(network)
+        self.nodes = self.node_pool.get_nodes(ROLE_READ)
+
+        self.connections = {}
+        for node, conn in zip(self.node_pool.nodes, get_nodes_settings(network)):
+            if node in self.nodes:
+                self.connections[node] = AsyncRpcConnections(
+                    conn['IP'], conn['PORT'], conn['USER'], conn['PASSWORD'],
+                    settings.POOL_VALIDATOR_RPC_CONNECTIONS, settings.POOL_RPC_IDLE_SECONDS,
+                )
+
+    async def call(self, method, *params):
+        """ NodePool.send for the read calls, without the threads """
+
+        self.node_pool.check_breaker()
+
+        try:
+            result = await self.call_nodes(method, list(params))
+        except Exception as e:
+            self.node_pool.record_result(e)
+            raise
+
+        self.node_pool.record_result()
+
+        return result
+
+    async def call_nodes(self, method, params):
+        """ NodePool.send_to_nodes. The read calls can always be sent to the next node """
+
+        self.node_pool.start_height_check()
+
+        if not self.nodes:
+            raise NoNodeAvailable(ROLE_READ)
+
+        timeout = self.node_pool.get_timeout(method, params) or settings.POOL_RPC_TIMEOUT
+
+        tried = []
+        while True:
+            node = self.node_pool.choose(self.nodes, tried)
+            if node is None:
+                raise last_error
+
+            try:
+                return await self.connections[node].call(method, params, timeout)
+            except Exception as e:
+                if not is_node_error(e):
+                    raise
+
+                self.node_pool.mark_failed(node)
+                tried.append(node)
+                last_error = e
+            finally:
+                self.node_pool.release(node)
+
+    async def bible_hash(self, block_hash, block_time, prev_block_time, prev_height, nonce):
+        data = await self.call('exec', 'biblehash', block_hash, block_time, prev_block_time, prev_height, nonce)
+        return BiblePayRpcClient.check_bible_hash(data)
+
+    async def hexblocktocoinbase(self, block_hex, transaction_hex):
+        return await self.call('exec', 'hexblocktocoinbase', block_hex, transaction_hex)
+
+    async def pinfo(self):
+        return await self.call('exec', 'pinfo')
+
+    def close(self):
+        for connections in self.connections.values():
+            connections.close()
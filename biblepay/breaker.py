@@ -0,0 +1,80 @@
+import time
+import threading
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+class CircuitBreaker(object):
+    """ Stops the calls to biblepayd after failure_threshold failed calls in a row.
+        While open, calls fail at once. After reset_seconds, one call is let through
+        (half open): if it works, the breaker is closed again, if not, it stays open
+        for another reset_seconds.
+
+        on_change(state) is called with every change of the state. Thread safe """
+
+    def __init__(self, failure_threshold, reset_seconds, on_change=None):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.on_change = on_change
+
+        self.lock = threading.Lock()
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = None
+
+    def set_state(self, state):
+        """ must be called with the lock. Returns the new state if it changed """
+
+        if state == self.state:
+            return None
+
+        self.state = state
+        if state == STATE_OPEN:
+            self.opened_at = time.monotonic()
+
+        return state
+
+    def changed(self, state):
+        if state is not None and self.on_change is not None:
+            self.on_change(state)
+
+    def is_open(self):
+        """ True if calls would fail at once. Changes nothing """
+
+        return self.state != STATE_CLOSED and time.monotonic() - self.opened_at < self.reset_seconds
+
+    def allow(self):
+        """ True if the call can be done """
+
+        with self.lock:
+            if self.state == STATE_CLOSED:
+                return True
+
+            if time.monotonic() - self.opened_at < self.reset_seconds:
+                return False
+
+            # the trial call. The next one has to wait for its result
+            self.opened_at = time.monotonic()
+            state = self.set_state(STATE_HALF_OPEN)
+
+        self.changed(state)
+        return True
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            state = self.set_state(STATE_CLOSED)
+
+        self.changed(state)
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+
+            state = None
+            if self.state == STATE_HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                state = self.set_state(STATE_OPEN)
+
+        self.changed(state)
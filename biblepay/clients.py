@@ -1,14 +1,15 @@
 import json
 from bitcoinrpc.authproxy import AuthServiceProxy
 from django.conf import settings
+from biblepay.nodes import NodeServiceProxy, get_node_pool
 
 def biblepay_client_factory(network):
-    """ creates and returns the biblepay client for rpc commands """
+    """ creates and returns the biblepay client for rpc commands.
+        The clients are spread over the biblepayds of the network, every client stays
+        with one of them (see biblepay.nodes). The connections are kept open and
+        shared by all clients of the process """
     
-    conn = settings.BIBLEPAY_RPC[network]
-    
-    url = "http://%s:%s@%s:%s" % (conn['USER'], conn['PASSWORD'], conn['IP'], conn['PORT'])    
-    return AuthServiceProxy(url)
+    return NodeServiceProxy(get_node_pool(network))
 
 class BlockNotFound(Exception):
     pass
@@ -47,9 +48,8 @@ class BiblePayRpcClient(object):
 
         return self.rpc.exec('pinfo')
 
-    def subsidy(self, height):
-        data = self.rpc.exec("subsidy", str(height))
-
+    @staticmethod
+    def check_subsidy(data):
         if data.get('error', None) == 'block not found':
             raise BlockNotFound()
 
@@ -57,6 +57,9 @@ class BiblePayRpcClient(object):
             raise UnknownServerMessage()
 
         return data
+
+    def subsidy(self, height):
+        return self.check_subsidy(self.rpc.exec("subsidy", str(height)))
     
     def bible_hash(self, block_hash, block_time, prev_block_time, prev_height, nonce):
         """ calculates the biblehash via the biblepay client, as this is a little bit tricks
@@ -66,7 +69,10 @@ class BiblePayRpcClient(object):
             """
             
         data = self.rpc.exec("biblehash", block_hash, block_time, prev_block_time, prev_height, nonce)
-        
+        return self.check_bible_hash(data)
+
+    @staticmethod
+    def check_bible_hash(data):
         bible_hash = None
         try:
             bible_hash = data['BibleHash']
@@ -74,6 +80,54 @@ class BiblePayRpcClient(object):
             raise UnknownServerMessage()
         
         return bible_hash
+
+    def batch(self, calls, check=None):
+        """ sends all calls (a list of (method, args)) with one request to biblepayd.
+            Returns the results in the order of the calls. A failed call has the
+            exception as result, so one bad item does not fail the others """
+
+        results = []
+        for result in self.rpc.batch(calls):
+            if check is not None and not isinstance(result, Exception):
+                try:
+                    result = check(result)
+                except Exception as e:
+                    result = e
+            results.append(result)
+
+        return results
+
+    def bible_hash_many(self, items):
+        """ the bible_hash for every (block_hash, block_time, prev_block_time, prev_height, nonce) of items """
+
+        return self.batch([('exec', ('biblehash',) + tuple(item)) for item in items], self.check_bible_hash)
+
+    def hexblocktocoinbase_many(self, items):
+        """ the hexblocktocoinbase for every (block_hex, transaction_hex) of items """
+
+        return self.batch([('exec', ('hexblocktocoinbase',) + tuple(item)) for item in items])
+
+    def subsidy_range(self, start, end):
+        """ the subsidy of the blocks start to end (including end), as dict height -> subsidy.
+            Blocks not yet in the chain have a BlockNotFound as result """
+
+        heights = list(range(start, end + 1))
+        results = self.batch([('exec', ('subsidy', str(height))) for height in heights], self.check_subsidy)
+
+        return dict(zip(heights, results))
+
+    def getblocks(self, heights):
+        """ the getblock data of the heights, as dict height -> block. Needs two requests,
+            as the block hashes are needed first """
+
+        heights = list(heights)
+        block_hashes = self.batch([('getblockhash', (height,)) for height in heights])
+
+        # a failed getblockhash is the result for its height
+        found = [(height, block_hash) for height, block_hash in zip(heights, block_hashes) if not isinstance(block_hash, Exception)]
+        blocks = dict(zip([height for height, block_hash in found], self.batch([('getblock', (block_hash,)) for height, block_hash in found])))
+
+        return dict((height, blocks.get(height, block_hash)) for height, block_hash in zip(heights, block_hashes))
     
     def decoderawtransaction(self, txhex):
         return self.rpc.decoderawtransaction(txhex)
@@ -0,0 +1,94 @@
+import io
+import struct
+from bitcoin.base58 import CBase58Data
+from bitcoin.core.serialize import VarIntSerializer, BytesSerializer, SerializationError, ser_read
+
+# Reads the recipient of a coinbase transaction without asking biblepayd
+# (the "recipient" of the hexblocktocoinbase rpc call).
+#
+# BiblePay transactions are bitcoin transactions, but every output has a
+# message (sTxOutMessage) after its script, so the CTransaction of
+# python-bitcoinlib can not read them. Only the parts we need are read here.
+
+# the version bytes of the addresses: (pay to pubkey hash, pay to script hash)
+ADDRESS_VERSIONS = {
+    'main': (25, 16),
+    'test': (140, 19),
+}
+
+NULL_PREVOUT = b'\x00' * 32 + b'\xff\xff\xff\xff'
+
+# the header of a block, before the transactions
+BLOCK_HEADER_SIZE = 80
+
+class CoinbaseInvalid(Exception):
+    pass
+
+def read_coinbase_outputs(transaction_hex):
+    """ returns the outputs of the coinbase transaction as list of (value, script) """
+
+    try:
+        f = io.BytesIO(bytes.fromhex(transaction_hex))
+
+        ser_read(f, 4) # version
+
+        # a coinbase transaction has exactly one input, without a previous output
+        if VarIntSerializer.stream_deserialize(f) != 1:
+            raise CoinbaseInvalid('Not a coinbase transaction')
+
+        if ser_read(f, 36) != NULL_PREVOUT:
+            raise CoinbaseInvalid('Not a coinbase transaction')
+
+        BytesSerializer.stream_deserialize(f) # the coinbase script
+        ser_read(f, 4) # sequence
+
+        outputs = []
+        for i in range(0, VarIntSerializer.stream_deserialize(f)):
+            value = struct.unpack('<q', ser_read(f, 8))[0]
+            script = BytesSerializer.stream_deserialize(f)
+            BytesSerializer.stream_deserialize(f) # the message of the output
+
+            outputs.append((value, script))
+
+        ser_read(f, 4) # lock time
+    except (ValueError, TypeError, struct.error, SerializationError) as e:
+        raise CoinbaseInvalid(str(e))
+
+    return outputs
+
+def script_to_address(script, network):
+    """ the address of a pay to pubkey hash or pay to script hash output, or None """
+
+    pubkey_version, script_version = ADDRESS_VERSIONS[network]
+
+    # OP_DUP OP_HASH160 <20 bytes> OP_EQUALVERIFY OP_CHECKSIG
+    if len(script) == 25 and script[:3] == b'\x76\xa9\x14' and script[23:] == b'\x88\xac':
+        return str(CBase58Data.from_bytes(script[3:23], pubkey_version))
+
+    # OP_HASH160 <20 bytes> OP_EQUAL
+    if len(script) == 23 and script[:2] == b'\xa9\x14' and script[22:] == b'\x87':
+        return str(CBase58Data.from_bytes(script[2:22], script_version))
+
+    return None
+
+def get_coinbase_recipient(transaction_hex, network):
+    """ the address the block reward (the first output) is paid to """
+
+    outputs = read_coinbase_outputs(transaction_hex)
+    if not outputs:
+        raise CoinbaseInvalid('No outputs')
+
+    return script_to_address(outputs[0][1], network)
+
+def is_block_coinbase(block_hex, transaction_hex):
+    """ True if the transaction is the first one of the block """
+
+    # the number of transactions, a var int of at most 9 bytes
+    try:
+        f = io.BytesIO(bytes.fromhex(block_hex[BLOCK_HEADER_SIZE * 2:BLOCK_HEADER_SIZE * 2 + 18]))
+        VarIntSerializer.stream_deserialize(f)
+    except (ValueError, TypeError, SerializationError):
+        return False
+
+    start = BLOCK_HEADER_SIZE * 2 + f.tell() * 2
+    return block_hex[start:start + len(transaction_hex)].lower() == transaction_hex.lower()
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import base64
+import decimal
+import threading
+import functools
+import http.client
+import urllib.parse
+from bitcoinrpc.authproxy import AuthServiceProxy, JSONRPCException, EncodeDecimal, HTTP_TIMEOUT, USER_AGENT
+
+# Keep-alive connections to biblepayd, shared by all BiblePayRpcClients of a process.
+# Every client used to open its own http connection (and with it a new tcp connection)
+# for the two or three calls it makes. Now the connections are taken from a pool
+# per biblepayd url and given back after every call.
+
+# rpc methods that are never send a second time on a broken connection, as they
+# might already be done by biblepayd (we do not want to pay twice)
+NOT_RETRYABLE_METHODS = ('sendtoaddress', 'sendmany', 'sendfrom')
+
+# errors of a connection that was closed by biblepayd (idle timeout, restart).
+# The request is send again with a new connection
+CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.ResponseNotReady,
+    http.client.BadStatusLine,
+    ConnectionError,
+)
+
+class RpcConnectionPool(object):
+    """ A thread safe pool of http connections to one biblepayd.
+        At most max_size idle connections are kept. Connections idle for more then
+        max_idle seconds are closed instead of used, as biblepayd closes them on
+        its side after a while """
+
+    def __init__(self, url, max_size, max_idle, timeout=HTTP_TIMEOUT):
+        self.url = url
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.timeout = timeout
+
+        parsed_url = urllib.parse.urlparse(url)
+        self.host = parsed_url.hostname
+        self.port = parsed_url.port or 80
+        self.https = parsed_url.scheme == 'https'
+        self.path = parsed_url.path or '/'
+        self.auth_header = b'Basic ' + base64.b64encode(('%s:%s' % (parsed_url.username, parsed_url.password)).encode('utf8'))
+
+        self.lock = threading.Lock()
+        self.idle = [] # (connection, released_at), the newest last
+        self.pid = os.getpid()
+
+    def create_connection(self):
+        if self.https:
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def acquire(self):
+        """ returns (connection, reused) """
+
+        now = time.monotonic()
+
+        with self.lock:
+            # a forked process (celery worker) must not use the sockets of its parent
+            if self.pid != os.getpid():
+                self.idle = []
+                self.pid = os.getpid()
+
+            stale = [c for c, released_at in self.idle if now - released_at >= self.max_idle]
+            self.idle = [(c, released_at) for c, released_at in self.idle if now - released_at < self.max_idle]
+
+            connection = None
+            if self.idle:
+                connection = self.idle.pop()[0]
+
+        for stale_connection in stale:
+            stale_connection.close()
+
+        if connection is None:
+            return self.create_connection(), False
+
+        return connection, True
+
+    def release(self, connection):
+        """ gives a healthy connection back """
+
+        with self.lock:
+            if self.pid == os.getpid() and len(self.idle) < self.max_size:
+                self.idle.append((connection, time.monotonic()))
+                return
+
+        connection.close()
+
+    def close(self):
+        with self.lock:
+            idle = self.idle
+            self.idle = []
+
+        for connection, released_at in idle:
+            connection.close()
+
+    def set_timeout(self, connection, timeout):
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+
+    def request(self, connection, send):
+        """ send(connection) with the connection. The connection is given back
+            to the pool, or closed if it is not usable anymore """
+
+        try:
+            result = send(connection)
+        except JSONRPCException as e:
+            # an error answer of biblepayd is read completely, so the connection
+            # can be used again. A -342 is not a clean answer
+            if e.code == -342:
+                connection.close()
+            else:
+                self.release(connection)
+            raise
+        except:
+            connection.close()
+            raise
+
+        self.release(connection)
+        return result
+
+    def send(self, send, retryable):
+        connection, reused = self.acquire()
+
+        try:
+            return self.request(connection, send)
+        except CONNECTION_ERRORS:
+            # the idle connection was closed by biblepayd (or biblepayd was restarted).
+            # We try again once, with a new connection
+            if not reused or not retryable:
+                raise
+
+        return self.request(self.create_connection(), send)
+
+    def call(self, method, *args, timeout=None):
+        """ timeout replaces the timeout of the pool for this call """
+
+        timeout = timeout or self.timeout
+
+        def send(connection):
+            self.set_timeout(connection, timeout)
+            return AuthServiceProxy(self.url, method, timeout, connection)(*args)
+
+        return self.send(send, not method in NOT_RETRYABLE_METHODS)
+
+    def send_batch(self, connection, calls):
+        """ sends the calls as one JSON-RPC batch. The AuthServiceProxy has a batch_ too,
+            but stops with the first error """
+
+        batch = [{'version': '1.1', 'method': method, 'params': list(args), 'id': i} for i, (method, args) in enumerate(calls)]
+        connection.request('POST', self.path, json.dumps(batch, default=EncodeDecimal), {
+            'Host': self.host,
+            'User-Agent': USER_AGENT,
+            'Authorization': self.auth_header,
+            'Content-type': 'application/json',
+        })
+
+        response = connection.getresponse()
+        if response.getheader('Content-Type') != 'application/json':
+            response.read()
+            raise JSONRPCException({'code': -342, 'message': 'non-JSON HTTP response with \'%i %s\' from server' % (response.status, response.reason)})
+
+        answers = json.loads(response.read().decode('utf8'), parse_float=decimal.Decimal)
+        if not isinstance(answers, list):
+            # biblepayd rejected the batch as a whole
+            raise JSONRPCException(answers.get('error') or {'code': -343, 'message': 'missing JSON-RPC result'})
+
+        # the answers are not always in the order of the calls
+        results = [JSONRPCException({'code': -343, 'message': 'missing JSON-RPC result'}) for call in calls]
+        for answer in answers:
+            if not answer.get('id') in range(0, len(calls)):
+                continue
+
+            if answer.get('error') is not None:
+                results[answer['id']] = JSONRPCException(answer['error'])
+            elif 'result' in answer:
+                results[answer['id']] = answer['result']
+
+        return results
+
+    def batch(self, calls, timeout=None):
+        """ calls is a list of (method, args). Sends all of them with one http request and
+            returns the results in the same order. A failed call has a JSONRPCException
+            as result instead of raising it """
+
+        if not calls:
+            return []
+
+        timeout = timeout or self.timeout
+
+        def send(connection):
+            self.set_timeout(connection, timeout)
+            return self.send_batch(connection, calls)
+
+        retryable = not any(method in NOT_RETRYABLE_METHODS for method, args in calls)
+        return self.send(send, retryable)
+
+class PooledServiceProxy(object):
+    """ used like the AuthServiceProxy ("proxy.getblockhash(1)"), but every call
+        takes a connection from the pool """
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def __getattr__(self, name):
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+
+        return functools.partial(self.pool.call, name)
+
+    def batch(self, calls):
+        """ see RpcConnectionPool.batch """
+
+        return self.pool.batch(calls)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def get_connection_pool(url, max_size, max_idle, timeout=HTTP_TIMEOUT):
+    """ the pool of this process for the url """
+
+    with _pools_lock:
+        if not url in _pools:
+            _pools[url] = RpcConnectionPool(url, max_size, max_idle, timeout)
+
+        return _pools[url]
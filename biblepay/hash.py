@@ -1,11 +1,20 @@
 
+import functools
+
+@functools.lru_cache(maxsize=1024)
+def get_target_int(target):
+    """ the hash target as integer. There are only a few different targets,
+        so they are only converted once """
+
+    return int(target, 16)
+
 def check_hashtarget(bible_hash, target):
     """ tests if the biblepay hash is valid for the hashtarget, means that is it lower.
         True = is lower and all is fine """
 
     rs = False
     try:
-        rs = int(bible_hash, 16) < int(target, 16)
+        rs = int(bible_hash, 16) < get_target_int(target)
     except:
         pass
 
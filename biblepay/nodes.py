@@ -0,0 +1,370 @@
+import json
+import time
+import threading
+import functools
+import http.client
+from django.conf import settings
+from django.core.cache import cache
+from bitcoinrpc.authproxy import JSONRPCException
+from biblepay.connections import get_connection_pool, NOT_RETRYABLE_METHODS
+from biblepay.breaker import CircuitBreaker
+
+# More then one biblepayd per network. BIBLEPAY_RPC[network] can be a list of nodes,
+# each with a ROLE: "read" nodes are used for the validation (biblehash, hexblocktocoinbase,
+# pinfo, ...), "wallet" nodes for the payments. A node without a ROLE is used for both.
+#
+# Every call goes to the healthy node with the fewest running requests. A node that does
+# not answer is not used for POOL_RPC_NODE_RETRY_SECONDS seconds and the call is sent to
+# the next one. A read node that is more then POOL_RPC_NODE_MAX_LAG blocks behind the
+# others (by pinfo, checked every POOL_RPC_NODE_CHECK_SECONDS) is not used until it
+# has catched up.
+#
+# A client (see NodeServiceProxy) stays with the node of its first call, so calls that
+# depend on each other (getblockhash and getblock, the chain tip) see the same chain.
+# It only moves to another node if its node does not answer.
+#
+# The read calls are protected, as the validation of the solutions must not wait for a
+# hanging biblepayd: every method has its own timeout (POOL_RPC_TIMEOUTS), at most
+# POOL_RPC_MAX_CONCURRENT calls run at once in a process, and after POOL_RPC_BREAKER_FAILURES
+# failed calls in a row, all calls fail at once for POOL_RPC_BREAKER_RESET_SECONDS
+# (the circuit breaker is open).
+
+ROLE_READ = 'read'
+ROLE_WALLET = 'wallet'
+
+# the methods that need the wallet
+WALLET_METHODS = ('sendtoaddress', 'sendmany', 'sendfrom', 'getwalletinfo', 'getbalance', 'listtransactions')
+
+# biblepayd answers, but is not ready: loading the block index (-28), or no json at all (-342)
+NODE_NOT_READY_CODES = (-28, -342)
+
+class NoNodeAvailable(Exception):
+    pass
+
+class RpcUnavailable(Exception):
+    pass
+
+class CircuitOpen(RpcUnavailable):
+    pass
+
+class TooManyCalls(RpcUnavailable):
+    pass
+
+def is_node_error(e):
+    """ True if the node is broken, not the call """
+
+    if isinstance(e, JSONRPCException):
+        return e.code in NODE_NOT_READY_CODES
+
+    return isinstance(e, (http.client.HTTPException, OSError))
+
+def is_unavailable(e):
+    """ True if the call failed as biblepayd could not answer it, so
+        it is not the fault of the call (or of the miner) """
+
+    return isinstance(e, (RpcUnavailable, NoNodeAvailable)) or is_node_error(e)
+
+class Node(object):
+
+    def __init__(self, name, pool, roles):
+        self.name = name
+        self.pool = pool
+        self.roles = roles
+
+        self.outstanding = 0
+        self.height = None
+        self.failed_until = 0
+        self.lagging = False
+
+    def is_healthy(self, now):
+        return self.failed_until <= now and not self.lagging
+
+class NodePool(object):
+    """ The biblepayds of a network. Thread safe """
+
+    def __init__(self, nodes, check_interval, max_lag, retry_seconds, breaker=None, max_concurrent=None, queue_seconds=None, timeouts=None):
+        self.nodes = nodes
+        self.check_interval = check_interval
+        self.max_lag = max_lag
+        self.retry_seconds = retry_seconds
+
+        self.breaker = breaker
+        self.semaphore = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+        self.queue_seconds = queue_seconds
+        self.timeouts = timeouts or {}
+
+        self.lock = threading.Lock()
+        self.turn = 0
+        self.checked_at = None
+        self.checking = False
+
+    def get_nodes(self, role):
+        nodes = [node for node in self.nodes if role in node.roles]
+
+        # without read nodes, the wallet nodes have to do the reads
+        if not nodes and role == ROLE_READ:
+            return self.nodes
+
+        return nodes
+
+    def choose(self, nodes, tried, pinned=None):
+        """ the healthy node with the least outstanding requests. If no node is healthy,
+            we try the broken ones instead of giving up. The pinned node is used as
+            long as it answers, even if it is lagging """
+
+        with self.lock:
+            now = time.monotonic()
+
+            if pinned is not None and pinned in nodes and not pinned in tried and pinned.failed_until <= now:
+                pinned.outstanding += 1
+                return pinned
+
+            candidates = [node for node in nodes if not node in tried]
+            candidates = [node for node in candidates if node.is_healthy(now)] or candidates
+            if not candidates:
+                return None
+
+            # the nodes are rotated, so idle nodes get the same amount of calls
+            self.turn += 1
+            start = self.turn % len(candidates)
+            node = min(candidates[start:] + candidates[:start], key=lambda n: n.outstanding)
+            node.outstanding += 1
+
+            return node
+
+    def release(self, node):
+        """ the call of choose() is done """
+
+        with self.lock:
+            node.outstanding -= 1
+
+    def mark_failed(self, node):
+        with self.lock:
+            node.failed_until = time.monotonic() + self.retry_seconds
+
+    def check_breaker(self):
+        if self.breaker is not None and not self.breaker.allow():
+            raise CircuitOpen()
+
+    def record_result(self, error=None):
+        """ tells the breaker how the call went. Only the errors of the nodes count """
+
+        if self.breaker is None:
+            return
+
+        if error is not None and is_node_error(error):
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+
+    def get_timeout(self, method, args):
+        """ the timeout of the method, or of the command for "exec" calls. None is
+            the default timeout """
+
+        if method == 'exec' and args:
+            method = args[0]
+
+        return self.timeouts.get(method, None)
+
+    def send(self, send, role, retryable, pins=None):
+        """ the payments are not stopped by the breaker or the limit of the read calls.
+            pins is a dict role -> node of the client, see send_to_nodes """
+
+        if role != ROLE_READ:
+            return self.send_to_nodes(send, role, retryable, pins)
+
+        self.check_breaker()
+
+        if self.semaphore is not None and not self.semaphore.acquire(timeout=self.queue_seconds):
+            raise TooManyCalls()
+
+        try:
+            result = self.send_to_nodes(send, role, retryable, pins)
+        except Exception as e:
+            self.record_result(e)
+            raise
+        finally:
+            if self.semaphore is not None:
+                self.semaphore.release()
+
+        self.record_result()
+
+        return result
+
+    def send_to_nodes(self, send, role, retryable, pins=None):
+        """ with pins, the call goes to the node of the last call with the role,
+            and the node of this call is stored there """
+
+        self.start_height_check()
+
+        nodes = self.get_nodes(role)
+        if not nodes:
+            raise NoNodeAvailable(role)
+
+        tried = []
+        while True:
+            node = self.choose(nodes, tried, pins.get(role, None) if pins is not None else None)
+            if node is None:
+                raise last_error
+
+            if pins is not None:
+                pins[role] = node
+
+            try:
+                return send(node)
+            except Exception as e:
+                if not is_node_error(e):
+                    raise
+
+                self.mark_failed(node)
+
+                # a payment might be done, even if we got no answer
+                if not retryable:
+                    raise
+
+                tried.append(node)
+                last_error = e
+            finally:
+                self.release(node)
+
+    def call(self, method, *args, pins=None):
+        role = ROLE_WALLET if method in WALLET_METHODS else ROLE_READ
+        timeout = self.get_timeout(method, args)
+
+        return self.send(lambda node: node.pool.call(method, *args, timeout=timeout), role, not method in NOT_RETRYABLE_METHODS, pins)
+
+    def batch(self, calls, pins=None):
+        """ see RpcConnectionPool.batch. The whole batch goes to one node """
+
+        methods = [method for method, args in calls]
+        role = ROLE_WALLET if any(method in WALLET_METHODS for method in methods) else ROLE_READ
+        retryable = not any(method in NOT_RETRYABLE_METHODS for method in methods)
+
+        return self.send(lambda node: node.pool.batch(calls), role, retryable, pins)
+
+    def start_height_check(self):
+        """ starts the check of the heights in the background, if it is time for it """
+
+        if len(self.get_nodes(ROLE_READ)) < 2:
+            return
+
+        with self.lock:
+            if self.checking:
+                return
+            if self.checked_at is not None and time.monotonic() - self.checked_at < self.check_interval:
+                return
+            self.checking = True
+
+        threading.Thread(target=self.check_heights, daemon=True).start()
+
+    def check_heights(self):
+        """ asks every read node for its height and marks the nodes behind the others as lagging """
+
+        nodes = self.get_nodes(ROLE_READ)
+
+        try:
+            for node in nodes:
+                try:
+                    node.height = int(node.pool.call('exec', 'pinfo', timeout=self.get_timeout('exec', ('pinfo',)))['height'])
+                except Exception:
+                    node.height = None
+                    self.mark_failed(node)
+
+            heights = [node.height for node in nodes if node.height is not None]
+            if heights:
+                best_height = max(heights)
+                for node in nodes:
+                    node.lagging = node.height is not None and node.height < best_height - self.max_lag
+        finally:
+            with self.lock:
+                self.checking = False
+                self.checked_at = time.monotonic()
+
+class NodeServiceProxy(object):
+    """ used like the AuthServiceProxy ("proxy.getblockhash(1)"), but the calls
+        go to one of the nodes. All calls of a proxy go to the same node, until
+        it does not answer """
+
+    def __init__(self, node_pool):
+        self.node_pool = node_pool
+        self.pins = {}
+
+    def __getattr__(self, name):
+        if name.startswith('__') and name.endswith('__'):
+            raise AttributeError(name)
+
+        return functools.partial(self.node_pool.call, name, pins=self.pins)
+
+    def batch(self, calls):
+        return self.node_pool.batch(calls, pins=self.pins)
+
+def get_node_roles(conn):
+    role = conn.get('ROLE', None)
+    if role is None:
+        return (ROLE_READ, ROLE_WALLET)
+
+    return (role,)
+
+def get_nodes_settings(network):
+    """ the settings of the nodes of the network, in the order of the NodePool nodes """
+
+    nodes_settings = settings.BIBLEPAY_RPC[network]
+
+    # the old setting, with only one node
+    if isinstance(nodes_settings, dict):
+        nodes_settings = [nodes_settings]
+
+    return nodes_settings
+
+def create_node_pool(network):
+    nodes = []
+    for conn in get_nodes_settings(network):
+        url = "http://%s:%s@%s:%s" % (conn['USER'], conn['PASSWORD'], conn['IP'], conn['PORT'])
+        pool = get_connection_pool(url, settings.POOL_RPC_POOL_SIZE, settings.POOL_RPC_IDLE_SECONDS, settings.POOL_RPC_TIMEOUT)
+        nodes.append(Node('%s:%s' % (conn['IP'], conn['PORT']), pool, get_node_roles(conn)))
+
+    breaker = CircuitBreaker(
+        settings.POOL_RPC_BREAKER_FAILURES,
+        settings.POOL_RPC_BREAKER_RESET_SECONDS,
+        on_change=functools.partial(publish_circuit_state, network),
+    )
+
+    return NodePool(
+        nodes, settings.POOL_RPC_NODE_CHECK_SECONDS, settings.POOL_RPC_NODE_MAX_LAG, settings.POOL_RPC_NODE_RETRY_SECONDS,
+        breaker=breaker,
+        max_concurrent=settings.POOL_RPC_MAX_CONCURRENT,
+        queue_seconds=settings.POOL_RPC_QUEUE_SECONDS,
+        timeouts=settings.POOL_RPC_TIMEOUTS,
+    )
+
+_node_pools = {}
+_node_pools_lock = threading.Lock()
+
+def get_node_pool(network):
+    """ the node pool of this process for the network """
+
+    key = (network, json.dumps(settings.BIBLEPAY_RPC[network], sort_keys=True))
+
+    with _node_pools_lock:
+        if not key in _node_pools:
+            _node_pools[key] = create_node_pool(network)
+
+        return _node_pools[key]
+
+def get_circuit_state_key(network):
+    return 'rpc_circuit__%s' % network
+
+def publish_circuit_state(network, state):
+    """ the breakers of all processes write their changes to the shared cache,
+        so the last change can be seen by the monitoring (see "show_metrics") """
+
+    cache.set(get_circuit_state_key(network), state, None)
+
+def get_circuit_state(network):
+    return cache.get(get_circuit_state_key(network), None)
+
+def is_circuit_open(network):
+    """ True if the calls to the biblepayds of the network fail at once in this process """
+
+    breaker = get_node_pool(network).breaker
+    return breaker is not None and breaker.is_open()
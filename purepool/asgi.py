@@ -0,0 +1,20 @@
+"""
+ASGI config for the purepool interface.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Use it together with the interface settings, so that only the (async) mining
+protocol is served:
+
+    DJANGO_SETTINGS_MODULE=purepool.settings.interface uvicorn purepool.asgi:application
+
+For more information on this file, see
+https://docs.djangoproject.com/en/stable/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "purepool.settings.interface")
+
+application = get_asgi_application()
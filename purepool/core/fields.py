@@ -0,0 +1,151 @@
+import re
+import uuid
+from django.db import models
+
+# Compact storage for the hot identifiers. The bible hashes are 64 hex chars, but
+# only 32 bytes of data, the UUIDs 32 hex chars for 16 bytes. In the database they
+# are stored binary, so the rows and (more important) the unique indexes are about
+# half the size. The python code still sees the hex strings and uuid.UUIDs.
+#
+# A bible hash column must also take values that are not a full hash: the "#1" suffix
+# of multiplied solutions, and whatever a miner sends with a rejected solution.
+# Those are stored as text behind a zero byte, so only a value of exactly
+# HASH_BYTES bytes is read as a hash. See "benchmark_binary_keys" for the numbers.
+
+HASH_BYTES = 32
+HASH_RE = re.compile('[0-9a-f]{%d}' % (HASH_BYTES * 2))
+
+def hex_to_bytes(value):
+    """ the database value of a hex string. Only the lowercase hashes are stored
+        as bytes, as everything else would not come back unchanged """
+
+    if HASH_RE.fullmatch(value):
+        return bytes.fromhex(value)
+
+    data = value.encode('utf8')
+
+    # a text of HASH_BYTES - 1 bytes would look like a hash with its zero byte
+    if len(data) == HASH_BYTES - 1:
+        return b'\x00\x00' + data
+
+    return b'\x00' + data
+
+def bytes_to_hex(data):
+    if len(data) == HASH_BYTES:
+        return data.hex()
+
+    if len(data) == HASH_BYTES + 1 and data.startswith(b'\x00\x00'):
+        return data[2:].decode('utf8')
+
+    return data[1:].decode('utf8')
+
+class HexBinaryField(models.CharField):
+    """ a hex string in python, binary in the database (varbinary on MySQL).
+        max_length is the length of the hex string. Only exact lookups work,
+        there is no "startswith" or "contains" on the binary value """
+
+    def get_internal_type(self):
+        return 'HexBinaryField'
+
+    def db_type(self, connection):
+        if connection.vendor == 'mysql':
+            # the zero byte of the text values, and one for the short ones
+            return 'varbinary(%d)' % (self.max_length + 2)
+        if connection.vendor == 'postgresql':
+            return 'bytea'
+        return 'blob'
+
+    def get_placeholder(self, value, compiler, connection):
+        return connection.ops.binary_placeholder_sql(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if not prepared:
+            value = self.get_prep_value(value)
+        if value is None:
+            return None
+        return connection.Database.Binary(hex_to_bytes(value))
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, str):
+            return value
+        return bytes_to_hex(bytes(value))
+
+class BinaryUUIDField(models.UUIDField):
+    """ a UUIDField that is stored as binary(16) on MySQL, instead of char(32).
+        The other databases are unchanged (postgres has its own uuid type).
+        A foreign key to the field gets the same column type """
+
+    def get_internal_type(self):
+        # the converters of MySQL would read the bytes as a hex string
+        return 'BinaryUUIDField'
+
+    def db_type(self, connection):
+        if connection.vendor == 'mysql':
+            return 'binary(16)'
+        return connection.data_types['UUIDField']
+
+    def rel_db_type(self, connection):
+        return self.db_type(connection)
+
+    def get_placeholder(self, value, compiler, connection):
+        if connection.vendor == 'mysql':
+            return connection.ops.binary_placeholder_sql(value)
+        return '%s'
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        if connection.vendor != 'mysql':
+            return super().get_db_prep_value(value, connection, prepared)
+
+        if value is None:
+            return None
+        if not isinstance(value, uuid.UUID):
+            value = self.to_python(value)
+        return connection.Database.Binary(value.bytes)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None or isinstance(value, uuid.UUID):
+            return value
+        if isinstance(value, (bytes, memoryview)):
+            return uuid.UUID(bytes=bytes(value))
+        return uuid.UUID(value)
+
+def get_binary_uuid_sql(cursor, columns, to_binary=True):
+    """ the MySQL statements that convert UUIDField columns (char(32)) to BinaryUUIDField
+        (binary(16)), or back. columns is a list of (table, column, null), the primary
+        key and all columns that reference it. Their foreign keys are dropped for the
+        change and added again. The tables are copied by MySQL, so this takes long
+        on big tables, see "benchmark_binary_keys" """
+
+    tables = sorted(set(table for table, column, null in columns))
+    converted = set((table, column) for table, column, null in columns)
+
+    cursor.execute(
+        'SELECT TABLE_NAME, CONSTRAINT_NAME, COLUMN_NAME, REFERENCED_TABLE_NAME, REFERENCED_COLUMN_NAME '
+        'FROM information_schema.KEY_COLUMN_USAGE '
+        'WHERE TABLE_SCHEMA = DATABASE() AND REFERENCED_TABLE_NAME IN %s',
+        [tuple(tables)],
+    )
+    foreign_keys = [row for row in sorted(cursor.fetchall()) if (row[0], row[2]) in converted]
+
+    statements = []
+    for table, name, column, referenced_table, referenced_column in foreign_keys:
+        statements.append('ALTER TABLE %s DROP FOREIGN KEY %s' % (table, name))
+
+    # the values can only be changed in a column that takes both
+    if to_binary:
+        steps = [('varbinary(32)', 'UNHEX(%s)'), ('binary(16)', None)]
+    else:
+        steps = [('varbinary(32)', 'LOWER(HEX(%s))'), ('char(32)', None)]
+
+    for table in tables:
+        table_columns = [(column, null) for t, column, null in columns if t == table]
+
+        for column_type, convert in steps:
+            statements.append('ALTER TABLE %s %s' % (table, ', '.join(['MODIFY %s %s %s' % (column, column_type, 'NULL' if null else 'NOT NULL') for column, null in table_columns])))
+            if convert is not None:
+                statements.append('UPDATE %s SET %s' % (table, ', '.join(['%s = %s' % (column, convert % column) for column, null in table_columns])))
+
+    for table, name, column, referenced_table, referenced_column in foreign_keys:
+        statements.append('ALTER TABLE %s ADD CONSTRAINT %s FOREIGN KEY (%s) REFERENCES %s (%s)' % (table, name, column, referenced_table, referenced_column))
+
+    return statements
@@ -0,0 +1,147 @@
+import time
+import threading
+from collections import OrderedDict
+from django.core.cache import cache
+
+class LRUCache(object):
+    """ A small in-process cache that forgets the least recently used entries
+        when more then max_size entries are stored. With a timeout, the entries
+        are also forgotten after timeout seconds. Thread safe """
+
+    def __init__(self, max_size, timeout=None):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                self.entries.move_to_end(key)
+            except KeyError:
+                return default
+
+            value, expires_at = self.entries[key]
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return default
+
+            return value
+
+    def set(self, key, value):
+        expires_at = time.monotonic() + self.timeout if self.timeout is not None else None
+
+        with self.lock:
+            self.entries[key] = (value, expires_at)
+            self.entries.move_to_end(key)
+
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def set_many(self, data):
+        for key, value in data.items():
+            self.set(key, value)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __len__(self):
+        return len(self.entries)
+
+class VersionedLRUCache(LRUCache):
+    """ An LRUCache in front of the shared (django) cache. Every process has its own
+        copy, so changes are announced by changing the version in the shared cache
+        (see invalidate). The keys removed with every version are kept in the shared
+        cache for a while, so the other processes remove only these keys from their
+        copy. A process that missed them clears its whole copy. The version is checked
+        at most every check_interval seconds """
+
+    # a process that is more versions behind clears its copy
+    MAX_CHANGES = 100
+    CHANGES_TIMEOUT = 60 * 60
+
+    def __init__(self, max_size, version_key, check_interval, timeout=None):
+        super().__init__(max_size, timeout)
+        self.version_key = version_key
+        self.check_interval = check_interval
+
+        self.version = None
+        self.checked_at = None
+
+    def needs_check(self):
+        return self.checked_at is None or time.monotonic() - self.checked_at >= self.check_interval
+
+    def get_changes_key(self, version):
+        return '%s__%s' % (self.version_key, version)
+
+    def get_changes_keys(self, version):
+        """ the keys of the changes from our version to version, or None if we are too
+            far behind (or one of the versions is unknown) """
+
+        # without a version in the shared cache, nothing was changed yet
+        known_version = 0 if self.version is None else self.version
+
+        if not isinstance(known_version, int) or not isinstance(version, int):
+            return None
+        if not 0 < version - known_version <= self.MAX_CHANGES:
+            return None
+
+        return [self.get_changes_key(v) for v in range(known_version + 1, version + 1)]
+
+    def apply_changes(self, version, changes_keys, changes):
+        if changes_keys is None or len(changes) < len(changes_keys):
+            self.clear()
+        else:
+            with self.lock:
+                for changes_key in changes_keys:
+                    for key in changes[changes_key]:
+                        self.entries.pop(key, None)
+
+        self.version = version
+        self.checked_at = time.monotonic()
+
+    def check_version(self, version):
+        """ removes the changed keys if the version from the shared cache is not the one we know """
+
+        if version == self.version:
+            self.checked_at = time.monotonic()
+            return
+
+        changes_keys = self.get_changes_keys(version)
+        self.apply_changes(version, changes_keys, cache.get_many(changes_keys) if changes_keys else {})
+
+    async def acheck_version(self, version):
+        if version == self.version:
+            self.checked_at = time.monotonic()
+            return
+
+        changes_keys = self.get_changes_keys(version)
+        self.apply_changes(version, changes_keys, await cache.aget_many(changes_keys) if changes_keys else {})
+
+    def check(self):
+        if self.needs_check():
+            self.check_version(cache.get(self.version_key))
+
+    async def acheck(self):
+        if self.needs_check():
+            await self.acheck_version(await cache.aget(self.version_key))
+
+    def invalidate(self, keys):
+        """ removes the keys from the copies of all processes """
+
+        keys = list(keys)
+
+        try:
+            version = cache.incr(self.version_key)
+        except ValueError:
+            # the first change (or the version was removed from the shared cache)
+            cache.add(self.version_key, 0, None)
+            version = cache.incr(self.version_key)
+
+        # a process that sees the new version before its changes clears its copy
+        cache.set(self.get_changes_key(version), keys, self.CHANGES_TIMEOUT)
+
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from purepool.core.metrics import get_metrics, reset_metrics
+from purepool.models.solution.biblehash import get_last_mismatch, reset_last_mismatch
+from biblepay.nodes import get_circuit_state
+
+class Command(BaseCommand):
+    help = 'Shows the metrics (like throttled requests) collected by the interface and the backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', dest="reset", help='Sets all metrics to 0 after they are shown',)
+
+    def handle(self, *args, **options):
+        for name, value in sorted(get_metrics().items()):
+            print(name.ljust(40), value)
+
+        # the last change of the circuit breaker of any process
+        for network in settings.BIBLEPAY_NETWORKS:
+            print(('rpc_circuit_%s' % network).ljust(40), get_circuit_state(network) or 'closed')
+
+        # the last difference of the local bible hash to biblepayd (POOL_BIBLEHASH_VERIFIER "shadow")
+        mismatch = get_last_mismatch()
+        if mismatch is not None:
+            print('biblehash_last_mismatch'.ljust(40), mismatch)
+
+        if options['reset']:
+            reset_metrics()
+            reset_last_mismatch()
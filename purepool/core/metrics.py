@@ -0,0 +1,83 @@
+import time
+import atexit
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+# Simple counters in the shared cache, for things like throttled requests.
+# Every process collects its counts in memory and adds them to the shared
+# cache every POOL_METRICS_FLUSH_SECONDS seconds (or on exit), so counting
+# costs no network call. See the "show_metrics" command.
+
+METRICS_NAMES_KEY = 'metrics__names'
+
+_pending = {}
+_known_names = set()
+_lock = threading.Lock()
+_flushed_at = time.monotonic()
+
+def get_metric_key(name):
+    return 'metrics__%s' % name
+
+def add_to_metric(name, value=1):
+    """ counts value for the metric. Returns True if the counts should
+        be send to the shared cache now """
+
+    with _lock:
+        _pending[name] = _pending.get(name, 0) + value
+        return time.monotonic() - _flushed_at >= settings.POOL_METRICS_FLUSH_SECONDS
+
+def count(name, value=1):
+    if add_to_metric(name, value):
+        flush_metrics()
+
+async def acount(name, value=1):
+    if add_to_metric(name, value):
+        await sync_to_async(flush_metrics, thread_sensitive=False)()
+
+def flush_metrics():
+    """ adds the counts of this process to the shared cache """
+
+    global _pending, _flushed_at
+
+    with _lock:
+        pending = _pending
+        _pending = {}
+        _flushed_at = time.monotonic()
+
+    new_names = set(pending.keys()) - _known_names
+
+    for name, value in pending.items():
+        key = get_metric_key(name)
+        try:
+            if not cache.add(key, value, None):
+                cache.incr(key, value)
+        except ValueError:
+            # removed in between, we loose these counts
+            pass
+
+    # the list of the names is needed to show all metrics
+    if new_names:
+        names = set(cache.get(METRICS_NAMES_KEY, []))
+        if not new_names.issubset(names):
+            cache.set(METRICS_NAMES_KEY, sorted(names | new_names), None)
+        _known_names.update(new_names)
+
+def get_metrics():
+    """ all metrics from the shared cache, as dict """
+
+    names = cache.get(METRICS_NAMES_KEY, [])
+    values = cache.get_many([get_metric_key(name) for name in names])
+
+    return dict((name, values.get(get_metric_key(name), 0)) for name in names)
+
+def reset_metrics():
+    names = cache.get(METRICS_NAMES_KEY, [])
+    cache.delete_many([get_metric_key(name) for name in names] + [METRICS_NAMES_KEY])
+
+    with _lock:
+        _pending.clear()
+    _known_names.clear()
+
+atexit.register(flush_metrics)
@@ -4,7 +4,7 @@ from django.utils import timezone
 from django.db.models import Count, Sum
 from purepool.models.miner.models import Miner
 from purepool.models.block.models import Block
-from purepool.models.solution.models import Solution, RejectedSolution
+from purepool.models.solution.models import Solution, RejectedSolutionCount
 from puretransaction.models import Transaction
 
 @cache_memoize(timeout=3600)
@@ -104,4 +104,5 @@ def get_basic_statistics(network, days):
 def miner_error_message_statistic(network, miner_id, days=1):
     days_dt = timezone.now() - datetime.timedelta(days=days)
     
-    return RejectedSolution.objects.filter(network=network, miner_id=miner_id, inserted_at__gte=days_dt).exclude(exception_type='').exclude(exception_type='TransactionTampered').values('exception_type', 'work__worker__name').annotate(total=Count('id'))
\ No newline at end of file
+    # from the counts, not the rejected solutions (see purepool.models.solution.rejections)
+    return RejectedSolutionCount.objects.filter(network=network, miner_id=miner_id, minute__gte=days_dt).exclude(exception_type='').exclude(exception_type='TransactionTampered').values('exception_type', 'worker__name').annotate(total=Sum('total')).order_by('worker__name', 'exception_type')
\ No newline at end of file
@@ -0,0 +1,122 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from purepool.core.tools import get_client_ip
+from purepool.interface.formats import WorkerId, InvalidWorkerdId, SolutionString, InvalidSolutionString
+from purepool.interface.hash import GetHashTarget
+from purepool.interface.views import InvalidNetwork, create_error_msg, create_work_msg, create_solution_msg, get_network, get_header_field
+from purepool.interface.work import create_work, WorkToken
+from purepool.interface.duplicates import ais_duplicate_solution
+from purepool.interface.vardiff import aget_difficulty, aregister_work, arecord_share
+from purepool.interface.ratelimit import ais_ip_throttled, ais_miner_throttled
+from purepool.interface.prevalidate import aprevalidate_solution
+from purepool.interface.batching import get_solution_batcher
+from purepool.models.miner.models import MinerNotEnabled, aget_or_create_miner_worker
+from purepool.models.solution.tasks import process_solution
+
+# The async versions of the views in purepool.interface.views, used when the
+# interface runs as asgi application (see purepool.asgi).
+# Everything that blocks (database, task queue) is done in a thread, so that
+# a single process can handle a lot of miners at the same time
+
+@csrf_exempt
+async def action(request):
+    """ same as purepool.interface.views.action, but async """
+
+    action = get_header_field(request, 'Action', 'EMPTY')
+
+    if await ais_ip_throttled(get_client_ip(request)):
+        return HttpResponse(create_error_msg('Too many requests'))
+
+    if action == 'readytomine2':
+        return await readytomine2(request)
+    elif action == 'solution':
+        return await solution(request)
+
+    return HttpResponse(create_error_msg('UNKNOWN ACTION %s' % action))
+
+async def readytomine2(request):
+    """ Readytomine2 is called by the biblepay miner when new work is required """
+
+    try:
+        network = get_network(request)
+    except InvalidNetwork:
+        return HttpResponse(create_error_msg('Invalid network'))
+
+    worker_id_str = get_header_field(request, 'Miner', None)
+
+    if worker_id_str is None:
+        return HttpResponse(create_error_msg('WorkerID is missing'))
+
+    try:
+        full_worker_id = WorkerId(worker_id_str)
+
+        if await ais_miner_throttled(network, full_worker_id.get_address()):
+            return HttpResponse(create_error_msg('Too many requests'))
+
+        # known miners and workers are loaded from the cache without blocking
+        miner_id, worker_id = await aget_or_create_miner_worker(network, full_worker_id.get_address(), full_worker_id.get_worker())
+    except MinerNotEnabled:
+        return HttpResponse(create_error_msg('Miner %s is disabled' % full_worker_id.get_address()))
+    except InvalidWorkerdId:
+        return HttpResponse(create_error_msg('WorkerID %s is invalid' % worker_id_str))
+
+    thread_id = get_header_field(request, 'ThreadID', '1')
+    os = get_header_field(request, 'OS', 'UNKNOWN')
+    agent = get_header_field(request, 'Agent', 'UNKNOWN')
+    ip = get_client_ip(request)
+
+    difficulty = await aget_difficulty(network, worker_id)
+    hash_target = GetHashTarget(miner_id, network, difficulty)
+
+    # work tokens are only cpu work, the database needs a thread
+    if settings.POOL_WORK_MODE == 'token':
+        work_id = WorkToken(network, worker_id, miner_id, hash_target, thread_id).as_string()
+    else:
+        work_id = await sync_to_async(create_work, thread_sensitive=False)(network, worker_id, miner_id, thread_id, hash_target, ip, os, agent, difficulty)
+        await aregister_work(network, work_id, worker_id)
+
+    return HttpResponse(create_work_msg(network, hash_target, miner_id, work_id))
+
+async def solution(request):
+    """ called by the miner whenever a solution is found. The validation is
+        done later by the backend """
+
+    try:
+        network = get_network(request)
+    except InvalidNetwork:
+        return HttpResponse(create_error_msg('Invalid network'))
+
+    solution_str = get_header_field(request, 'Solution', None)
+
+    if solution_str is None:
+        return HttpResponse(create_error_msg('Solution is missing'))
+
+    try:
+        solution = SolutionString(solution_str)
+    except InvalidSolutionString:
+        return HttpResponse(create_error_msg('Invalit Solution'))
+
+    if await ais_miner_throttled(network, solution.get_miner_id()):
+        return HttpResponse(create_error_msg('Too many requests'))
+
+    if settings.POOL_SOLUTION_PREVALIDATION:
+        reason = await aprevalidate_solution(network, solution)
+        if reason is not None:
+            return HttpResponse(create_error_msg('Rejected solution (%s)' % reason))
+
+    if await ais_duplicate_solution(network, solution):
+        return HttpResponse(create_error_msg('Duplicate solution'))
+
+    await arecord_share(network, solution.get_work_id())
+
+    response = create_solution_msg(solution.get_work_id())
+
+    # putting the task into the queue talks to rabbitmq, so it is done in a thread
+    if settings.POOL_SOLUTION_BATCH_SIZE > 1:
+        await sync_to_async(get_solution_batcher().add, thread_sensitive=False)(network, solution_str)
+    else:
+        await sync_to_async(process_solution.delay, thread_sensitive=False)(network, solution_str)
+
+    return HttpResponse(response)
@@ -0,0 +1,93 @@
+import atexit
+import threading
+from django.conf import settings
+from purepool.models.solution.tasks import process_solution_batch, save_works
+
+class SolutionBatcher(object):
+    """ Collects the solutions of the miners per network and puts them into the
+        task queue as one process_solution_batch task, when max_size solutions are
+        collected or max_delay seconds are over (whatever comes first).
+
+        Thread safe. Solutions that are still collected when the process is killed
+        are lost, the same as a solution that is lost on the way to the pool """
+
+    def __init__(self, max_size, max_delay):
+        self.max_size = max_size
+        self.max_delay = max_delay
+
+        self.lock = threading.Lock()
+        self.batches = {}
+        self.timer = None
+
+    def add(self, network, solution_s):
+        full_batch = None
+
+        with self.lock:
+            batch = self.batches.setdefault(network, [])
+            batch.append(solution_s)
+
+            if len(batch) >= self.max_size:
+                full_batch = self.batches.pop(network)
+            elif self.timer is None:
+                self.timer = threading.Timer(self.max_delay, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+        # sending is done outside of the lock, as it talks to the task queue
+        if full_batch is not None:
+            self.send(network, full_batch)
+
+    def flush(self):
+        """ sends all collected solutions """
+
+        with self.lock:
+            batches = self.batches
+            self.batches = {}
+
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+        for network, batch in batches.items():
+            if batch:
+                self.send(network, batch)
+
+    def send(self, network, batch):
+        process_solution_batch.delay(network, batch)
+
+class WorkBatcher(SolutionBatcher):
+    """ the same for the Works of the "cache" work mode (see purepool.interface.work),
+        the rows are written by the save_works task """
+
+    def send(self, network, batch):
+        save_works.delay(network, batch)
+
+_solution_batcher = None
+_solution_batcher_lock = threading.Lock()
+
+def get_solution_batcher():
+    """ the batcher of this process """
+
+    global _solution_batcher
+
+    with _solution_batcher_lock:
+        if _solution_batcher is None:
+            _solution_batcher = SolutionBatcher(settings.POOL_SOLUTION_BATCH_SIZE, settings.POOL_SOLUTION_BATCH_DELAY)
+
+            # we send what we have on a normal shutdown
+            atexit.register(_solution_batcher.flush)
+
+    return _solution_batcher
+
+_work_batcher = None
+_work_batcher_lock = threading.Lock()
+
+def get_work_batcher():
+    global _work_batcher
+
+    with _work_batcher_lock:
+        if _work_batcher is None:
+            _work_batcher = WorkBatcher(settings.POOL_WORK_BATCH_SIZE, settings.POOL_WORK_BATCH_DELAY)
+            atexit.register(_work_batcher.flush)
+
+    return _work_batcher
@@ -0,0 +1,33 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+
+def get_solution_seen_key(network, solution):
+    """ the cache key for a solution. The bible hash is send by the miner, so it
+        is hashed to get a valid memcache key. The prev_height is part of the key,
+        so the filter is scoped to the block the solution was found for """
+
+    content = '%s|%s' % (solution.get_prev_height(), solution.get_bible_hash())
+    return 'solution_seen__%s__%s' % (network, hashlib.sha1(content.encode('utf-8')).hexdigest())
+
+def is_duplicate_solution(network, solution):
+    """ marks the bible hash of the solution as seen and returns True if it was
+        already seen before. This is a single atomic cache operation, so two
+        interfaces can not accept the same solution at the same time.
+
+        Only solutions not seen here are put into the task queue. The backend
+        still checks the database, as the filter forgets the hashes after
+        settings.POOL_DUPLICATE_SOLUTION_TIMEOUT seconds """
+
+    if not settings.POOL_DUPLICATE_SOLUTION_TIMEOUT:
+        return False
+
+    return not cache.add(get_solution_seen_key(network, solution), 1, settings.POOL_DUPLICATE_SOLUTION_TIMEOUT)
+
+async def ais_duplicate_solution(network, solution):
+    """ async version of is_duplicate_solution """
+
+    if not settings.POOL_DUPLICATE_SOLUTION_TIMEOUT:
+        return False
+
+    return not await cache.aadd(get_solution_seen_key(network, solution), 1, settings.POOL_DUPLICATE_SOLUTION_TIMEOUT)
@@ -1,3 +1,4 @@
+import re
 import json
 from purepool.models.miner.models import Miner, Worker, get_miner_id_by_address
 
@@ -54,88 +55,190 @@ class WorkerId(object):
         return Worker.objects.get(miner_id=miner_id, name=self.worker)
         
 
+# the fields of the solution string, in the order the miner sends them
+SOLUTION_FIELDS = (
+    'block_hash',
+    'block_time',
+    'prev_block_time',
+    'prev_height',
+    'bible_hash',
+    'miner_id',
+    'work_id',
+    'thread_id',
+    'thread_hash_counter',
+    'thread_start',
+    'hash_counter',
+    'timer_start',
+    'timer_end',
+    'nonce',
+    'block_hex',
+    'transaction_hex',
+)
+
+SOLUTION_FIELD_POSITIONS = dict((name, i) for i, name in enumerate(SOLUTION_FIELDS))
+
+# these fields are most of the solution string. They are not kept as copy
+# and only sliced from the solution string when they are really needed
+SOLUTION_LARGE_FIELDS = ('block_hex', 'transaction_hex')
+SOLUTION_SMALL_FIELD_COUNT = len(SOLUTION_FIELDS) - len(SOLUTION_LARGE_FIELDS)
+
+SOLUTION_HEX_FIELDS = {
+    'block_hash': 64,
+    'bible_hash': 64,
+    'block_hex': None,
+    'transaction_hex': None,
+}
+
+SOLUTION_NUMERIC_FIELDS = (
+    'block_time', 'prev_block_time', 'prev_height', 'nonce',
+    'thread_hash_counter', 'thread_start', 'hash_counter', 'timer_start', 'timer_end',
+)
+
+HEX_RE = re.compile('[0-9a-fA-F]+')
+NUMERIC_RE = re.compile('[0-9]+')
+
 class SolutionString(object):
     """ Takes the solution string delivered by the Mining client and splits it into its
         original parts.
         
         The original mining/biblepay client has the oposite side of the code in
         src/miner.ccp -> UpdatePoolProgress()
+
+        Only the small fields are split out of the solution string. The block and
+        transaction hex (the biggest part by far) are sliced out of the string
+        when they are really needed.
         """
+
+    __slots__ = ('solution_string', 'fields', 'tail_start', 'values')
     
     def __init__(self, solution_string=None):
         """ the solution_string is optional, as we fill the fields
             in some tests directly """
-        
+
+        self.solution_string = None
+        self.fields = None
+        self.tail_start = None
+        self.values = {}
+
         if solution_string is not None:
-            self.content = self.parse_solution_string(solution_string)
+            self.fields, self.tail_start = self.parse_solution_string(solution_string)
+            self.solution_string = solution_string
         
     def parse_solution_string(self, solution_string):
+        """ returns the small fields and the position of the block hex """
+
         try:
-            solution = solution_string.split(',')
-            
-            return {
-                'block_hash': solution[0],
-                'block_time': solution[1],
-                'prev_block_time': solution[2],
-                'prev_height': solution[3],
-                'bible_hash': solution[4],
-                'miner_id': solution[5],
-                'work_id': solution[6],            
-                'thread_id': solution[7],
-                'thread_hash_counter': solution[8],            
-                'thread_start': solution[9],
-                'hash_counter': solution[10],
-                'timer_start': solution[11],
-                'timer_end': solution[12],
-                'nonce': solution[13],
-                'block_hex': solution[14],
-                'transaction_hex': solution[15],
-            }
-        except:
+            fields = solution_string.split(',', SOLUTION_SMALL_FIELD_COUNT)
+            tail = fields.pop(SOLUTION_SMALL_FIELD_COUNT)
+        except (IndexError, AttributeError, TypeError):
             raise InvalidSolutionString()
-        
+
+        # the block and transaction hex must be there too
+        if not ',' in tail:
+            raise InvalidSolutionString()
+
+        return fields, len(solution_string) - len(tail)
+
+    def get_large_field_positions(self):
+        """ (start, end) of the block hex and the transaction hex """
+
+        block_hex_end = self.solution_string.index(',', self.tail_start)
+
+        # the last field ends at the next comma, if there is one
+        transaction_hex_end = self.solution_string.find(',', block_hex_end + 1)
+        if transaction_hex_end == -1:
+            transaction_hex_end = len(self.solution_string)
+
+        return {
+            'block_hex': (self.tail_start, block_hex_end),
+            'transaction_hex': (block_hex_end + 1, transaction_hex_end),
+        }
+
+    def get_field(self, name):
+        if self.fields is None:
+            return self.values[name]
+
+        position = SOLUTION_FIELD_POSITIONS[name]
+        if position < SOLUTION_SMALL_FIELD_COUNT:
+            return self.fields[position]
+
+        start, end = self.get_large_field_positions()[name]
+        return self.solution_string[start:end]
+
+    @property
+    def content(self):
+        """ all fields as dict. The dict can be changed, so it is the
+            only source of the fields from here on """
+
+        if self.fields is not None:
+            self.values = dict(zip(SOLUTION_FIELDS, self.fields))
+            for name, (start, end) in self.get_large_field_positions().items():
+                self.values[name] = self.solution_string[start:end]
+
+            self.solution_string = None
+            self.fields = None
+
+        return self.values
+
+    @content.setter
+    def content(self, values):
+        self.solution_string = None
+        self.fields = None
+        self.values = values
+
+    def check_format(self):
+        """ a cheap check of the fields used to calculate and validate the bible hash.
+            The large fields are checked in place, without copying them.
+            Raises InvalidSolutionString """
+
+        large_field_positions = None
+        if self.fields is not None:
+            large_field_positions = self.get_large_field_positions()
+
+        for name, length in SOLUTION_HEX_FIELDS.items():
+            if large_field_positions is not None and name in SOLUTION_LARGE_FIELDS:
+                start, end = large_field_positions[name]
+                valid = HEX_RE.fullmatch(self.solution_string, start, end) is not None
+            else:
+                value = self.get_field(name)
+                valid = HEX_RE.fullmatch(value) is not None and (length is None or len(value) == length)
+
+            if not valid:
+                raise InvalidSolutionString(name)
+
+        for name in SOLUTION_NUMERIC_FIELDS:
+            if NUMERIC_RE.fullmatch(self.get_field(name)) is None:
+                raise InvalidSolutionString(name)
+
     def as_string(self):
-        return ','.join([
-            self.content['block_hash'],
-            self.content['block_time'],
-            self.content['prev_block_time'],
-            self.content['prev_height'],
-            self.content['bible_hash'],
-            str(self.content['miner_id']),
-            str(self.content['work_id']),
-            self.content['thread_id'],
-            self.content['thread_hash_counter'],
-            self.content['thread_start'],
-            self.content['hash_counter'],
-            self.content['timer_start'],
-            self.content['timer_end'],
-            self.content['nonce'],
-            self.content['block_hex'],
-            self.content['transaction_hex'],
-        ])
+        # unchanged solutions are returned without building a new string
+        if self.fields is not None:
+            return self.solution_string
+
+        return ','.join([str(self.values[name]) for name in SOLUTION_FIELDS])
 
     def get_block_hash(self):
         """ The hash of block used in this solution.
             Used in the bible_hash calculation """
 
-        return self.content['block_hash']
+        return self.get_field('block_hash')
 
     def get_block_time(self):
         """ value of GetBlockTime() from the block on client side.
             Used in the bible_hash calculation """
-        return self.content['block_time']
+        return self.get_field('block_time')
     
     def get_prev_block_time(self):
         """ block time of the previous block.
             Used in the bible_hash calculation """
         
-        return self.content['prev_block_time']
+        return self.get_field('prev_block_time')
     
     def get_prev_height(self):
         """ block height of the previous block.
             Used in the bible_hash calculation """
             
-        return self.content['prev_height']
+        return self.get_field('prev_height')
     
     def get_bible_hash(self):
         """ The meat of our solution string, the information we want.
@@ -144,29 +247,29 @@ class SolutionString(object):
             this bible_hash is valid and can be calculated based on the given
             information. """        
 
-        return self.content['bible_hash']
+        return self.get_field('bible_hash')
     
     def get_miner_id(self):
         """ the miner uuid that the client used for mining """
         
-        return self.content['miner_id']
+        return self.get_field('miner_id')
     
     def get_work_id(self):
         """ every miner requests Work with "readytowork2" from the interface.
             This is the work_id it was given """
         
-        return self.content['work_id']
+        return self.get_field('work_id')
 
     def get_thread_id(self):
         """ Every thread on the miner has an id, starting from 0 """
         
-        return self.content['thread_id']
+        return self.get_field('thread_id')
 
     def get_thread_hash_counter(self):
         """ the amount of hashes calculated before the solution was send """
         
         try:
-            return int(self.content['thread_hash_counter'])
+            return int(self.get_field('thread_hash_counter'))
         except:
             pass
         
@@ -176,7 +279,7 @@ class SolutionString(object):
         """ time in millieconds then the current work started in the thread """
     
         try:
-            return int(self.content['thread_start'])
+            return int(self.get_field('thread_start'))
         except:
             pass
         
@@ -186,7 +289,7 @@ class SolutionString(object):
         """ how many hashes the whole client calculated before the solution was commited """
     
         try:
-            return int(self.content['hash_counter'])
+            return int(self.get_field('hash_counter'))
         except:
             pass
         
@@ -196,7 +299,7 @@ class SolutionString(object):
         """ miner starttime """
         
         try:
-            return int(self.content['timer_start'])
+            return int(self.get_field('timer_start'))
         except:
             pass
         
@@ -206,7 +309,7 @@ class SolutionString(object):
         """ the time when the solution was commited from client side"""
         
         try:
-            return int(self.content['timer_end'])
+            return int(self.get_field('timer_end'))
         except:
             pass
         
@@ -215,10 +318,10 @@ class SolutionString(object):
     def get_nonce(self):
         """ the nonce used in the hash """
         
-        return self.content['nonce']
+        return self.get_field('nonce')
     
     def get_block_hex(self):
-        return self.content['block_hex']
+        return self.get_field('block_hex')
     
     def get_transaction_hex(self):
-        return self.content['transaction_hex']                    
\ No newline at end of file
+        return self.get_field('transaction_hex')                    
\ No newline at end of file
@@ -1,15 +1,26 @@
 from django.core.cache import cache
 
-def GetHashTarget(miner_id, network_id):
+# the hash target for difficulty 1
+BASE_HASH_TARGET = int('0000011110000000000000000000000000000000000000000000000000000000', 16)
+
+def GetHashTarget(miner_id, network_id, difficulty=1):
     """ The HashTarget we generate here is the highest value of any HashTarget from the client
         we accept as a solution for the given Work.
         We also control bad miners with that when we higher the HashTarget for them
-        """
 
-    hash_target = '0000011110000000000000000000000000000000000000000000000000000000000000000000000000000'
+        A higher difficulty gives a lower HashTarget (see purepool.interface.vardiff)
+        """
 
-    hash_target = hash_target[0:64]
+    hash_target = '%064x' % (BASE_HASH_TARGET // difficulty)
 
     return hash_target
 
+def get_difficulty_from_target(hash_target):
+    """ the difficulty a hash target was created with """
+
+    try:
+        return max(1, round(BASE_HASH_TARGET / int(hash_target, 16)))
+    except (ValueError, ZeroDivisionError):
+        return 1
+
 
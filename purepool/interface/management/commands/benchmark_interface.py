@@ -0,0 +1,81 @@
+import io
+import time
+from unittest import mock
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+from django.test.utils import override_settings
+
+class Command(BaseCommand):
+    help = 'Compares the requests/second of the django Action.aspx route with the standalone interface wsgi application'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', default=2000, type=int, help='Requests per run',)
+        parser.add_argument('--action', default='readytomine2', choices=['readytomine2', 'solution', 'EMPTY'], help='The action send by the fake miner',)
+        parser.add_argument('--network', default=settings.BIBLEPAY_DEFAULT_NETWORK, type=str, help='The network send by the fake miner',)
+        parser.add_argument('--miner', default='B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx/benchmark', type=str, help='The workerid send by the fake miner',)
+
+    def get_environ(self, options):
+        solution = "4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96,1516741759,1516741614,5,0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11,SOMERANDOMMINERID,e5161e2a,4,12763,1516741681340,73728,1516741681759,1516741762590,12762,999999,888888"
+
+        return {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/Action.aspx',
+            'SCRIPT_NAME': '',
+            'QUERY_STRING': '',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '127.0.0.1',
+            'CONTENT_LENGTH': '0',
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': io.BytesIO(b''),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.multithread': False,
+            'wsgi.multiprocess': True,
+            'wsgi.run_once': False,
+            'HTTP_ACTION': options['action'],
+            'HTTP_NETWORKID': options['network'],
+            'HTTP_MINER': options['miner'],
+            'HTTP_SOLUTION': solution,
+            'HTTP_THREADID': '1',
+        }
+
+    def run(self, application, options):
+        environ = self.get_environ(options)
+        status = []
+
+        def start_response(s, headers):
+            status.append(s)
+
+        start = time.perf_counter()
+        for i in range(0, options['requests']):
+            environ['wsgi.input'] = io.BytesIO(b'')
+            b''.join(application(dict(environ), start_response))
+        runtime = time.perf_counter() - start
+
+        return options['requests'] / runtime, status[-1]
+
+    def handle(self, *args, **options):
+        # import here, as it runs django.setup()
+        from purepool.interface.wsgi import application as interface_application
+
+        django_application = get_wsgi_application()
+
+        # the benchmark is about the request handling, we do not want to fill the
+        # task queue with fake solutions. And the fake requests come from localhost
+        with mock.patch('purepool.interface.views.process_solution.delay'), \
+             override_settings(ALLOWED_HOSTS=list(settings.ALLOWED_HOSTS) + ['localhost']):
+
+            # the first request creates the miner and worker and fills the caches
+            self.run(django_application, dict(options, requests=1))
+
+            django_rps, django_status = self.run(django_application, options)
+            interface_rps, interface_status = self.run(interface_application, options)
+
+        print('Action:', options['action'], '| Requests per run:', options['requests'])
+        print('Django route:         %10.1f requests/s (%s)' % (django_rps, django_status))
+        print('Interface wsgi:       %10.1f requests/s (%s)' % (interface_rps, interface_status))
+        print('Speedup:              %10.2fx' % (interface_rps / django_rps))
+
@@ -0,0 +1,68 @@
+import time
+import tracemalloc
+from django.core.management.base import BaseCommand
+from purepool.interface.formats import SolutionString, SOLUTION_FIELDS
+
+class LegacySolutionString(object):
+    """ the split based parser used before, kept here for the comparison """
+
+    def __init__(self, solution_string):
+        self.content = dict(zip(SOLUTION_FIELDS, solution_string.split(',')))
+
+    def get_work_id(self):
+        return self.content['work_id']
+
+    def get_bible_hash(self):
+        return self.content['bible_hash']
+
+    def get_prev_height(self):
+        return self.content['prev_height']
+
+class Command(BaseCommand):
+    help = 'Compares the parsing speed and memory usage of the SolutionString with the old split based parser'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solutions', default=100000, type=int, help='Solutions parsed per run',)
+        parser.add_argument('--hex-size', default=2000, type=int, help='Size of the block and transaction hex in characters',)
+
+    def get_solution(self, hex_size):
+        return ','.join([
+            '4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96', '1518041523', '1518041437', '19309',
+            '0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11', 'fa5b6fd6-3de5-4c2f-8a59-7e6c8e9ea3b5',
+            'b0181b3a-9868-4139-bef5-8c7e5d4239f4', '0', '332694', '1518040817888', '1769512', '1518037739857',
+            '1518041527556', '14217', 'ab' * (hex_size // 2), 'cd' * (hex_size // 2),
+        ])
+
+    def run(self, cls, solution, count):
+        """ does what the interface does with a solution: parse it and
+            read the fields used for the duplicate filter and the answer """
+
+        start = time.perf_counter()
+        for i in range(0, count):
+            s = cls(solution)
+            s.get_prev_height()
+            s.get_bible_hash()
+            s.get_work_id()
+        runtime = time.perf_counter() - start
+
+        # memory used while 1000 parsed solutions are kept (like in a batch). The
+        # solution string itself is not counted, every request has it anyway
+        tracemalloc.start()
+        kept = [cls(solution) for i in range(0, 1000)]
+        for s in kept:
+            s.get_bible_hash()
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        return count / runtime, memory / 1000
+
+    def handle(self, *args, **options):
+        solution = self.get_solution(options['hex_size'])
+
+        legacy_rate, legacy_memory = self.run(LegacySolutionString, solution, options['solutions'])
+        lazy_rate, lazy_memory = self.run(SolutionString, solution, options['solutions'])
+
+        print('Solution size:', len(solution), 'characters | Solutions per run:', options['solutions'])
+        print('Split parser:         %10.1f solutions/s %10.1f bytes/solution' % (legacy_rate, legacy_memory))
+        print('SolutionString:       %10.1f solutions/s %10.1f bytes/solution' % (lazy_rate, lazy_memory))
+        print('Speedup:              %10.2fx' % (lazy_rate / legacy_rate))
@@ -0,0 +1,64 @@
+from purepool.core.metrics import count, acount
+from purepool.interface.formats import InvalidSolutionString
+from purepool.interface.hash import GetHashTarget
+from purepool.interface.work import WorkToken, InvalidWorkToken, is_work_token
+from purepool.models.block.chaintip import get_chain_height, aget_chain_height
+from biblepay.hash import check_hashtarget
+
+# Cheap checks of a solution in the interface, before it is put into the task queue.
+# Only cpu work (and a cached chain height) is done here, the real validation is
+# done by the backend. Rejected solutions are not saved, only counted in the
+# metrics (see the "show_metrics" command)
+
+# the highest hash target of all works (difficulty 1)
+MAX_HASH_TARGET = GetHashTarget(None, None)
+
+def get_hash_target(network, work_id):
+    """ the hash target of the work. Work tokens contain it, for works from the
+        database we use the highest target we ever give out """
+
+    if not is_work_token(work_id):
+        return MAX_HASH_TARGET
+
+    try:
+        return WorkToken.from_string(network, work_id).hash_target
+    except InvalidWorkToken:
+        return None
+
+def get_rejection_reason(network, solution, chain_height):
+    """ returns why the solution can not be valid, or None """
+
+    try:
+        solution.check_format()
+    except InvalidSolutionString:
+        return 'format'
+
+    hash_target = get_hash_target(network, solution.get_work_id())
+    if hash_target is None:
+        return 'work'
+
+    if not check_hashtarget(solution.get_bible_hash(), hash_target):
+        return 'hash_target'
+
+    # the chain height we know can be behind, but never ahead of the real chain.
+    # Solutions for older blocks are of no use anymore
+    if chain_height is not None and int(solution.get_prev_height()) < chain_height:
+        return 'outdated'
+
+    return None
+
+def prevalidate_solution(network, solution):
+    """ returns None if the solution might be valid, or the reason why not """
+
+    reason = get_rejection_reason(network, solution, get_chain_height(network))
+    if reason is not None:
+        count('prevalidation_rejected_%s' % reason)
+
+    return reason
+
+async def aprevalidate_solution(network, solution):
+    reason = get_rejection_reason(network, solution, await aget_chain_height(network))
+    if reason is not None:
+        await acount('prevalidation_rejected_%s' % reason)
+
+    return reason
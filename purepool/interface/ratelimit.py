@@ -0,0 +1,171 @@
+import time
+import hashlib
+from django.conf import settings
+from django.core.cache import cache
+from purepool.core.lru import LRUCache
+from purepool.core.metrics import count, acount
+
+# Rate limiting of the miner requests, per ip and per miner.
+#
+# Every process has a token bucket per ip/miner, so most requests are checked
+# without any network call. Every POOL_RATELIMIT_SYNC_REQUESTS requests of an
+# ip/miner, the process adds them to a counter in the shared cache. If all
+# processes together got more requests in RATELIMIT_WINDOW seconds then allowed,
+# the ip/miner is blocked in this process until the window is over.
+
+# length of the windows counted in the shared cache, in seconds
+RATELIMIT_WINDOW = 60
+
+# the amount of buckets a process keeps. The oldest are forgotten first
+RATELIMIT_LOCAL_SIZE = 100000
+
+class TokenBucket(object):
+    """ Allows "rate" requests per second, and "burst" requests at once.
+        Not thread safe, but a lost update only means a request more or less """
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated_at', 'pending', 'blocked_until')
+
+    def __init__(self, rate, burst, now):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = now
+
+        # requests not yet added to the shared counter
+        self.pending = 0
+        self.blocked_until = 0
+
+    def take(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
+
+class RateLimiter(object):
+
+    def __init__(self, name, rate, burst, sync_requests):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.sync_requests = sync_requests
+
+        self.buckets = LRUCache(RATELIMIT_LOCAL_SIZE)
+
+    def get_shared_key(self, value, window):
+        # the ip or miner is send by the miner, so it is hashed to get a valid memcache key
+        return 'ratelimit__%s__%s__%s' % (self.name, hashlib.sha1(value.encode('utf-8')).hexdigest(), window)
+
+    def get_window_limit(self):
+        return self.rate * RATELIMIT_WINDOW + self.burst
+
+    def take(self, value, now):
+        """ the local part. Returns if the request is allowed, and the bucket
+            if it is time to add the requests to the shared counter """
+
+        bucket = self.buckets.get(value)
+        if bucket is None:
+            bucket = TokenBucket(self.rate, self.burst, now)
+            self.buckets.set(value, bucket)
+
+        if bucket.blocked_until > now or not bucket.take(now):
+            return False, None
+
+        bucket.pending += 1
+        if bucket.pending < self.sync_requests:
+            return True, None
+
+        return True, bucket
+
+    def check_total(self, bucket, total, window):
+        if total is not None and total > self.get_window_limit():
+            bucket.blocked_until = (window + 1) * RATELIMIT_WINDOW
+
+    def allow(self, value):
+        now = time.time()
+        allowed, bucket = self.take(value, now)
+
+        if bucket is not None:
+            window = int(now // RATELIMIT_WINDOW)
+            key = self.get_shared_key(value, window)
+            pending, bucket.pending = bucket.pending, 0
+
+            try:
+                if cache.add(key, pending, RATELIMIT_WINDOW * 2):
+                    total = pending
+                else:
+                    total = cache.incr(key, pending)
+            except ValueError:
+                total = None
+
+            self.check_total(bucket, total, window)
+
+        if not allowed:
+            count('throttled_%s' % self.name)
+
+        return allowed
+
+    async def aallow(self, value):
+        now = time.time()
+        allowed, bucket = self.take(value, now)
+
+        if bucket is not None:
+            window = int(now // RATELIMIT_WINDOW)
+            key = self.get_shared_key(value, window)
+            pending, bucket.pending = bucket.pending, 0
+
+            try:
+                if await cache.aadd(key, pending, RATELIMIT_WINDOW * 2):
+                    total = pending
+                else:
+                    total = await cache.aincr(key, pending)
+            except ValueError:
+                total = None
+
+            self.check_total(bucket, total, window)
+
+        if not allowed:
+            await acount('throttled_%s' % self.name)
+
+        return allowed
+
+_ratelimiters = {}
+
+def get_ratelimiter(name):
+    """ the limiter for "ip" or "miner", or None if it is not enabled in the settings """
+
+    setting = getattr(settings, 'POOL_RATELIMIT_%s' % name.upper())
+    if setting is None:
+        return None
+
+    rate, burst = setting
+    key = (name, rate, burst, settings.POOL_RATELIMIT_SYNC_REQUESTS)
+
+    if not key in _ratelimiters:
+        _ratelimiters[key] = RateLimiter(name, rate, burst, settings.POOL_RATELIMIT_SYNC_REQUESTS)
+
+    return _ratelimiters[key]
+
+def get_miner_value(network, miner):
+    return '%s__%s' % (network, miner)
+
+def is_ip_throttled(ip):
+    limiter = get_ratelimiter('ip')
+    return limiter is not None and not limiter.allow(ip)
+
+def is_miner_throttled(network, miner):
+    """ the miner is its address for readytomine2, and the miner id for solutions """
+
+    limiter = get_ratelimiter('miner')
+    return limiter is not None and not limiter.allow(get_miner_value(network, miner))
+
+async def ais_ip_throttled(ip):
+    limiter = get_ratelimiter('ip')
+    return limiter is not None and not await limiter.aallow(ip)
+
+async def ais_miner_throttled(network, miner):
+    limiter = get_ratelimiter('miner')
+    return limiter is not None and not await limiter.aallow(get_miner_value(network, miner))
@@ -0,0 +1,9 @@
+from django.urls import path
+from purepool.interface.async_views import action
+
+# The urls of the asgi interface (see purepool.settings.interface).
+# Only the mining protocol is available here
+
+urlpatterns = [
+    path('Action.aspx', action, name="action_aspx")
+]
@@ -0,0 +1,184 @@
+import math
+import time
+from django.conf import settings
+from django.core.cache import cache
+from purepool.interface.work import WorkToken, InvalidWorkToken, is_work_token, get_work_uuid
+
+# Variable difficulty per worker.
+# The interface counts the solutions every worker sends. Every
+# POOL_VARDIFF_RETARGET_SECONDS, the difficulty of the worker is changed so
+# that it sends around POOL_VARDIFF_SHARES_PER_MINUTE solutions. Big rigs get
+# a lower hash target and send less (but more valuable) solutions. The
+# difficulty is saved in the Work, and the shareout counts every solution
+# as "difficulty" shares.
+
+# the state of workers that are gone is forgotten after this amount of seconds
+VARDIFF_TIMEOUT = 60 * 60 * 24
+
+# the difficulty is changed by a factor of 4 per retarget at most
+VARDIFF_MAX_STEPS = 2
+
+def get_vardiff_key(network, worker_id):
+    return 'vardiff__%s__%s' % (network, worker_id)
+
+def get_vardiff_shares_key(network, worker_id):
+    return 'vardiff_shares__%s__%s' % (network, worker_id)
+
+def get_work_worker_key(network, work_id):
+    """ the cache key for the worker of a database work id. The work id is send
+        by the miner, so only valid uuids get a key (None otherwise) """
+
+    work_uuid = get_work_uuid(work_id)
+    if work_uuid is None:
+        return None
+
+    return 'vardiff_work__%s__%s' % (network, work_uuid)
+
+def retarget(difficulty, shares, seconds):
+    """ returns the new difficulty for a worker that send the amount of shares
+        in the given seconds with the given difficulty """
+
+    expected_shares = settings.POOL_VARDIFF_SHARES_PER_MINUTE * seconds / 60
+
+    # a worker without any shares gets the lowest change we allow
+    if shares == 0:
+        steps = -VARDIFF_MAX_STEPS
+    else:
+        steps = round(math.log2(shares / expected_shares))
+        steps = max(-VARDIFF_MAX_STEPS, min(VARDIFF_MAX_STEPS, steps))
+
+    if steps >= 0:
+        difficulty = difficulty << steps
+    else:
+        difficulty = difficulty >> -steps
+
+    return max(1, min(settings.POOL_VARDIFF_MAX_DIFFICULTY, difficulty))
+
+def get_difficulty(network, worker_id):
+    """ the difficulty for new work of the worker. Changes it, when
+        the last retarget is long enough ago """
+
+    if not settings.POOL_VARDIFF_ENABLED:
+        return 1
+
+    now = time.time()
+    key = get_vardiff_key(network, worker_id)
+
+    state = cache.get(key)
+    if state is None:
+        # new worker (or one that was gone for a long time)
+        cache.set_many({key: (1, now), get_vardiff_shares_key(network, worker_id): 0}, VARDIFF_TIMEOUT)
+        return 1
+
+    difficulty, window_start = state
+    if now - window_start < settings.POOL_VARDIFF_RETARGET_SECONDS:
+        return difficulty
+
+    shares_key = get_vardiff_shares_key(network, worker_id)
+    difficulty = retarget(difficulty, cache.get(shares_key, 0), now - window_start)
+
+    cache.set_many({key: (difficulty, now), shares_key: 0}, VARDIFF_TIMEOUT)
+
+    return difficulty
+
+def register_work(network, work_id, worker_id):
+    """ work ids from the database do not tell us the worker, so we remember it.
+        Tokens already contain the worker """
+
+    if not settings.POOL_VARDIFF_ENABLED or is_work_token(work_id):
+        return
+
+    key = get_work_worker_key(network, work_id)
+    if key is not None:
+        cache.set(key, worker_id, VARDIFF_TIMEOUT)
+
+def get_work_worker_id(network, work_id):
+    """ the worker of the work, or None if unknown """
+
+    if is_work_token(work_id):
+        try:
+            return WorkToken.from_string(network, work_id).worker_id
+        except InvalidWorkToken:
+            return None
+
+    key = get_work_worker_key(network, work_id)
+    if key is None:
+        return None
+
+    return cache.get(key)
+
+def record_share(network, work_id):
+    """ counts a solution send by the worker of the work. The solution is not
+        validated at this point, but faking solutions would only raise the
+        difficulty of the faker """
+
+    if not settings.POOL_VARDIFF_ENABLED:
+        return
+
+    worker_id = get_work_worker_id(network, work_id)
+    if worker_id is None:
+        return
+
+    shares_key = get_vardiff_shares_key(network, worker_id)
+
+    try:
+        if not cache.add(shares_key, 1, VARDIFF_TIMEOUT):
+            cache.incr(shares_key)
+    except ValueError:
+        # the key expired between the add and the incr, we loose one share
+        pass
+
+# async versions of the functions above, for purepool.interface.async_views
+
+async def aget_difficulty(network, worker_id):
+    if not settings.POOL_VARDIFF_ENABLED:
+        return 1
+
+    now = time.time()
+    key = get_vardiff_key(network, worker_id)
+
+    state = await cache.aget(key)
+    if state is None:
+        await cache.aset_many({key: (1, now), get_vardiff_shares_key(network, worker_id): 0}, VARDIFF_TIMEOUT)
+        return 1
+
+    difficulty, window_start = state
+    if now - window_start < settings.POOL_VARDIFF_RETARGET_SECONDS:
+        return difficulty
+
+    shares_key = get_vardiff_shares_key(network, worker_id)
+    difficulty = retarget(difficulty, await cache.aget(shares_key, 0), now - window_start)
+
+    await cache.aset_many({key: (difficulty, now), shares_key: 0}, VARDIFF_TIMEOUT)
+
+    return difficulty
+
+async def aregister_work(network, work_id, worker_id):
+    if not settings.POOL_VARDIFF_ENABLED or is_work_token(work_id):
+        return
+
+    key = get_work_worker_key(network, work_id)
+    if key is not None:
+        await cache.aset(key, worker_id, VARDIFF_TIMEOUT)
+
+async def arecord_share(network, work_id):
+    if not settings.POOL_VARDIFF_ENABLED:
+        return
+
+    key = None if is_work_token(work_id) else get_work_worker_key(network, work_id)
+    if key is None:
+        # a token, or no valid work id at all
+        worker_id = get_work_worker_id(network, work_id)
+    else:
+        worker_id = await cache.aget(key)
+
+    if worker_id is None:
+        return
+
+    shares_key = get_vardiff_shares_key(network, worker_id)
+
+    try:
+        if not await cache.aadd(shares_key, 1, VARDIFF_TIMEOUT):
+            await cache.aincr(shares_key)
+    except ValueError:
+        pass
@@ -2,10 +2,15 @@ from django.conf import settings
 from django.http import HttpResponse
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from purepool.core.tools import get_client_ip
-from purepool.interface.formats import WorkerId, InvalidWorkerdId, SolutionString
+from purepool.interface.formats import WorkerId, InvalidWorkerdId, SolutionString, InvalidSolutionString
 from purepool.interface.hash import GetHashTarget
 from purepool.models.miner.models import Worker, MinerNotEnabled, get_or_create_miner_worker
-from purepool.models.solution.models import Work
+from purepool.interface.work import create_work
+from purepool.interface.duplicates import is_duplicate_solution
+from purepool.interface.vardiff import get_difficulty, register_work, record_share
+from purepool.interface.ratelimit import is_ip_throttled, is_miner_throttled
+from purepool.interface.prevalidate import prevalidate_solution
+from purepool.interface.batching import get_solution_batcher
 from purepool.models.solution.tasks import process_solution
 
 
@@ -15,6 +20,17 @@ class InvalidNetwork(Exception):
 def create_error_msg(msg):
     return '<RESPONSE>%s</RESPONSE><ERROR>%s</ERROR><EOF>' % (msg, msg)
 
+def create_work_msg(network, hash_target, miner_id, work_id):
+    return "<RESPONSE> <ADDRESS>{0}</ADDRESS><HASHTARGET>{1}</HASHTARGET><MINERGUID>{2}</MINERGUID><WORKID>{3}</WORKID></RESPONSE>".format(
+        settings.POOL_ADDRESS[network],
+        hash_target,
+        miner_id,
+        work_id
+    )
+
+def create_solution_msg(work_id):
+    return "<RESPONSE><STATUS>ok</STATUS><WORKID>%s</WORKID></RESPONSE><END></HTML>" % work_id
+
 def get_network(request):
     """ gets and validated the network from the request """
     
@@ -43,42 +59,65 @@ def action(request):
         The miner sends "Action", but django will return it as "HTTP_ACTION"
     """
     
+    return HttpResponse(action_msg(request))
+
+def readytomine2(request):
+    """ Readytomine2 is called by the biblepay miner when new work is required """
+
+    return HttpResponse(readytomine2_msg(request))
+
+def solution(request):
+    """ called by the miner whenever a solution is found. We check the solution in
+        a different process to see if it is a valid solution, or some fake """
+
+    return HttpResponse(solution_msg(request))
+
+# The views above only wrap the functions below, which return the response
+# string. They only need "request.META", so they are also used by the
+# standalone wsgi application in purepool.interface.wsgi
+
+def action_msg(request):
     # the original pool used the Header "Action" to route to the right page
     # so we do that here, too    
     action = get_header_field(request, 'Action', 'EMPTY')
+
+    # requests over the rate limit are answered before anything else is done
+    if is_ip_throttled(get_client_ip(request)):
+        return create_error_msg('Too many requests')
         
     if action == 'readytomine2':
-        return readytomine2(request)
+        return readytomine2_msg(request)
     elif action == 'solution':
-        return solution(request)
+        return solution_msg(request)
 
-    return HttpResponse(create_error_msg('UNKNOWN ACTION %s' % action))
+    return create_error_msg('UNKNOWN ACTION %s' % action)
 
-def readytomine2(request):
-    """ Readytomine2 is called by the biblepay miner when new work is required """
-    
+def readytomine2_msg(request):
     # we first need the network (like "main" or "test"), as it is required in many steps
     try:
         network = get_network(request)
     except InvalidNetwork:
-        return HttpResponse(create_error_msg('Invalid network'))
+        return create_error_msg('Invalid network')
 
     # first, we check if this is a valid miner/worker, or it must be created
     # We only allow enabled miners here
     worker_id_str = get_header_field(request, 'Miner', None)
 
     if worker_id_str is None:
-        return HttpResponse(create_error_msg('WorkerID is missing'))
+        return create_error_msg('WorkerID is missing')
 
     try:
         full_worker_id = WorkerId(worker_id_str)
 
+        if is_miner_throttled(network, full_worker_id.get_address()):
+            return create_error_msg('Too many requests')
+
         # we try to get or create the miner and worker with this call
         miner_id, worker_id = get_or_create_miner_worker(network, full_worker_id.get_address(), full_worker_id.get_worker())
     except MinerNotEnabled:
-        return HttpResponse(create_error_msg('Miner %s is disabled' % full_worker_id.get_address()))
+        return create_error_msg('Miner %s is disabled' % full_worker_id.get_address())
     except InvalidWorkerdId:
-        return HttpResponse(create_error_msg('WorkerID %s is invalid' % full_worker_id.get_address()))
+        return create_error_msg('WorkerID %s is invalid' % worker_id_str)
 
     # load some additional information from the headers. These are unrealiable but nice to have
 
@@ -87,51 +126,65 @@ def readytomine2(request):
     agent = get_header_field(request, 'Agent', 'UNKNOWN')
     ip = get_client_ip(request)
 
-    # and calculate the HashTarget
-    hash_target = GetHashTarget(miner_id, network)
+    # and calculate the HashTarget. It depends on the difficulty of the worker,
+    # if variable difficulty is enabled
+    difficulty = get_difficulty(network, worker_id)
+    hash_target = GetHashTarget(miner_id, network, difficulty)
 
-    # now create new work for this miner/worker    
-    work = Work(worker_id=worker_id, thread_id=thread_id, network=network, hash_target=hash_target, ip=ip, os=os, agent=agent)
-    work.save(force_insert=True)
+    # now create new work for this miner/worker. Depending on the POOL_WORK_MODE,
+    # this is a database entry or a signed token
+    work_id = create_work(network, worker_id, miner_id, thread_id, hash_target, ip, os, agent, difficulty)
+    register_work(network, work_id, worker_id)
 
-    # build response
-    response = "<RESPONSE> <ADDRESS>{0}</ADDRESS><HASHTARGET>{1}</HASHTARGET><MINERGUID>{2}</MINERGUID><WORKID>{3}</WORKID></RESPONSE>".format(
-        settings.POOL_ADDRESS[network],
-        hash_target,
-        miner_id,
-        work.id
-    )
-    
-    return HttpResponse(response)
+    return create_work_msg(network, hash_target, miner_id, work_id)
 
-def solution(request):
-    """ called by the miner whenever a solution is found. We check the solution in
-        a different process to see if it is a valid solution, or some fake """
-        
+def solution_msg(request):
     # we first need the network (like "main" or "test"), as it is required in many steps
     try:
         network = get_network(request)
     except InvalidNetwork:
-        return HttpResponse(create_error_msg('Invalid network'))
+        return create_error_msg('Invalid network')
     
     solution_str = get_header_field(request, 'Solution', None)
     
     # an empty solution is always wrong
     if solution_str is None:
-        return HttpResponse(create_error_msg('Solution is missing'))
+        return create_error_msg('Solution is missing')
     
     # we will parse it here for a first test, but the real validation
     # will be done later
     try:
         solution = SolutionString(solution_str)
     except InvalidSolutionString:
-        return HttpResponse(create_error_msg('Invalit Solution'))
+        return create_error_msg('Invalit Solution')
+
+    if is_miner_throttled(network, solution.get_miner_id()):
+        return create_error_msg('Too many requests')
 
-    response = "<RESPONSE><STATUS>ok</STATUS><WORKID>%s</WORKID></RESPONSE><END></HTML>" % solution.get_work_id()    
+    # solutions that can not be valid are rejected here, so they never
+    # reach the backend
+    if settings.POOL_SOLUTION_PREVALIDATION:
+        reason = prevalidate_solution(network, solution)
+        if reason is not None:
+            return create_error_msg('Rejected solution (%s)' % reason)
+
+    # resubmitted or replayed solutions are answered here and never reach the task queue
+    if is_duplicate_solution(network, solution):
+        return create_error_msg('Duplicate solution')
+
+    # the variable difficulty is based on the amount of solutions of the worker
+    record_share(network, solution.get_work_id())
+
+    response = create_solution_msg(solution.get_work_id())
 
     # this is not a direct call to "process_solution", but puts it into
     # the celery/rabbitmq queue until it is processed from there with a
     # background task
-    process_solution.delay(network, solution_str)
-
-    return HttpResponse(response)
\ No newline at end of file
+    # With batching, the solution is collected for some milliseconds and
+    # send together with other solutions as a single task
+    if settings.POOL_SOLUTION_BATCH_SIZE > 1:
+        get_solution_batcher().add(network, solution_str)
+    else:
+        process_solution.delay(network, solution_str)
+
+    return response
\ No newline at end of file
@@ -0,0 +1,300 @@
+import time
+import uuid
+import hmac
+import base64
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from purepool.models.solution.models import Work
+from purepool.interface.hash import get_difficulty_from_target
+
+# every token starts with this prefix, so that we can tell them apart
+# from the uuids of the work entries in the database
+WORK_TOKEN_PREFIX = 'T'
+
+# the uuid of a Work row that is created for a token is derived from the
+# token itself with this namespace. Do NOT change it, or tokens already
+# handed out will reference a new row
+WORK_TOKEN_NAMESPACE = uuid.UUID('6a1e3b5c-1f7e-4d2b-9a55-0c3f5e6b7d21')
+
+class InvalidWorkToken(Exception):
+    pass
+
+class WorkTokenExpired(Exception):
+    pass
+
+def get_work_token_key():
+    """ the secret used to sign the tokens. The interface and the backend
+        must use the same key! """
+
+    key = settings.POOL_WORK_TOKEN_KEY
+    if key is None:
+        key = settings.SECRET_KEY
+
+    return key.encode('utf-8')
+
+def is_work_token(work_id):
+    """ True if the work id is a token and not the id of a Work in the database """
+
+    return str(work_id).startswith(WORK_TOKEN_PREFIX)
+
+def get_work_uuid(work_id):
+    """ the uuid of a database work id, or None if the work id is no valid uuid """
+
+    try:
+        return uuid.UUID(str(work_id))
+    except ValueError:
+        return None
+
+class WorkToken(object):
+    """ A signed, self-contained replacement for a Work entry in the database.
+        The token is given to the miner as WORKID and comes back with every
+        solution, so we do not need to store anything on readytomine2.
+
+        Format (all parts separated by a dot):
+            T<worker_id>.<miner_id>.<hash_target>.<thread_id>.<issued_at>.<signature>
+
+        The hash target is stored without its trailing zeros to keep the
+        token short. The network is not part of the token, but of the signature,
+        so a token can not be used in a different network.
+        """
+
+    def __init__(self, network, worker_id, miner_id, hash_target, thread_id, issued_at=None):
+        self.network = network
+        self.worker_id = int(worker_id)
+        self.miner_id = uuid.UUID(str(miner_id))
+        self.hash_target = hash_target
+        self.thread_id = str(thread_id)
+        self.issued_at = int(time.time()) if issued_at is None else int(issued_at)
+
+        # the thread id comes from the miner. As it is part of the token,
+        # we only allow simple values
+        if not self.thread_id.isalnum() or len(self.thread_id) > 20:
+            self.thread_id = '1'
+
+    def get_payload(self):
+        return '.'.join([
+            WORK_TOKEN_PREFIX + str(self.worker_id),
+            self.miner_id.hex,
+            self.hash_target.rstrip('0'),
+            self.thread_id,
+            str(self.issued_at),
+        ])
+
+    @staticmethod
+    def sign(network, payload):
+        message = ('%s|%s' % (network, payload)).encode('utf-8')
+        digest = hmac.new(get_work_token_key(), message, hashlib.sha256).digest()
+
+        # 16 bytes of the hmac are more than enough here
+        return base64.urlsafe_b64encode(digest[:16]).decode('ascii').rstrip('=')
+
+    def as_string(self):
+        payload = self.get_payload()
+        return '%s.%s' % (payload, WorkToken.sign(self.network, payload))
+
+    def get_uuid(self):
+        """ the id of the Work row that represents this token in the database """
+
+        return uuid.uuid5(WORK_TOKEN_NAMESPACE, self.as_string())
+
+    def get_age(self):
+        return int(time.time()) - self.issued_at
+
+    @classmethod
+    def from_string(cls, network, token, max_age=None):
+        """ validates the token and returns the WorkToken.
+            Raises InvalidWorkToken if the token was tampered with and
+            WorkTokenExpired if it is older than max_age seconds """
+
+        try:
+            payload, signature = token.rsplit('.', 1)
+            worker_id, miner_id, hash_target, thread_id, issued_at = payload.split('.')
+        except (ValueError, AttributeError):
+            raise InvalidWorkToken()
+
+        if not hmac.compare_digest(signature, cls.sign(network, payload)):
+            raise InvalidWorkToken()
+
+        try:
+            work_token = cls(
+                network=network,
+                worker_id=worker_id[len(WORK_TOKEN_PREFIX):],
+                miner_id=miner_id,
+                hash_target=hash_target.ljust(64, '0'),
+                thread_id=thread_id,
+                issued_at=issued_at,
+            )
+        except ValueError:
+            raise InvalidWorkToken()
+
+        if max_age is not None and work_token.get_age() > max_age:
+            raise WorkTokenExpired()
+
+        return work_token
+
+    def get_work(self):
+        """ returns an (unsaved) Work that holds the values of the token """
+
+        return Work(
+            id=self.get_uuid(),
+            worker_id=self.worker_id,
+            thread_id=self.thread_id,
+            hash_target=self.hash_target,
+            difficulty=get_difficulty_from_target(self.hash_target),
+            network=self.network,
+            ip='0.0.0.0',
+            os='',
+            agent='',
+        )
+
+# Works in the cache (POOL_WORK_MODE "cache"). The values of the Work are written to
+# the cache POOL_WORK_CACHE when it is created and kept for POOL_WORK_CACHE_TIMEOUT
+# seconds, the max age of a solution. The validation reads them from there, so the work
+# table is not queried for every solution. The database row is written later in batches
+# (see purepool.interface.batching), or, with POOL_WORK_CACHE_ONLY, with the first solution.
+
+# the fields of a Work that are in the cache
+WORK_CACHE_FIELDS = ('worker_id', 'thread_id', 'hash_target', 'difficulty', 'network', 'ip', 'os', 'agent')
+
+def get_work_cache():
+    return caches[settings.POOL_WORK_CACHE]
+
+def get_work_cache_key(work_uuid):
+    return 'work__%s' % work_uuid
+
+def get_work_values(work):
+    return dict((field, getattr(work, field)) for field in WORK_CACHE_FIELDS)
+
+def work_from_values(network, work_uuid, values):
+    """ the (unsaved) Work of the cached values, or None if it belongs to another network """
+
+    if values is None or values['network'] != network:
+        return None
+
+    return Work(id=work_uuid, **values)
+
+def get_cached_work(network, work_id):
+    """ the Work from the cache, or None """
+
+    work_uuid = get_work_uuid(work_id)
+    if work_uuid is None:
+        return None
+
+    return work_from_values(network, work_uuid, get_work_cache().get(get_work_cache_key(work_uuid)))
+
+def get_work_row_key(work_uuid):
+    return 'work_row__%s' % work_uuid
+
+def mark_works_saved(work_uuids):
+    """ remembers that the rows of the works are written """
+
+    get_work_cache().set_many(dict((get_work_row_key(work_uuid), True) for work_uuid in work_uuids), settings.POOL_WORK_CACHE_TIMEOUT)
+
+def write_work_row(work):
+    """ creates the row of an unsaved Work. A row written in the meantime (by
+        save_works or another solution) is kept """
+
+    Work.objects.bulk_create([work], ignore_conflicts=True)
+    mark_works_saved([work.pk])
+
+def save_work(work):
+    """ creates the row of an unsaved Work, if it does not exist yet. Returns its pk.
+        The row is only written once, afterwards a marker in the cache tells that it
+        exists (set here or by save_works), so the next solutions need no query """
+
+    if get_work_cache().get(get_work_row_key(work.pk)) is None:
+        write_work_row(work)
+
+    return work.pk
+
+def create_work(network, worker_id, miner_id, thread_id, hash_target, ip, os, agent, difficulty=1):
+    """ creates new work for a miner and returns the work id that is send to the miner.
+        Depending on settings.POOL_WORK_MODE, this is a row in the database ("database"),
+        a signed token that needs no database write at all ("token") or a Work in
+        the cache ("cache") """
+
+    if settings.POOL_WORK_MODE == 'token':
+        return WorkToken(network, worker_id, miner_id, hash_target, thread_id).as_string()
+
+    work = Work(worker_id=worker_id, thread_id=thread_id, network=network, hash_target=hash_target, difficulty=difficulty, ip=ip, os=os, agent=agent)
+
+    if settings.POOL_WORK_MODE == 'cache':
+        get_work_cache().set(get_work_cache_key(work.id), get_work_values(work), settings.POOL_WORK_CACHE_TIMEOUT)
+
+        if not settings.POOL_WORK_CACHE_ONLY:
+            from purepool.interface.batching import get_work_batcher
+            get_work_batcher().add(network, dict(get_work_values(work), id=str(work.id)))
+
+        return str(work.id)
+
+    work.save(force_insert=True)
+
+    return str(work.id)
+
+def load_work(network, work_id):
+    """ returns the Work for the work id send by the miner.
+        Tokens are validated in-process, without any database query. The work
+        returned for a token is not saved, use get_work_pk() for that.
+
+        Tokens and database ids are always both accepted, so switching the
+        POOL_WORK_MODE does not invalidate the work the miners already have.
+
+        Raises Work.DoesNotExist, InvalidWorkToken or WorkTokenExpired """
+
+    if is_work_token(work_id):
+        return WorkToken.from_string(network, work_id, max_age=settings.POOL_WORK_TOKEN_MAX_AGE).get_work()
+
+    work = get_cached_work(network, work_id)
+    if work is not None:
+        return work
+
+    return Work.objects.get(pk=work_id, network=network)
+
+def load_works(network, work_ids):
+    """ the Works of the database work ids (not tokens), from the cache or with one query.
+        Returns a dict uuid -> Work, without the unknown ids """
+
+    work_uuids = set([work_uuid for work_uuid in (get_work_uuid(work_id) for work_id in work_ids) if work_uuid is not None])
+
+    works = {}
+    cached = get_work_cache().get_many([get_work_cache_key(work_uuid) for work_uuid in work_uuids])
+    for work_uuid in work_uuids:
+        work = work_from_values(network, work_uuid, cached.get(get_work_cache_key(work_uuid), None))
+        if work is not None:
+            works[work_uuid] = work
+
+    missing = [work_uuid for work_uuid in work_uuids if not work_uuid in works]
+    if missing:
+        for work in Work.objects.filter(pk__in=missing, network=network):
+            works[work.pk] = work
+
+    return works
+
+def get_work_pk(network, work_id):
+    """ returns the primary key of the Work that a (rejected) solution should reference.
+        For tokens, the Work row is created here on first use. As the backend
+        only does this for submitted solutions, the work table stays small """
+
+    if not is_work_token(work_id):
+        work_uuid = get_work_uuid(work_id)
+        if work_uuid is None:
+            return work_id
+
+        # the row of a work from the cache might not be written yet. The work and
+        # the marker of its row are read with one request
+        cached = get_work_cache().get_many([get_work_cache_key(work_uuid), get_work_row_key(work_uuid)])
+        if cached.get(get_work_row_key(work_uuid), None) is None:
+            work = work_from_values(network, work_uuid, cached.get(get_work_cache_key(work_uuid), None))
+            if work is not None:
+                write_work_row(work)
+
+        return work_id
+
+    try:
+        work_token = WorkToken.from_string(network, work_id)
+    except InvalidWorkToken:
+        # same as an unknown work id from the database
+        return uuid.uuid5(WORK_TOKEN_NAMESPACE, work_id)
+
+    return save_work(work_token.get_work())
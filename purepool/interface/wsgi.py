@@ -0,0 +1,43 @@
+"""
+A minimal WSGI application that only speaks the mining protocol (Action.aspx).
+
+It skips the django url resolution, the HttpRequest/HttpResponse objects and all
+middlewares. The headers are read straight from the wsgi environ and handed to
+the same functions the django views use, so the responses are the same.
+
+Mount it in front of the django application, for example with mod_wsgi:
+
+    WSGIScriptAlias /Action.aspx /srv/purepool/purepool/interface/wsgi.py
+"""
+
+import os
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "purepool.settings")
+django.setup()
+
+from django.db import close_old_connections
+from purepool.interface.views import action_msg
+
+class MinerRequest(object):
+    """ the interface functions only need request.META, and the wsgi environ
+        has the same content as the django META dict """
+
+    __slots__ = ('META',)
+
+    def __init__(self, environ):
+        self.META = environ
+
+def application(environ, start_response):
+    try:
+        response = action_msg(MinerRequest(environ)).encode('utf-8')
+    finally:
+        # django does this with its request signals, which are not used here
+        close_old_connections()
+
+    start_response('200 OK', [
+        ('Content-Type', 'text/html; charset=utf-8'),
+        ('Content-Length', str(len(response))),
+    ])
+
+    return [response]
@@ -0,0 +1,132 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+# The highest block of the chain known to the pool. It is updated by
+# find_new_blocks and with every chain tip, so it may be some seconds
+# behind the real chain, but never ahead of it.
+
+# the interface asks the shared cache at most every X seconds per process
+CHAIN_HEIGHT_LOCAL_SECONDS = 5
+
+_local_heights = {}
+
+def get_chain_height_key(network):
+    return 'chain_tip_height__%s' % network
+
+def get_local_chain_height(network):
+    """ returns (found, height) from the process memory """
+
+    height, fetched_at = _local_heights.get(network, (None, None))
+    if fetched_at is None or time.monotonic() - fetched_at >= CHAIN_HEIGHT_LOCAL_SECONDS:
+        return False, None
+
+    return True, height
+
+def get_chain_height(network):
+    """ the known height of the chain, or None if not known (yet) """
+
+    found, height = get_local_chain_height(network)
+    if not found:
+        height = cache.get(get_chain_height_key(network))
+        _local_heights[network] = (height, time.monotonic())
+
+    return height
+
+async def aget_chain_height(network):
+    found, height = get_local_chain_height(network)
+    if not found:
+        height = await cache.aget(get_chain_height_key(network))
+        _local_heights[network] = (height, time.monotonic())
+
+    return height
+
+def set_chain_height(network, height):
+    cache.set(get_chain_height_key(network), height, None)
+    _local_heights.pop(network, None)
+
+# The chain tip is the current height and max nonce ("pinfo") of biblepayd.
+# They are kept in the cache for POOL_CHAIN_TIP_TIMEOUT seconds instead of asking
+# biblepayd for every solution. find_new_blocks removes the tip when a new block is found.
+#
+# The max nonce grows with the time since the last block, so a solution with a nonce
+# over the cached one asks biblepayd again. This is done at most every
+# CHAIN_TIP_REFETCH_SECONDS per process, so made-up nonces do not cost a call each.
+
+CHAIN_TIP_REFETCH_SECONDS = 1
+
+_refetched_at = {}
+
+def get_chain_tip_key(network):
+    return 'chain_tip__%s' % network
+
+def fetch_chain_tip(network, client):
+    """ asks biblepayd for the chain tip and puts it into the cache """
+
+    pinfo = client.pinfo()
+
+    tip = {
+        'height': int(pinfo['height']),
+        'pinfo': int(pinfo.get('pinfo', 0)),
+    }
+    cache.set(get_chain_tip_key(network), tip, settings.POOL_CHAIN_TIP_TIMEOUT)
+
+    known_height = get_chain_height(network)
+    if known_height is None or tip['height'] > known_height:
+        set_chain_height(network, tip['height'])
+
+    return tip
+
+async def afetch_chain_tip(network, client):
+    """ the same as fetch_chain_tip, with the AsyncBiblePayRpcClient """
+
+    pinfo = await client.pinfo()
+
+    tip = {
+        'height': int(pinfo['height']),
+        'pinfo': int(pinfo.get('pinfo', 0)),
+    }
+    await cache.aset(get_chain_tip_key(network), tip, settings.POOL_CHAIN_TIP_TIMEOUT)
+
+    known_height = await aget_chain_height(network)
+    if known_height is None or tip['height'] > known_height:
+        await cache.aset(get_chain_height_key(network), tip['height'], None)
+        _local_heights.pop(network, None)
+
+    return tip
+
+def needs_fetch(network, tip, min_height, min_pinfo):
+    if tip is None or (min_height is not None and tip['height'] < min_height):
+        return True
+
+    if min_pinfo is not None and tip['pinfo'] < min_pinfo:
+        now = time.monotonic()
+        if now - _refetched_at.get(network, 0) >= CHAIN_TIP_REFETCH_SECONDS:
+            _refetched_at[network] = now
+            return True
+
+    return False
+
+def get_chain_tip(network, client, min_height=None, min_pinfo=None):
+    """ returns the chain tip as dict with "height" and "pinfo" (the max nonce).
+        If the cached tip is lower then min_height, biblepayd is asked again,
+        as the cached tip might be from before the last block. The same for a
+        pinfo lower then min_pinfo, see above """
+
+    tip = cache.get(get_chain_tip_key(network))
+
+    if needs_fetch(network, tip, min_height, min_pinfo):
+        tip = fetch_chain_tip(network, client)
+
+    return tip
+
+async def aget_chain_tip(network, client, min_height=None, min_pinfo=None):
+    tip = await cache.aget(get_chain_tip_key(network))
+
+    if needs_fetch(network, tip, min_height, min_pinfo):
+        tip = await afetch_chain_tip(network, client)
+
+    return tip
+
+def invalidate_chain_tip(network):
+    cache.delete(get_chain_tip_key(network))
@@ -4,10 +4,12 @@ from celery import shared_task
 from django.utils import timezone
 from django.conf import settings
 from django.db import transaction
-from django.db.models import Max, Min, Count
+from django.db.models import Max, Min, Count, Sum
 from biblepay.clients import BiblePayRpcClient, BlockNotFound
 from purepool.models.block.models import Block
+from purepool.models.block.chaintip import set_chain_height, invalidate_chain_tip
 from purepool.models.solution.models import Solution
+from purepool.models.solution.tasks import audit_solutions
 from purepool.models.miner.models import Miner
 from puretransaction.models import Transaction
 
@@ -48,6 +50,7 @@ def find_new_blocks(network, mark_as_processed=False, max_height=None):
         next_max_height = current_max_height +1
     
     client = BiblePayRpcClient(network=network)
+    found_new_block = False
     
     # we loop until no new block is found
     while True:
@@ -123,6 +126,13 @@ def find_new_blocks(network, mark_as_processed=False, max_height=None):
         
         # next round with a inceased height
         next_max_height += 1
+        found_new_block = True
+
+    # the highest known block, used by the interface to find outdated solutions.
+    # The cached chain tip is outdated with a new block
+    if found_new_block:
+        set_chain_height(network, next_max_height - 1)
+        invalidate_chain_tip(network)
 
 @shared_task()
 def process_next_block(network):
@@ -227,6 +237,13 @@ def shareout_next_block(network, block_height=None, dry_run=False):
             block.save()
         return
     
+    # the provisionally accepted solutions of the block are checked now, so no
+    # cheater is paid. If biblepayd can not check all of them, we try again later
+    if not dry_run and not audit_solutions(network, block_id=block.pk):
+        block.process_status = 'BP'
+        block.save()
+        return
+
     # now we count the users solutions for the block
     # Important: Do not remove the ".order_by()", as it is required, or the result
     # will be wrong (seems to be a django problem)
@@ -235,7 +252,8 @@ def shareout_next_block(network, block_height=None, dry_run=False):
     if not dry_run: # in reall live, we only want entries that where not already processed
         qs = qs.filter(processed=False)
 
-    solution_counts = qs.values('miner_id').annotate(total=Count('miner_id')).order_by()
+    # Every solution counts as the difficulty of its work in shares (see purepool.interface.vardiff)
+    solution_counts = qs.values('miner_id').annotate(total=Sum('work__difficulty'), solutions=Count('miner_id')).order_by()
 
     # with that, we first calculate the total amount of relevant shares
     total_count = 0
@@ -243,7 +261,7 @@ def shareout_next_block(network, block_height=None, dry_run=False):
         total_count += solution_count['total']
 
     if settings.TASK_DEBUG:
-        print("Debug | ", "Solution count is ", total_count)
+        print("Debug | ", "Share count is ", total_count)
         print("Debug | ", "Miner/solution count is ", len(solution_counts))
         
     # if there are no shares, then there is nothing todo here anymore
@@ -268,7 +286,7 @@ def shareout_next_block(network, block_height=None, dry_run=False):
     if settings.TASK_DEBUG:
         print("Debug | ", "Miner subsidy is ", miner_subsidy)
     
-    # calculcation of the amount of bbp per user based on the solutions of the block
+    # calculcation of the amount of bbp per user based on the shares of the block
     subsidy_per_solution = miner_subsidy / total_count
 
     if settings.TASK_DEBUG:
@@ -282,7 +300,7 @@ def shareout_next_block(network, block_height=None, dry_run=False):
         for solution_count in solution_counts:
             user_subsidy = subsidy_per_solution * solution_count['total']
             
-            inote = 'BLOCK:'+str(block.height)+'|SOLUTIONS:'+str(solution_count['total'])
+            inote = 'BLOCK:'+str(block.height)+'|SOLUTIONS:'+str(solution_count['solutions'])+'|SHARES:'+str(solution_count['total'])
         
             tx = Transaction(
                 network = network,
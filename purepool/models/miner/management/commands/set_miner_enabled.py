@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+from purepool.models.miner.models import Miner
+
+class Command(BaseCommand):
+    help = 'Disables (or enables) a miner. The interface processes see the change at once, as their cached ids are invalidated'
+
+    def add_arguments(self, parser):
+        parser.add_argument('network', type=str, help='The network of the miner',)
+        parser.add_argument('address', type=str, help='The address of the miner',)
+        parser.add_argument('--enable', action='store_true', help='Enable the miner again',)
+
+    def handle(self, *args, **options):
+        miner = Miner.objects.filter(network=options['network'], address=options['address']).first()
+        if miner is None:
+            raise CommandError('Miner not found')
+
+        miner.set_enabled(options['enable'])
+
+        print(miner.address, 'enabled' if miner.enabled else 'disabled')
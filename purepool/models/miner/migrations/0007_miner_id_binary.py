@@ -0,0 +1,60 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+import uuid
+import purepool.core.fields
+from django.db import migrations
+from purepool.core.fields import get_binary_uuid_sql
+
+# the miner id and all columns that reference it, as (table, column, null)
+COLUMNS = [
+    ('miner_miner', 'id', False),
+    ('miner_worker', 'miner_id', False),
+    ('solution_solution', 'miner_id', False),
+    ('solution_rejectedsolution', 'miner_id', False),
+    ('solution_rejectedsolutioncount', 'miner_id', False),
+    ('block_block', 'miner_id', True),
+    ('puretransaction_transaction', 'miner_id', False),
+    ('puretransaction_transactionerror', 'miner_id', False),
+]
+
+def convert_columns(schema_editor, to_binary):
+    """ only MySQL stores the BinaryUUIDField differently, the
+        other databases keep their columns """
+
+    connection = schema_editor.connection
+    if connection.vendor != 'mysql':
+        return
+
+    with connection.cursor() as cursor:
+        for sql in get_binary_uuid_sql(cursor, COLUMNS, to_binary):
+            cursor.execute(sql)
+
+def to_binary(apps, schema_editor):
+    convert_columns(schema_editor, True)
+
+def to_text(apps, schema_editor):
+    convert_columns(schema_editor, False)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('miner', '0006_auto_20180324_1713'),
+        ('block', '0002_auto_20180204_1804'),
+        ('puretransaction', '0003_transactionerror'),
+        ('solution', '0009_solutionhash'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='miner',
+                    name='id',
+                    field=purepool.core.fields.BinaryUUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(to_binary, to_text),
+            ],
+        ),
+    ]
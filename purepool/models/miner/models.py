@@ -1,11 +1,16 @@
 import uuid
 import datetime
+import threading
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.db import models
-from django.db.models import Count, Sum
+from django.db.models import Count, Sum, F
 from django.core.cache import cache
 from django.utils.translation import gettext as _
 from django.utils import timezone
 from biblepay.hash import validate_bibleplay_address_format
+from purepool.core.lru import VersionedLRUCache
+from purepool.core.fields import BinaryUUIDField
 
 class MinerNotFound(Exception):
     pass
@@ -22,10 +27,130 @@ class InvalidBiblepayAddress(Exception):
 class WorkerNotFound(Exception):
     pass
 
+def get_miner_cache_key(network, address):
+    return 'miner_id__%s__%s' % (network.replace(' ', '__'), address.replace(' ', '__'))
+
+def get_worker_cache_key(network, address, worker_name):
+    return 'miner_id__%s__%s__%s' % (network, address.replace(' ', '__'), worker_name.replace(' ', '__'))
+
+# the version of the miner and worker ids in the shared cache. It is changed
+# when a miner is disabled, so that the local id caches are cleared
+ID_CACHE_VERSION_KEY = 'miner_id_cache_version'
+
+_local_id_cache = None
+_local_id_cache_lock = threading.Lock()
+
+def get_local_id_cache():
+    """ the in-process cache of (miner_id, worker_id) pairs of enabled miners, in front
+        of the shared cache. Known workers are found here without any network call.
+        It is filled with the most active workers from the database when it is
+        created. Returns None if disabled by settings.POOL_LOCAL_ID_CACHE_SIZE """
+
+    global _local_id_cache
+
+    if not settings.POOL_LOCAL_ID_CACHE_SIZE:
+        return None
+
+    with _local_id_cache_lock:
+        if _local_id_cache is None:
+            # the ids expire like the ones in the shared cache, so a miner disabled without
+            # invalidate_miner_ids (like with sql) is seen after the same time
+            local_id_cache = VersionedLRUCache(settings.POOL_LOCAL_ID_CACHE_SIZE, ID_CACHE_VERSION_KEY, settings.POOL_LOCAL_ID_CACHE_CHECK_INTERVAL, cache.default_timeout)
+            local_id_cache.check()
+
+            if settings.POOL_LOCAL_ID_CACHE_WARMUP:
+                warm_id_caches(local_id_cache)
+
+            _local_id_cache = local_id_cache
+
+    return _local_id_cache
+
+def clear_local_id_cache():
+    """ forgets the local ids of this process """
+
+    if _local_id_cache is not None:
+        _local_id_cache.clear()
+
+def warm_id_caches(local_id_cache):
+    """ loads the workers of the most active miners from the database and puts them into
+        the local and the shared cache. Without this, every interface process
+        would ask the database for every miner after a restart """
+
+    workers = Worker.objects.order_by(F('miner__last_accepted_solution_at').desc(nulls_last=True)).values_list(
+        'id', 'name', 'miner_id', 'miner__address', 'miner__network', 'miner__enabled'
+    )[0:local_id_cache.max_size]
+
+    shared_ids = {}
+    local_ids = {}
+    for worker_id, worker_name, miner_id, address, network, enabled in workers:
+        miner_key = get_miner_cache_key(network, address)
+        worker_key = get_worker_cache_key(network, address, worker_name)
+
+        if enabled:
+            shared_ids[miner_key] = miner_id
+            shared_ids[worker_key] = worker_id
+            local_ids[worker_key] = (miner_id, worker_id)
+        else:
+            shared_ids[miner_key] = 'DISABLED'
+
+    cache.set_many(shared_ids)
+    local_id_cache.set_many(local_ids)
+
+def invalidate_miner_ids(miners):
+    """ called when miners are disabled (or enabled again). The next request of
+        the miners will ask the database again. Only the workers of these miners are
+        removed from the local caches """
+
+    miners = dict((miner.id, miner) for miner in miners)
+    if not miners:
+        return
+
+    cache.delete_many([get_miner_cache_key(miner.network, miner.address) for miner in miners.values()])
+
+    local_id_cache = get_local_id_cache()
+    if local_id_cache is not None:
+        workers = Worker.objects.filter(miner_id__in=list(miners)).values_list('miner_id', 'name')
+        local_id_cache.invalidate([get_worker_cache_key(miners[miner_id].network, miners[miner_id].address, name) for miner_id, name in workers])
+
+def get_cached_miner_worker(network, address, worker_name):
+    """ returns (miner_id, worker_id) from the local cache or the shared cache.
+        Both values are None, if they are not known in the caches.
+        if a miner is disabled, MinerNotEnabled will be raised """
+
+    local_id_cache = get_local_id_cache()
+    worker_key = get_worker_cache_key(network, address, worker_name)
+
+    if local_id_cache is not None:
+        local_id_cache.check()
+
+        ids = local_id_cache.get(worker_key)
+        if ids is not None:
+            return ids
+
+    # the miner and the worker with one request. The version of the local
+    # cache is checked for free with the same request
+    miner_key = get_miner_cache_key(network, address)
+    ids = cache.get_many([miner_key, worker_key, ID_CACHE_VERSION_KEY])
+
+    miner_id = ids.get(miner_key, None)
+    worker_id = ids.get(worker_key, None)
+
+    if miner_id == 'DISABLED':
+        raise MinerNotEnabled
+
+    if miner_id is None or worker_id is None:
+        return None, None
+
+    if local_id_cache is not None:
+        local_id_cache.check_version(ids.get(ID_CACHE_VERSION_KEY, None))
+        local_id_cache.set(worker_key, (miner_id, worker_id))
+
+    return miner_id, worker_id
+
 def get_miner_id_by_address(network, address):
     """ returns the miner database id by the address. Uses the cache to speed up everything """
     
-    key = 'miner_id__%s__%s' % (network.replace(' ', '__'), address.replace(' ', '__'))
+    key = get_miner_cache_key(network, address)
     miner_id = cache.get(key, None)
     
     if miner_id == 'DISABLED':
@@ -52,7 +177,7 @@ def get_miner_id_by_address(network, address):
 def get_worker_id_by_name(network, address, worker_name):
     """ returns the workers database id by itsname (and its miner address). Uses the cache to speed up everything """
     
-    key = 'miner_id__%s__%s__%s' % (network, address.replace(' ', '__'), worker_name.replace(' ', '__'))
+    key = get_worker_cache_key(network, address, worker_name)
     worker_id = cache.get(key, None)
     
     if worker_id is None:
@@ -67,6 +192,23 @@ def get_worker_id_by_name(network, address, worker_name):
     
     return worker_id
 
+def get_worker_miner_key(worker_id):
+    return 'worker_miner_id__%s' % worker_id
+
+def get_worker_miner_id(worker_id):
+    """ returns the miner database id of a worker, or None if the worker is unknown.
+        A worker never changes its miner, so the id is cached """
+
+    key = get_worker_miner_key(worker_id)
+    miner_id = cache.get(key, None)
+
+    if miner_id is None:
+        miner_id = Worker.objects.filter(pk=worker_id).values_list('miner_id', flat=True).first()
+        if miner_id is not None:
+            cache.set(key, miner_id)
+
+    return miner_id
+
 def get_or_create_miner_worker(network, address, worker_name):
     """ tries to find the miner_id and worker_id (db-ids) in the cache or the database.
         If it can not be found, new entries will be created.
@@ -75,6 +217,11 @@ def get_or_create_miner_worker(network, address, worker_name):
         
     if not validate_bibleplay_address_format(address):
         raise InvalidBiblepayAddress()
+
+    # known workers are found in the caches
+    miner_id, worker_id = get_cached_miner_worker(network, address, worker_name)
+    if miner_id is not None:
+        return miner_id, worker_id
     
     miner_id = None
     try:
@@ -99,14 +246,79 @@ def get_or_create_miner_worker(network, address, worker_name):
         worker = Worker(miner_id=miner_id, name=worker_name)
         worker.save(force_insert=True)
         worker_id = worker.id
+
+    local_id_cache = get_local_id_cache()
+    if local_id_cache is not None:
+        local_id_cache.set(get_worker_cache_key(network, address, worker_name), (miner_id, worker_id))
     
     return miner_id, worker_id
 
+async def aget_or_create_miner_worker(network, address, worker_name):
+    """ async version of get_or_create_miner_worker for the asgi interface.
+        Known miners and workers are found in the local cache or with a single
+        async cache request, everything else (including the database) is done by
+        get_or_create_miner_worker in a thread """
+
+    if not validate_bibleplay_address_format(address):
+        raise InvalidBiblepayAddress()
+
+    # the first call creates (and fills) the local cache from the database
+    if _local_id_cache is None:
+        local_id_cache = await sync_to_async(get_local_id_cache, thread_sensitive=False)()
+    else:
+        local_id_cache = _local_id_cache
+
+    worker_key = get_worker_cache_key(network, address, worker_name)
+
+    if local_id_cache is not None:
+        await local_id_cache.acheck()
+
+        ids = local_id_cache.get(worker_key)
+        if ids is not None:
+            return ids
+
+    miner_key = get_miner_cache_key(network, address)
+
+    ids = await cache.aget_many([miner_key, worker_key, ID_CACHE_VERSION_KEY])
+
+    miner_id = ids.get(miner_key, None)
+    worker_id = ids.get(worker_key, None)
+
+    if miner_id == 'DISABLED':
+        raise MinerNotEnabled
+
+    if miner_id is not None and worker_id is not None:
+        if local_id_cache is not None:
+            await local_id_cache.acheck_version(ids.get(ID_CACHE_VERSION_KEY, None))
+            local_id_cache.set(worker_key, (miner_id, worker_id))
+
+        return miner_id, worker_id
+
+    return await sync_to_async(get_or_create_miner_worker, thread_sensitive=False)(network, address, worker_name)
+
+
+class MinerQuerySet(models.QuerySet):
+
+    def update(self, **kwargs):
+        """ the cached ids of the miners are invalidated if "enabled" is changed,
+            so a miner can be disabled with Miner.objects.filter(...).update(enabled=False) """
+
+        if not 'enabled' in kwargs:
+            return super().update(**kwargs)
+
+        miners = list(self.exclude(enabled=kwargs['enabled']).only('id', 'network', 'address'))
+        if not miners:
+            return 0
+
+        changed = super(MinerQuerySet, self.exclude(enabled=kwargs['enabled'])).update(**kwargs)
+        invalidate_miner_ids(miners)
+
+        return changed
 
 class Miner(models.Model):
     # we use a uuid for the miner id as this id will be visible in the transactions
-    # we do not want any funny attacks by having guessable ids
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # we do not want any funny attacks by having guessable ids. Binary on MySQL, see purepool.core.fields
+    id = BinaryUUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     
     # the target bbp address of the miner
     address = models.CharField(max_length=100, unique=True)
@@ -145,6 +357,37 @@ class Miner(models.Model):
     # when the miner was created
     inserted_at = models.DateTimeField(auto_now_add=True)
 
+    objects = MinerQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        miner = super().from_db(db, field_names, values)
+
+        # see save()
+        if 'enabled' in field_names:
+            miner._loaded_enabled = miner.enabled
+
+        return miner
+
+    def save(self, *args, **kwargs):
+        """ the interface caches the ids of enabled miners, so they are invalidated
+            when "enabled" was changed """
+
+        changed = not self._state.adding and getattr(self, '_loaded_enabled', self.enabled) != self.enabled
+
+        super().save(*args, **kwargs)
+        self._loaded_enabled = self.enabled
+
+        if changed:
+            invalidate_miner_ids([self])
+
+    def set_enabled(self, enabled):
+        """ disables (or enables) the miner """
+
+        Miner.objects.filter(pk=self.pk).update(enabled=enabled)
+        self.enabled = enabled
+        self._loaded_enabled = enabled
+
     def update_balance(self):
         """ updates the balance cache """
         
@@ -0,0 +1,150 @@
+import random
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from purepool.core.metrics import count
+
+# The bible hash of a solution can be calculated by biblepayd ("rpc") or in the
+# process itself ("local"). The algorithm (X11 and the verses of biblepayd) is not
+# part of the pool, the local implementation is a function set by
+# POOL_BIBLEHASH_FUNCTION (a dotted path), called like the rpc:
+# function(block_hash, block_time, prev_block_time, prev_height, nonce)
+# and returning the hash as hex string.
+#
+# Before a local implementation is used, it runs in the "shadow" mode: biblepayd
+# calculates the hash, and for POOL_BIBLEHASH_SHADOW_SAMPLE of the solutions the
+# local implementation too. Every difference is counted as "biblehash_mismatch",
+# and the last one is shown by the "show_metrics" command.
+
+BIBLEHASH_MISMATCH_KEY = 'biblehash__mismatch'
+
+class RpcBibleHashVerifier(object):
+
+    def __init__(self, client):
+        self.client = client
+
+    def bible_hash(self, block_hash, block_time, prev_block_time, prev_height, nonce):
+        return self.client.bible_hash(block_hash, block_time, prev_block_time, prev_height, nonce)
+
+    def bible_hash_many(self, items):
+        """ the hashes of a list of (block_hash, block_time, prev_block_time, prev_height, nonce),
+            in one batch call. A failed call is returned as exception """
+
+        return self.client.bible_hash_many(items)
+
+class LocalBibleHashVerifier(object):
+
+    def __init__(self, function):
+        self.function = function
+
+    def bible_hash(self, block_hash, block_time, prev_block_time, prev_height, nonce):
+        return self.function(block_hash, block_time, prev_block_time, prev_height, nonce)
+
+    def bible_hash_many(self, items):
+        return [self.function(*item) for item in items]
+
+class ShadowBibleHashVerifier(object):
+    """ uses the result of the primary verifier, and compares it with
+        the shadow verifier for a sample of the hashes """
+
+    def __init__(self, primary, shadow, sample):
+        self.primary = primary
+        self.shadow = shadow
+        self.sample = sample
+
+    def is_sampled(self):
+        return random.random() < self.sample
+
+    def bible_hash(self, block_hash, block_time, prev_block_time, prev_height, nonce):
+        bible_hash = self.primary.bible_hash(block_hash, block_time, prev_block_time, prev_height, nonce)
+
+        if self.is_sampled():
+            self.compare(bible_hash, block_hash, block_time, prev_block_time, prev_height, nonce)
+
+        return bible_hash
+
+    def bible_hash_many(self, items):
+        bible_hashes = self.primary.bible_hash_many(items)
+
+        for item, bible_hash in zip(items, bible_hashes):
+            # failed calls of the primary verifier are nothing to compare
+            if not isinstance(bible_hash, Exception) and self.is_sampled():
+                self.compare(bible_hash, *item)
+
+        return bible_hashes
+
+    def compare(self, bible_hash, block_hash, block_time, prev_block_time, prev_height, nonce):
+        """ compares the hash of the primary verifier with the shadow verifier """
+
+        count('biblehash_shadow_checked')
+
+        try:
+            shadow_hash = self.shadow.bible_hash(block_hash, block_time, prev_block_time, prev_height, nonce)
+        except Exception as e:
+            shadow_hash = 'ERROR %s' % type(e).__name__
+
+        if shadow_hash == bible_hash:
+            return True
+
+        count('biblehash_mismatch')
+
+        mismatch = ' '.join(str(value) for value in (block_hash, block_time, prev_block_time, prev_height, nonce, bible_hash, shadow_hash))
+        cache.set(BIBLEHASH_MISMATCH_KEY, mismatch, None)
+
+        if settings.TASK_DEBUG:
+            print("Debug | ", "Bible hash mismatch", mismatch)
+
+        return False
+
+def get_last_mismatch():
+    """ the last difference found by the shadow mode, as string of the fields,
+        the hash of the primary and of the shadow verifier """
+
+    return cache.get(BIBLEHASH_MISMATCH_KEY)
+
+def reset_last_mismatch():
+    cache.delete(BIBLEHASH_MISMATCH_KEY)
+
+def check_bible_hash_settings():
+    """ raises ImproperlyConfigured if the POOL_BIBLEHASH_ settings can not work. Called
+        on the start of the validator service, so a wrong mode is found before the first
+        solution """
+
+    mode = settings.POOL_BIBLEHASH_VERIFIER
+
+    if mode not in ('rpc', 'local', 'shadow'):
+        raise ImproperlyConfigured('POOL_BIBLEHASH_VERIFIER must be "rpc", "local" or "shadow", not "%s"' % mode)
+
+    if mode != 'rpc' and settings.POOL_BIBLEHASH_FUNCTION is None:
+        raise ImproperlyConfigured('POOL_BIBLEHASH_VERIFIER "%s" needs a local implementation in POOL_BIBLEHASH_FUNCTION' % mode)
+
+def get_local_function(path=None):
+    """ the local implementation, from path or POOL_BIBLEHASH_FUNCTION """
+
+    path = path or settings.POOL_BIBLEHASH_FUNCTION
+
+    try:
+        return import_string(path)
+    except ImportError as e:
+        raise ImproperlyConfigured('The local bible hash %s can not be imported: %s' % (path, e))
+
+def get_bible_hash_verifier(client):
+    """ the verifier set by POOL_BIBLEHASH_VERIFIER. client is the BiblePayRpcClient
+        used for the rpc calls """
+
+    check_bible_hash_settings()
+
+    mode = settings.POOL_BIBLEHASH_VERIFIER
+
+    if mode == 'local':
+        return LocalBibleHashVerifier(get_local_function())
+
+    if mode == 'shadow':
+        return ShadowBibleHashVerifier(
+            RpcBibleHashVerifier(client),
+            LocalBibleHashVerifier(get_local_function()),
+            settings.POOL_BIBLEHASH_SHADOW_SAMPLE,
+        )
+
+    return RpcBibleHashVerifier(client)
@@ -0,0 +1,26 @@
+from django.conf import settings
+from purepool.core.commands import TaskCommand
+from purepool.models.solution.tasks import audit_solutions
+
+class Command(TaskCommand):
+    help = 'Creates tasks that check the provisionally accepted solutions with biblepayd'
+
+    def add_arguments(self, parser):
+        super(Command, self).add_arguments(parser)
+        
+        parser.add_argument('--network', default=None, type=str, help='Limit the task to one network',)
+
+    def handle(self, *args, **options):
+        super(Command, self).handle(*args, **options)
+        
+        # per default, the script creates tasks for all networks        
+        networks = settings.BIBLEPAY_NETWORKS
+        
+        network = options.get('network')
+        if network is not None:
+            networks = (network,)
+        
+        for network in networks:
+            audit_solutions.delay(
+                network=network
+            )
@@ -0,0 +1,56 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from purepool.models.solution.biblehash import RpcBibleHashVerifier, LocalBibleHashVerifier, get_local_function
+from biblepay.clients import BiblePayRpcClient
+
+class Command(BaseCommand):
+    help = 'Compares the bible hashes per second of biblepayd (single calls and batches) and the local implementation (POOL_BIBLEHASH_FUNCTION)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--network', default=settings.BIBLEPAY_DEFAULT_NETWORK, help='The biblepayd to use',)
+        parser.add_argument('--hashes', default=1000, type=int, help='Hashes calculated per run',)
+        parser.add_argument('--batch-size', default=100, type=int, help='Hashes per rpc batch',)
+        parser.add_argument('--function', default=settings.POOL_BIBLEHASH_FUNCTION, help='The local implementation, as dotted path',)
+
+    def get_items(self, count):
+        """ the fields of a solution, with a different nonce for every hash """
+
+        return [('4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96', '1518041523', '1518041437', '19309', str(nonce)) for nonce in range(0, count)]
+
+    def run(self, verifier, items):
+        start = time.perf_counter()
+        hashes = [verifier.bible_hash(*item) for item in items]
+        return len(items) / (time.perf_counter() - start), hashes
+
+    def run_batch(self, verifier, items, batch_size):
+        start = time.perf_counter()
+        hashes = []
+        for i in range(0, len(items), batch_size):
+            hashes.extend(verifier.bible_hash_many(items[i:i + batch_size]))
+        return len(items) / (time.perf_counter() - start), hashes
+
+    def handle(self, *args, **options):
+        items = self.get_items(options['hashes'])
+        verifiers = [('rpc', RpcBibleHashVerifier(BiblePayRpcClient(options['network'])), False)]
+        verifiers.append(('rpc batch', verifiers[0][1], True))
+
+        if options['function'] is not None:
+            verifiers.append(('local', LocalBibleHashVerifier(get_local_function(options['function'])), False))
+
+        results = {}
+        for name, verifier, batch in verifiers:
+            if batch:
+                hps, results[name] = self.run_batch(verifier, items, options['batch_size'])
+            else:
+                hps, results[name] = self.run(verifier, items)
+            print(name.ljust(20), '%10.0f hashes/s' % hps)
+
+        if options['function'] is None:
+            print('local'.ljust(20), 'not measured, set POOL_BIBLEHASH_FUNCTION or --function')
+
+        # all implementations must calculate the same hashes
+        for name, hashes in results.items():
+            mismatches = len([1 for a, b in zip(results['rpc'], hashes) if a != b])
+            if mismatches:
+                print('%s: %s of %s hashes differ from rpc' % (name, mismatches, len(items)))
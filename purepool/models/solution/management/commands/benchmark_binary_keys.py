@@ -0,0 +1,77 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from django.db import connection, models, transaction
+from purepool.core.fields import HexBinaryField, BinaryUUIDField
+
+class Command(BaseCommand):
+    help = 'Compares the index size and inserts/second of the bible hashes and uuids as text and binary. Creates two tables in the configured database, they are dropped afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default=100000, type=int, help='Rows inserted per table',)
+        parser.add_argument('--batch-size', default=500, type=int, help='Rows per insert',)
+
+    def get_fields(self):
+        """ the columns of the solution table, before and after """
+
+        return [
+            ('text', models.CharField(max_length=100), models.UUIDField()),
+            ('binary', HexBinaryField(max_length=100), BinaryUUIDField()),
+        ]
+
+    def create_table(self, cursor, table, hash_field, uuid_field):
+        cursor.execute('CREATE TABLE %s (id bigint NOT NULL PRIMARY KEY, bible_hash %s NOT NULL, work_id %s NOT NULL)' % (
+            table, hash_field.db_type(connection), uuid_field.db_type(connection),
+        ))
+        cursor.execute('CREATE UNIQUE INDEX %s_bible_hash ON %s (bible_hash)' % (table, table))
+        cursor.execute('CREATE INDEX %s_work_id ON %s (work_id)' % (table, table))
+
+    def run_inserts(self, cursor, table, hash_field, uuid_field, options):
+        sql = 'INSERT INTO %s (id, bible_hash, work_id) VALUES (%%s, %%s, %%s)' % table
+        work_ids = [uuid.uuid4() for i in range(0, 100)]
+
+        start = time.perf_counter()
+        for first in range(0, options['rows'], options['batch_size']):
+            with transaction.atomic():
+                cursor.executemany(sql, [(
+                    i,
+                    hash_field.get_db_prep_value(uuid.uuid4().hex + uuid.uuid4().hex, connection),
+                    uuid_field.get_db_prep_value(work_ids[i % len(work_ids)], connection),
+                ) for i in range(first, min(first + options['batch_size'], options['rows']))])
+        return options['rows'] / (time.perf_counter() - start)
+
+    def get_index_size(self, cursor, table):
+        """ the size of the secondary indexes in bytes, or None if unknown """
+
+        if connection.vendor == 'mysql':
+            cursor.execute('ANALYZE TABLE %s' % table)
+            cursor.fetchall()
+            cursor.execute('SELECT INDEX_LENGTH FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s', [table])
+            return cursor.fetchone()[0]
+
+        if connection.vendor == 'sqlite':
+            try:
+                cursor.execute('SELECT SUM(pgsize) FROM dbstat WHERE name IN (%s, %s)', [table + '_bible_hash', table + '_work_id'])
+                return cursor.fetchone()[0]
+            except Exception:
+                # sqlite without the dbstat table
+                return None
+
+        if connection.vendor == 'postgresql':
+            cursor.execute('SELECT pg_indexes_size(%s)', [table])
+            return cursor.fetchone()[0]
+
+        return None
+
+    def handle(self, *args, **options):
+        with connection.cursor() as cursor:
+            for name, hash_field, uuid_field in self.get_fields():
+                table = 'benchmark_keys_%s' % name
+                self.create_table(cursor, table, hash_field, uuid_field)
+
+                try:
+                    ips = self.run_inserts(cursor, table, hash_field, uuid_field, options)
+                    size = self.get_index_size(cursor, table)
+                    print(name.ljust(10), '%10.0f inserts/s' % ips, 'index size', 'unknown' if size is None else '%.1f MB' % (size / 1024 / 1024))
+                finally:
+                    cursor.execute('DROP TABLE %s' % table)
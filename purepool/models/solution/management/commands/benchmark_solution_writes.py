@@ -0,0 +1,56 @@
+import time
+import uuid
+from django.core.management.base import BaseCommand
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import Solution, Work
+from purepool.models.solution.writer import BulkWriter
+
+class Command(BaseCommand):
+    help = 'Compares the inserts/second of single solution.save() calls with the BulkWriter. Writes into the configured database, the rows are deleted afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solutions', default=5000, type=int, help='Solutions inserted per run',)
+        parser.add_argument('--write-size', default=500, type=int, help='Rows per bulk insert',)
+        parser.add_argument('--write-delay', default=0.05, type=float, help='Seconds until the collected rows are written',)
+
+    def get_solutions(self, work, count):
+        # random bible hashes, so the unique index is used like with real solutions
+        return [Solution(
+            work_id = work.id,
+            miner_id = work.worker.miner_id,
+            network = 'benchmark',
+            bible_hash = uuid.uuid4().hex + uuid.uuid4().hex,
+            hps = 1,
+        ) for i in range(0, count)]
+
+    def run_save(self, solutions):
+        start = time.perf_counter()
+        for solution in solutions:
+            solution.save()
+        return len(solutions) / (time.perf_counter() - start)
+
+    def run_writer(self, solutions, options):
+        writer = BulkWriter(options['write_size'], options['write_delay'])
+
+        start = time.perf_counter()
+        for solution in solutions:
+            writer.add(solution)
+        writer.stop()
+        return len(solutions) / (time.perf_counter() - start)
+
+    def handle(self, *args, **options):
+        miner = Miner.objects.create(address='benchmark', network='benchmark')
+        worker = Worker.objects.create(miner=miner, name='benchmark')
+        work = Work.objects.create(worker=worker, hash_target='0' * 64, network='benchmark', ip='127.0.0.1')
+
+        try:
+            ips = self.run_save(self.get_solutions(work, options['solutions']))
+            print('solution.save()'.ljust(20), '%10.0f inserts/s' % ips)
+
+            ips = self.run_writer(self.get_solutions(work, options['solutions']), options)
+            print('BulkWriter'.ljust(20), '%10.0f inserts/s' % ips)
+
+            print('%s rows written' % Solution.objects.filter(network='benchmark').count())
+        finally:
+            Solution.objects.filter(network='benchmark').delete()
+            miner.delete()
@@ -0,0 +1,28 @@
+from django.db import connection
+from django.core.management.base import BaseCommand, CommandError
+from purepool.models.solution.partitions import manage_partitions, get_setup_sql
+
+class Command(BaseCommand):
+    help = 'Creates the daily partitions of the solution tables ahead of time and drops the expired ones. With --setup, the tables are converted to partitioned tables first (MySQL only, see POOL_PARTITIONING)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--setup', action='store_true', help='Convert the tables. This locks and copies the whole tables!',)
+        parser.add_argument('--dry-run', action='store_true', help='Only print the statements of --setup',)
+        parser.add_argument('--ahead', default=None, type=int, help='Days the partitions are created ahead (POOL_PARTITIONS_AHEAD)',)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'mysql':
+            raise CommandError('Partitions are only supported with MySQL')
+
+        if options['setup']:
+            with connection.cursor() as cursor:
+                for sql in get_setup_sql(cursor, ahead=options['ahead']):
+                    print(sql)
+                    if not options['dry_run']:
+                        cursor.execute(sql)
+
+            if options['dry_run']:
+                return
+
+        for table, (created, dropped) in manage_partitions(ahead=options['ahead']).items():
+            print(table, 'created:', len(created), 'dropped:', len(dropped))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from purepool.celery import app
+from purepool.models.solution.validator import ValidatorService
+
+class Command(BaseCommand):
+    help = 'Runs the asyncio validator service, that validates the solutions of the queue instead of the celery workers. Stops with SIGTERM or SIGINT after the solutions in flight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queue', default=settings.POOL_VALIDATOR_QUEUE, help='The queue to consume',)
+        parser.add_argument('--in-flight', default=settings.POOL_VALIDATOR_IN_FLIGHT, type=int, help='Solutions validated at once',)
+
+    def handle(self, *args, **options):
+        service = ValidatorService(
+            app, options['queue'], options['in_flight'],
+            settings.POOL_VALIDATOR_FLUSH_SIZE, settings.POOL_VALIDATOR_FLUSH_MS / 1000,
+        )
+        service.run()
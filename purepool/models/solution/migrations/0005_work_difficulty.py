@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solution', '0004_rejectedsolution_exception_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='work',
+            name='difficulty',
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solution', '0005_work_difficulty'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='solution',
+            name='provisional',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
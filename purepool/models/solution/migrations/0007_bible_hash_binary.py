@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+import purepool.core.fields
+from django.db import migrations
+from purepool.core.fields import hex_to_bytes, bytes_to_hex
+
+CHUNK_SIZE = 5000
+
+def convert_bible_hashes(connection, convert):
+    """ the column type is changed by AlterField, but the values keep their
+        text. They are converted here, in chunks of the primary key """
+
+    for table in ('solution_solution', 'solution_rejectedsolution'):
+        quoted = connection.ops.quote_name(table)
+        last_id = 0
+
+        with connection.cursor() as cursor:
+            while True:
+                cursor.execute('SELECT id, bible_hash FROM %s WHERE id > %%s ORDER BY id LIMIT %d' % (quoted, CHUNK_SIZE), [last_id])
+                rows = cursor.fetchall()
+                if not rows:
+                    break
+
+                cursor.executemany('UPDATE %s SET bible_hash = %%s WHERE id = %%s' % quoted, [(convert(value), pk) for pk, value in rows])
+                last_id = rows[-1][0]
+
+def to_binary(apps, schema_editor):
+    def convert(value):
+        if not isinstance(value, str):
+            value = bytes(value).decode('utf8')
+        return hex_to_bytes(value)
+
+    convert_bible_hashes(schema_editor.connection, convert)
+
+def to_text(apps, schema_editor):
+    def convert(value):
+        if isinstance(value, str):
+            return value
+        return bytes_to_hex(bytes(value))
+
+    convert_bible_hashes(schema_editor.connection, convert)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solution', '0006_solution_provisional'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rejectedsolution',
+            name='bible_hash',
+            field=purepool.core.fields.HexBinaryField(max_length=100, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='solution',
+            name='bible_hash',
+            field=purepool.core.fields.HexBinaryField(max_length=100, unique=True),
+        ),
+        migrations.RunPython(to_binary, to_text),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:41
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('miner', '0006_auto_20180324_1713'),
+        ('solution', '0007_bible_hash_binary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RejectedSolutionCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('network', models.CharField(max_length=20)),
+                ('exception_type', models.CharField(blank=True, default='', max_length=200)),
+                ('minute', models.DateTimeField(db_index=True)),
+                ('total', models.IntegerField(default=0)),
+                ('miner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='miner.miner')),
+                ('worker', models.ForeignKey(default=None, null=True, on_delete=django.db.models.deletion.CASCADE, to='miner.worker')),
+            ],
+            options={
+                'unique_together': {('network', 'miner', 'worker', 'exception_type', 'minute')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:55
+
+import purepool.core.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solution', '0008_rejectedsolutioncount'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SolutionHash',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bible_hash', purepool.core.fields.HexBinaryField(max_length=100, unique=True)),
+                ('claim', models.UUIDField()),
+                ('inserted_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+        ),
+    ]
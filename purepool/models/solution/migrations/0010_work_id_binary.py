@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:12
+
+import uuid
+import purepool.core.fields
+from django.db import migrations
+from purepool.core.fields import get_binary_uuid_sql
+
+# the work id and all columns that reference it, as (table, column, null)
+COLUMNS = [
+    ('solution_work', 'id', False),
+    ('solution_solution', 'work_id', False),
+    ('solution_rejectedsolution', 'work_id', False),
+]
+
+def convert_columns(schema_editor, to_binary):
+    """ only MySQL stores the BinaryUUIDField differently, the
+        other databases keep their columns """
+
+    connection = schema_editor.connection
+    if connection.vendor != 'mysql':
+        return
+
+    with connection.cursor() as cursor:
+        for sql in get_binary_uuid_sql(cursor, COLUMNS, to_binary):
+            cursor.execute(sql)
+
+def to_binary(apps, schema_editor):
+    convert_columns(schema_editor, True)
+
+def to_text(apps, schema_editor):
+    convert_columns(schema_editor, False)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('solution', '0009_solutionhash'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='work',
+                    name='id',
+                    field=purepool.core.fields.BinaryUUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(to_binary, to_text),
+            ],
+        ),
+    ]
@@ -3,6 +3,7 @@ import datetime
 from django.utils import timezone
 from django.db import models
 from django.utils.translation import gettext as _
+from purepool.core.fields import HexBinaryField, BinaryUUIDField
 from purepool.models.miner.models import Miner, Worker
 from purepool.models.block.models import Block
 
@@ -15,8 +16,9 @@ class Work(models.Model):
         more then 10 hours
         """
 
-    # we use a uuid for the work to prevent the chance of anybody to guess it
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # we use a uuid for the work to prevent the chance of anybody to guess it.
+    # Binary on MySQL, see purepool.core.fields
+    id = BinaryUUIDField(primary_key=True, default=uuid.uuid4, editable=False)
 
     # when the work was created
     inserted_at = models.DateTimeField(auto_now_add=True)
@@ -27,6 +29,10 @@ class Work(models.Model):
 
     # we need the hash_target to compare it later
     hash_target = models.CharField(max_length=200)
+
+    # the difficulty the hash_target was created with. Every solution
+    # for this work counts as this amount of shares
+    difficulty = models.IntegerField(default=1)
     
     # indeed, we need the network, as we might support test and main at the same time
     network = models.CharField(max_length=20)
@@ -47,8 +53,8 @@ class BaseSolution(models.Model):
     # network, must be the same as in the work!
     network = models.CharField(max_length=20)
 
-    # the calculated Biblehash. Must be unique
-    bible_hash = models.CharField(max_length=100, unique=True)
+    # the calculated Biblehash. Must be unique. Stored binary, see purepool.core.fields
+    bible_hash = HexBinaryField(max_length=100, unique=True)
     
     # holds the whole solution that can be splitted with purepool.interface.formats.SolutionString
     solution = models.TextField()
@@ -77,10 +83,45 @@ class BaseSolution(models.Model):
 class Solution(BaseSolution):
     """ An accepted solution """
     
-    pass
+    # accepted without the checks of biblepayd (see purepool.models.solution.sampling).
+    # The whole solution is kept until audit_solutions has checked it
+    provisional = models.BooleanField(default=False, db_index=True)
+
+class SolutionHash(models.Model):
+    """ the bible hashes of the accepted solutions. With POOL_PARTITIONING, bible_hash
+        is no longer unique in the (partitioned) Solution table, so this table keeps
+        them unique instead (see purepool.models.solution.writer) """
+
+    bible_hash = HexBinaryField(max_length=100, unique=True)
+
+    # the rows of one insert, to find the hashes that were new
+    claim = models.UUIDField()
+
+    inserted_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
 class RejectedSolution(BaseSolution):
-    """ saves all the rejected solutions, to analyze them later """
+    """ a sample of the rejected solutions, to analyze them later. All of
+        them are counted in RejectedSolutionCount """
     
     exception_type = models.CharField(max_length=200, default='', blank=True)
+
+class RejectedSolutionCount(models.Model):
+    """ the number of rejected solutions of a miner and worker, per exception and
+        minute (see purepool.models.solution.rejections) """
+
+    network = models.CharField(max_length=20)
+    miner = models.ForeignKey(Miner, on_delete=models.CASCADE)
+
+    # None, if the work of the solution was unknown
+    worker = models.ForeignKey(Worker, null=True, default=None, on_delete=models.CASCADE)
+
+    exception_type = models.CharField(max_length=200, default='', blank=True)
+
+    # the start of the minute
+    minute = models.DateTimeField(db_index=True)
+
+    total = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('network', 'miner', 'worker', 'exception_type', 'minute')
     
\ No newline at end of file
@@ -0,0 +1,168 @@
+import uuid
+import datetime
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+# Daily partitions of the solution tables (MySQL only, POOL_PARTITIONING).
+#
+# The tables are partitioned by the day of "inserted_at". Every day has its own
+# partition p<YYYYMMDD>, the first one also holds all older rows. New rows after the
+# last day go into "pfuture", so the partitions are created POOL_PARTITIONS_AHEAD days
+# before they are needed, while pfuture is still empty. The cleanup drops the partitions
+# that are older then the POOL_CLEANUP_* days instead of deleting the rows.
+#
+# The tables are converted once with "manage_partitions --setup". MySQL does not allow
+# foreign keys on partitioned tables, and every unique key must contain inserted_at:
+# - the foreign keys from and to the tables are dropped
+# - the primary keys become (id, inserted_at)
+# - bible_hash is only unique together with inserted_at. The bible hashes of the
+#   accepted solutions are kept unique in the SolutionHash table instead (it is not
+#   partitioned), see purepool.models.solution.writer. The setup fills it with the
+#   hashes of the existing solutions
+#
+# The work table is not partitioned. The work id must stay unique: a Work row can be
+# written twice (by save_works and with the first solution, see purepool.interface.work),
+# and the shareout joins the solutions with their work. Its old rows are deleted in
+# chunks like without partitions, see purepool.models.solution.retention
+
+FUTURE_PARTITION = 'pfuture'
+
+def get_partitioned_tables():
+    """ the tables, with the days their rows are kept """
+
+    return {
+        'solution_solution': settings.POOL_CLEANUP_MAXDAYS,
+        'solution_rejectedsolution': settings.POOL_CLEANUP_REJECTED_MAXDAYS,
+    }
+
+def get_partition_name(day):
+    return 'p' + day.strftime('%Y%m%d')
+
+def get_partition_day(name):
+    """ the day of a partition, or None for pfuture """
+
+    try:
+        return datetime.datetime.strptime(name[1:], '%Y%m%d').date()
+    except ValueError:
+        return None
+
+def get_partition_definition(day):
+    return "PARTITION %s VALUES LESS THAN (TO_DAYS('%s'))" % (get_partition_name(day), (day + datetime.timedelta(days=1)).isoformat())
+
+def get_days(first_day, last_day):
+    return [first_day + datetime.timedelta(days=i) for i in range(0, (last_day - first_day).days + 1)]
+
+def get_partition_changes(days, today, ahead, keep_days):
+    """ returns (days to create, days to drop) for the existing partitions of days """
+
+    last_day = max(days) if days else today - datetime.timedelta(days=1)
+    create = get_days(last_day + datetime.timedelta(days=1), today + datetime.timedelta(days=ahead))
+
+    # all rows of the partition are older then keep_days
+    min_day = today - datetime.timedelta(days=keep_days)
+    drop = [day for day in sorted(days) if day < min_day]
+
+    return create, drop
+
+def get_create_sql(table, days):
+    """ the new partitions are split off the empty pfuture """
+
+    return 'ALTER TABLE %s REORGANIZE PARTITION %s INTO (%s, PARTITION %s VALUES LESS THAN MAXVALUE)' % (
+        table, FUTURE_PARTITION, ', '.join([get_partition_definition(day) for day in days]), FUTURE_PARTITION,
+    )
+
+def get_drop_sql(table, days):
+    return 'ALTER TABLE %s DROP PARTITION %s' % (table, ', '.join([get_partition_name(day) for day in days]))
+
+def get_partition_sql(table, days):
+    return 'ALTER TABLE %s PARTITION BY RANGE (TO_DAYS(inserted_at)) (%s, PARTITION %s VALUES LESS THAN MAXVALUE)' % (
+        table, ', '.join([get_partition_definition(day) for day in days]), FUTURE_PARTITION,
+    )
+
+def get_partition_days(cursor, table):
+    """ the days of the existing partitions. Empty if the table is not partitioned """
+
+    cursor.execute(
+        'SELECT PARTITION_NAME FROM information_schema.PARTITIONS '
+        'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL',
+        [table],
+    )
+
+    return [day for day in (get_partition_day(row[0]) for row in cursor.fetchall()) if day is not None]
+
+def get_setup_sql(cursor, today=None, ahead=None):
+    """ the statements that convert the tables, see above """
+
+    if today is None:
+        today = timezone.now().date()
+    if ahead is None:
+        ahead = settings.POOL_PARTITIONS_AHEAD
+
+    tables = get_partitioned_tables()
+    statements = []
+
+    cursor.execute(
+        'SELECT DISTINCT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS '
+        'WHERE CONSTRAINT_SCHEMA = DATABASE() AND (TABLE_NAME IN %s OR REFERENCED_TABLE_NAME IN %s)',
+        [tuple(tables), tuple(tables)],
+    )
+    for table, name in sorted(cursor.fetchall()):
+        statements.append('ALTER TABLE %s DROP FOREIGN KEY %s' % (table, name))
+
+    for table, keep_days in sorted(tables.items()):
+        cursor.execute(
+            'SELECT INDEX_NAME, COLUMN_NAME FROM information_schema.STATISTICS '
+            'WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND NON_UNIQUE = 0 AND INDEX_NAME != %s '
+            'ORDER BY INDEX_NAME, SEQ_IN_INDEX',
+            [table, 'PRIMARY'],
+        )
+        unique_indexes = {}
+        for name, column in cursor.fetchall():
+            unique_indexes.setdefault(name, []).append(column)
+
+        for name, columns in sorted(unique_indexes.items()):
+            statements.append('ALTER TABLE %s DROP INDEX %s, ADD UNIQUE INDEX %s (%s, inserted_at)' % (table, name, name, ', '.join(columns)))
+
+        statements.append('ALTER TABLE %s DROP PRIMARY KEY, ADD PRIMARY KEY (id, inserted_at)' % table)
+
+        # the older rows are in the first partition, and dropped with it
+        statements.append(get_partition_sql(table, get_days(today - datetime.timedelta(days=keep_days), today + datetime.timedelta(days=ahead))))
+
+    statements.append(
+        "INSERT IGNORE INTO solution_solutionhash (bible_hash, claim, inserted_at) "
+        "SELECT bible_hash, '%s', inserted_at FROM solution_solution" % uuid.UUID(int=0).hex
+    )
+
+    return statements
+
+def manage_partitions(today=None, ahead=None):
+    """ creates the partitions of the next days and drops the expired ones.
+        Returns a dict table -> (created days, dropped days). Tables that are not
+        partitioned are skipped """
+
+    if today is None:
+        today = timezone.now().date()
+    if ahead is None:
+        ahead = settings.POOL_PARTITIONS_AHEAD
+
+    changes = {}
+
+    with connection.cursor() as cursor:
+        for table, keep_days in get_partitioned_tables().items():
+            days = get_partition_days(cursor, table)
+            if not days:
+                print("Warning | ", "Table is not partitioned", table)
+                continue
+
+            create, drop = get_partition_changes(days, today, ahead, keep_days)
+
+            if create:
+                cursor.execute(get_create_sql(table, create))
+
+            if drop:
+                cursor.execute(get_drop_sql(table, drop))
+
+            changes[table] = (create, drop)
+
+    return changes
@@ -0,0 +1,172 @@
+import os
+import time
+import atexit
+import threading
+from django.conf import settings
+from django.utils import timezone
+from django.core.exceptions import ValidationError
+from django.db import transaction, DatabaseError, IntegrityError
+from django.db.models import F
+from celery.signals import worker_process_shutdown
+from purepool.interface.work import load_work, get_work_pk, InvalidWorkToken, WorkTokenExpired
+from purepool.models.solution.models import Work, RejectedSolution, RejectedSolutionCount
+from purepool.core.metrics import count
+
+# The rejected solutions are counted, not stored one by one. A storm of bad solutions
+# (an attack or a broken miner) would otherwise write a full row with the block and
+# transaction hex for every one of them.
+#
+# Every process counts the rejections in memory, per miner, worker, exception and
+# minute, and adds them to RejectedSolutionCount after the task (or batch), at most every
+# POOL_REJECTION_FLUSH_SECONDS seconds. The rest is added on exit. The raw solution is
+# only kept as a RejectedSolution for the first POOL_REJECTED_SAMPLES_PER_BUCKET
+# rejections of such a minute, and for at most POOL_REJECTED_SAMPLES_PER_MINUTE
+# rejections per process and minute.
+
+def get_rejection_minute(dt):
+    return dt.replace(second=0, microsecond=0)
+
+def add_rejection_count(network, miner_id, worker_id, exception_type, minute, total):
+    qs = RejectedSolutionCount.objects.filter(network=network, miner_id=miner_id, worker_id=worker_id, exception_type=exception_type, minute=minute)
+
+    if qs.update(total=F('total') + total):
+        return
+
+    try:
+        with transaction.atomic():
+            RejectedSolutionCount.objects.create(network=network, miner_id=miner_id, worker_id=worker_id, exception_type=exception_type, minute=minute, total=total)
+    except IntegrityError:
+        # created by another process in the meantime
+        qs.update(total=F('total') + total)
+
+class RejectionCounter(object):
+    """ Collects the counts of the rejections, and decides which are kept
+        as samples. Thread safe """
+
+    def __init__(self, max_delay, samples_per_bucket, samples_per_minute):
+        self.max_delay = max_delay
+        self.samples_per_bucket = samples_per_bucket
+        self.samples_per_minute = samples_per_minute
+
+        self.lock = threading.Lock()
+        self.counts = {}
+        self.flushed_at = time.monotonic()
+
+        # the samples of the current minute
+        self.minute = None
+        self.samples = {}
+        self.sampled = 0
+
+    def add(self, network, miner_id, worker_id, exception_type, now=None):
+        """ counts the rejection. Returns True if the solution should be kept as sample.
+            The counts are added to the database by flush() """
+
+        minute = get_rejection_minute(now or timezone.now())
+        bucket = (network, str(miner_id), worker_id, exception_type, minute)
+
+        with self.lock:
+            self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+            if minute != self.minute:
+                self.minute = minute
+                self.samples = {}
+                self.sampled = 0
+
+            sample = self.samples.get(bucket, 0) < self.samples_per_bucket and self.sampled < self.samples_per_minute
+            if sample:
+                self.samples[bucket] = self.samples.get(bucket, 0) + 1
+                self.sampled += 1
+
+        return sample
+
+    def flush_if_due(self):
+        """ flushes, if the last flush is max_delay seconds ago """
+
+        with self.lock:
+            due = bool(self.counts) and time.monotonic() - self.flushed_at >= self.max_delay
+
+        if due:
+            self.flush()
+
+    def flush(self):
+        """ adds the collected counts to the database """
+
+        with self.lock:
+            counts = self.counts
+            self.counts = {}
+            self.flushed_at = time.monotonic()
+
+        for (network, miner_id, worker_id, exception_type, minute), total in counts.items():
+            try:
+                add_rejection_count(network, miner_id, worker_id, exception_type, minute, total)
+            except (DatabaseError, ValidationError) as e:
+                # like an unknown miner id
+                count('rejections_write_failed')
+                print("Warning | ", "Rejections not counted", network, miner_id, exception_type, e)
+
+_rejection_counter = None
+_rejection_counter_pid = None
+_rejection_counter_lock = threading.Lock()
+
+def get_rejection_counter():
+    """ the counter of this process """
+
+    global _rejection_counter, _rejection_counter_pid
+
+    with _rejection_counter_lock:
+        # a forked process must not count the rejections of its parent again
+        if _rejection_counter is None or _rejection_counter_pid != os.getpid():
+            _rejection_counter = RejectionCounter(settings.POOL_REJECTION_FLUSH_SECONDS, settings.POOL_REJECTED_SAMPLES_PER_BUCKET, settings.POOL_REJECTED_SAMPLES_PER_MINUTE)
+            _rejection_counter_pid = os.getpid()
+
+        return _rejection_counter
+
+def flush_rejection_counter(**kwargs):
+    """ see purepool.models.solution.writer.flush_bulk_writer """
+
+    if _rejection_counter is not None and _rejection_counter_pid == os.getpid():
+        _rejection_counter.flush()
+
+def reset_rejection_counter():
+    """ forgets the collected counts and samples """
+
+    global _rejection_counter
+
+    with _rejection_counter_lock:
+        _rejection_counter = None
+
+atexit.register(flush_rejection_counter)
+worker_process_shutdown.connect(flush_rejection_counter)
+
+def find_work(network, work_id):
+    """ the Work of a rejected solution, or None if it is unknown """
+
+    try:
+        return load_work(network, work_id)
+    except (Work.DoesNotExist, InvalidWorkToken, WorkTokenExpired, ValidationError):
+        return None
+
+def flush_rejections():
+    get_rejection_counter().flush_if_due()
+
+def reject_solution(network, solution_string, solution_s, exception_type, work):
+    """ counts the rejected solution. Returns the RejectedSolution to store, if it
+        is kept as sample. Without a Work, the solution is only counted.
+        flush_rejections() must be called afterwards """
+
+    worker_id = work.worker_id if work is not None else None
+    sample = get_rejection_counter().add(network, solution_string.get_miner_id(), worker_id, exception_type)
+
+    if not sample or work is None:
+        return None
+
+    return RejectedSolution(
+        work_id = get_work_pk(network, solution_string.get_work_id()),
+        miner_id = solution_string.get_miner_id(),
+        network = network,
+
+        bible_hash = solution_string.get_bible_hash(),
+        solution = solution_s,
+        hps = 0,
+        exception_type = exception_type,
+    )
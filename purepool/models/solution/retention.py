@@ -0,0 +1,138 @@
+import time
+import datetime
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+from purepool.models.solution.models import Solution, SolutionHash, Work, RejectedSolution, RejectedSolutionCount
+from purepool.core.metrics import count
+
+# The cleanup of the solution tables without partitions (see purepool.models.solution.partitions).
+#
+# A single DELETE for all old rows locks the table and lets the replication fall behind
+# for minutes. Here, the rows are removed in chunks of POOL_RETENTION_CHUNK_SIZE primary
+# keys, with a pause of POOL_RETENTION_SLEEP seconds after every chunk. A run stops after
+# POOL_RETENTION_TIME_BUDGET seconds, the next run continues where it stopped (the last
+# primary key of every job is kept in the cache). A large backlog is so removed over
+# some runs, without long locks.
+
+def get_retention_cursor_key(name):
+    return 'retention_cursor__%s' % name
+
+def delete_rows(model, pks):
+    """ deletes the rows, returns their number """
+
+    # a raw delete, as django would load all related objects first
+    pk_field = model._meta.pk
+
+    with connection.cursor() as cursor:
+        cursor.execute('DELETE FROM %s WHERE %s IN (%s)' % (
+            connection.ops.quote_name(model._meta.db_table),
+            connection.ops.quote_name(pk_field.column),
+            ', '.join(['%s'] * len(pks)),
+        ), [pk_field.get_db_prep_value(pk, connection) for pk in pks])
+
+        return cursor.rowcount
+
+def clear_content(model, pks):
+    """ removes the content of the solutions, the rows are kept. The content of
+        provisional solutions is kept until audit_solutions has checked them """
+
+    return model.objects.filter(pk__in=pks).exclude(solution='').exclude(provisional=True).update(solution='')
+
+class RetentionJob(object):
+    """ handles the rows of the queryset, in the order of their primary key.
+        run_chunk(model, pks) is delete_rows or clear_content """
+
+    def __init__(self, name, queryset, run_chunk=delete_rows):
+        self.name = name
+        self.queryset = queryset
+        self.run_chunk = run_chunk
+
+def get_retention_jobs(now=None):
+    if now is None:
+        now = timezone.now()
+
+    def days_ago(days):
+        return now - datetime.timedelta(days=days)
+
+    return [
+        # rejected solutions are not required for long
+        RetentionJob('rejectedsolution', RejectedSolution.objects.filter(inserted_at__lt=days_ago(settings.POOL_CLEANUP_REJECTED_MAXDAYS))),
+        RetentionJob('solution', Solution.objects.filter(inserted_at__lt=days_ago(settings.POOL_CLEANUP_MAXDAYS))),
+
+        # work is used longer, so we need to keep it longer
+        RetentionJob('work', Work.objects.filter(inserted_at__lt=days_ago(settings.POOL_CLEANUP_MAXDAYS + 2))),
+
+        # the counts of the rejected solutions are small, and kept like the solutions
+        RetentionJob('rejectedsolutioncount', RejectedSolutionCount.objects.filter(minute__lt=days_ago(settings.POOL_CLEANUP_MAXDAYS))),
+
+        # the unique bible hashes of the partitioned solutions, kept like the solutions
+        RetentionJob('solutionhash', SolutionHash.objects.filter(inserted_at__lt=days_ago(settings.POOL_CLEANUP_MAXDAYS))),
+
+        # the content of the solutions is removed after some days, the rows are kept longer.
+        # Rows that are already empty are skipped
+        RetentionJob('solution_content', Solution.objects.filter(inserted_at__lt=days_ago(settings.POOL_SOLUTION_CONTENT_KEEP_DAYS)).exclude(solution='').exclude(provisional=True), clear_content),
+    ]
+
+def run_job(job, chunk_size, sleep_seconds, deadline):
+    """ returns (rows, finished, seconds). The job is not finished if the deadline
+        was reached. seconds is the time used by the chunks, without the pauses """
+
+    key = get_retention_cursor_key(job.name)
+    last_pk = cache.get(key, None)
+    rows = 0
+    seconds = 0
+
+    while time.monotonic() < deadline:
+        start = time.monotonic()
+
+        queryset = job.queryset.order_by('pk')
+        if last_pk is not None:
+            queryset = queryset.filter(pk__gt=last_pk)
+
+        pks = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if pks:
+            rows += job.run_chunk(job.queryset.model, pks)
+            last_pk = pks[-1]
+
+        seconds += time.monotonic() - start
+
+        if len(pks) < chunk_size:
+            # done, the next run starts at the beginning again
+            cache.delete(key)
+            return rows, True, seconds
+
+        cache.set(key, last_pk, None)
+        time.sleep(sleep_seconds)
+
+    return rows, False, seconds
+
+def run_retention(jobs=None, chunk_size=None, sleep_seconds=None, time_budget=None):
+    """ runs the jobs until they are done or the time budget is used.
+        Returns a dict name -> (rows, rows per second, finished). The rows per
+        second are measured without the pauses between the chunks """
+
+    if jobs is None:
+        jobs = get_retention_jobs()
+    if chunk_size is None:
+        chunk_size = settings.POOL_RETENTION_CHUNK_SIZE
+    if sleep_seconds is None:
+        sleep_seconds = settings.POOL_RETENTION_SLEEP
+    if time_budget is None:
+        time_budget = settings.POOL_RETENTION_TIME_BUDGET
+
+    deadline = time.monotonic() + time_budget
+    results = {}
+
+    for job in jobs:
+        rows, finished, seconds = run_job(job, chunk_size, sleep_seconds, deadline)
+
+        rows_per_second = rows / seconds if seconds > 0 else 0
+        results[job.name] = (rows, rows_per_second, finished)
+        count('retention_rows_%s' % job.name, rows)
+
+        if settings.TASK_DEBUG:
+            print("Debug | ", "Retention", job.name, rows, "rows", "%.0f rows/s" % rows_per_second, "done" if finished else "continued next run")
+
+    return results
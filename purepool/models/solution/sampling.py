@@ -0,0 +1,48 @@
+import time
+import random
+from django.conf import settings
+from django.core.cache import cache
+from purepool.models.miner.models import Miner
+
+# Not every solution needs the (expensive) checks of biblepayd right away.
+# Only POOL_VALIDATION_SAMPLE of the solutions of a trusted miner are validated
+# completely, the others are accepted provisionally and checked later by
+# audit_solutions (at the latest before the shareout of their block).
+#
+# A new miner is not trusted: all of its solutions are validated. The trust
+# grows with the age of the miner, until POOL_VALIDATION_TRUST_DAYS.
+
+MINER_INSERTED_AT_TIMEOUT = 60 * 60
+
+def get_miner_inserted_at_key(miner_id):
+    return 'miner_inserted_at__%s' % miner_id
+
+def get_miner_age_days(miner_id):
+    key = get_miner_inserted_at_key(miner_id)
+    inserted_at = cache.get(key, None)
+
+    if inserted_at is None:
+        try:
+            inserted_at = Miner.objects.filter(pk=miner_id).values_list('inserted_at', flat=True)[0].timestamp()
+        except IndexError:
+            inserted_at = time.time()
+        cache.set(key, inserted_at, MINER_INSERTED_AT_TIMEOUT)
+
+    return (time.time() - inserted_at) / (60 * 60 * 24)
+
+def get_validation_sample_rate(miner_id):
+    """ the part of the solutions of the miner that is validated completely, from 0 to 1 """
+
+    sample = settings.POOL_VALIDATION_SAMPLE
+    if sample >= 1:
+        return 1
+
+    trust_days = settings.POOL_VALIDATION_TRUST_DAYS
+    if trust_days <= 0:
+        return sample
+
+    return max(sample, 1 - get_miner_age_days(miner_id) / trust_days)
+
+def should_validate_fully(miner_id):
+    rate = get_validation_sample_rate(miner_id)
+    return rate >= 1 or random.random() < rate
@@ -3,14 +3,25 @@ import random
 from django.core.cache import cache
 from django.utils import timezone
 from django.conf import settings
-from django.db import connection
+from django.core.exceptions import ImproperlyConfigured
 from celery import shared_task
 from bitcoinrpc.authproxy import JSONRPCException
-from purepool.interface.formats import SolutionString
+from purepool.interface.formats import SolutionString, InvalidSolutionString
+from purepool.interface.work import load_work, load_works, get_work_pk, get_work_uuid, is_work_token, mark_works_saved, InvalidWorkToken
 from purepool.models.solution.models import Solution, Work, RejectedSolution
-from purepool.models.miner.models import Miner
+from purepool.models.miner.models import Miner, get_worker_miner_id
+from purepool.models.block.chaintip import get_chain_height, get_chain_tip
+from purepool.models.solution.biblehash import get_bible_hash_verifier
+from purepool.models.solution.sampling import should_validate_fully
+from purepool.models.solution.writer import get_bulk_writer, write_solutions
+from purepool.models.solution.partitions import manage_partitions
+from purepool.models.solution.retention import run_retention, get_retention_jobs
+from purepool.models.solution.rejections import get_rejection_counter, find_work, reject_solution, flush_rejections
+from purepool.core.metrics import count
 from biblepay.clients import BiblePayRpcClient
+from biblepay.nodes import is_circuit_open, is_node_error, is_unavailable
 from biblepay.hash import check_hashtarget
+from biblepay.coinbase import get_coinbase_recipient, is_block_coinbase, CoinbaseInvalid
 
 class HashTargetExceeded(Exception):
     pass
@@ -27,6 +38,9 @@ class InvalidSolution(Exception):
 class UnknownWork(Exception):
     pass
 
+class WrongMiner(Exception):
+    pass
+
 class TransactionInvalid(Exception):
     pass
 
@@ -42,52 +56,75 @@ class Invalid_CPID(Exception):
 class Illegal_CPID(Exception):
     pass
 
-def validate_solution(network, solution_string):
-    """ the validation of a solution is a multi-step part
-        done here. We need to:
-        - check the target hash
-        - calculate the biblehash
-        - ensure that the biblehash is unique
-        - and check if the transaction really is for OUR pool address! """
+def check_solution(network, solution_string, work=None):
+    """ the checks of a solution that need nothing but the solution and
+        its work. Returns the work """
 
     # we load the work, as it contains the hash target
     # the solutions biblehash must be lower then the hash target, or
     # we will not accept it
     # If the Work does not exists, we will fail here (fast)
+    # Work tokens are validated here without any database query
+    if work is None:
+        try:
+            work = load_work(network, solution_string.get_work_id())
+        except (Work.DoesNotExist, InvalidWorkToken) as e:
+            raise UnknownWork
+
+    # a cheap check of the fields, so a garbage solution never reaches the
+    # biblepay client
     try:
-        work = Work.objects.get(pk=solution_string.get_work_id(), network=network)
-    except Work.DoesNotExist as e:
-        raise UnknownWork
+        solution_string.check_format()
+    except InvalidSolutionString as e:
+        raise InvalidSolution('Invalid field: %s' % e)
 
     # biblehash must be lower then the hashtarget
     if not check_hashtarget(solution_string.get_bible_hash(), work.hash_target):
         raise HashTargetExceeded()
 
-    # next we calculate the biblehash from the elements given
-    # if this is successfull
-    client = BiblePayRpcClient(network)
-    bible_hash = client.bible_hash(
-        solution_string.get_block_hash(),
-        solution_string.get_block_time(),
-        solution_string.get_prev_block_time(),
-        solution_string.get_prev_height(),
-        solution_string.get_nonce(),
-    )
+    return work
 
-    if bible_hash != solution_string.get_bible_hash():
-        raise BibleHashWrong()
+def check_miner(solution_string, worker_miner_id):
+    """ the work must have been given to the miner of the solution. Otherwise
+        anybody could send (wrong) solutions in the name of another miner """
 
+    if worker_miner_id is None or str(worker_miner_id) != str(solution_string.get_miner_id()):
+        raise WrongMiner()
+
+def check_recipient(network, solution_string):
     # Check if the target address of the block is the one from our pool!
     # This is a very important check, without it, people could send in
-    # solutions that are not meant for our pool
+    # solutions that are not meant for our pool.
+    # The coinbase transaction is read here, so biblepayd never gets the
+    # large block of a solution for another address
+    if settings.POOL_COINBASE_LOCAL_CHECK:
+        if not is_block_coinbase(solution_string.get_block_hex(), solution_string.get_transaction_hex()):
+            raise TransactionInvalid()
+
+        try:
+            recipient = get_coinbase_recipient(solution_string.get_transaction_hex(), network)
+        except CoinbaseInvalid:
+            raise TransactionInvalid()
+
+        if recipient != settings.POOL_ADDRESS[network]:
+            raise TransactionTampered('Invalid recipient')
+
+def check_bible_hash(solution_string, bible_hash):
+    if bible_hash != solution_string.get_bible_hash():
+        raise BibleHashWrong()
+
+def check_coinbase(network, coinbase):
+    """ the checks of the hexblocktocoinbase answer of biblepayd """
+
+    # biblepayd is still needed for the cpid fields, and for the recipient
+    # if it is not checked in check_recipient
     addresses = []
     try:
-        coinbase = client.hexblocktocoinbase(solution_string.get_block_hex(), solution_string.get_transaction_hex())
         addresses = [coinbase.get('recipient', None)]
-    except (JSONRPCException, TypeError):
+    except (AttributeError, TypeError):
         raise TransactionInvalid()
 
-    if not settings.POOL_ADDRESS[network] in addresses:
+    if not settings.POOL_COINBASE_LOCAL_CHECK and not settings.POOL_ADDRESS[network] in addresses:
         raise TransactionTampered('Invalid recipient')
 
     # we only accept solutions from users with a valid CPID.
@@ -102,19 +139,103 @@ def validate_solution(network, solution_string):
     if not coinbase['cpid_legal']:
         raise Illegal_CPID()
 
+def check_chain_tip(solution_string, tip):
     # this is a check on the nonce, it must be smaller then the currently
     # allowed max nonce value. If not, somebody tried something bad
-    pinfo = client.pinfo()
-    if int(solution_string.get_nonce()) > int(pinfo.get('pinfo', 0)):
+    if int(solution_string.get_nonce()) > tip['pinfo']:
         raise TransactionTampered('Nonce height wrong')
 
     # we also only accept the solution if the given prev_block is really
     # the current height of the blockchain
-    if int(solution_string.get_prev_height()) != int(pinfo['height']):
+    if int(solution_string.get_prev_height()) != tip['height']:
+        raise TransactionTampered('Wrong height')
+
+def validation_steps(network, solution_string, work=None, full=True):
+    """ the steps of validate_solution, as generator. The calls to the cache and to
+        biblepayd are yielded as (name, args), and their result is sent back (or their
+        exception thrown in). So the same steps are run by validate_solution and by the
+        validator service with its asyncio client (see run_validation_steps) """
+
+    work = check_solution(network, solution_string, work)
+
+    worker_miner_id = yield ('worker_miner_id', (work.worker_id,))
+    check_miner(solution_string, worker_miner_id)
+
+    # solutions for a block older then the newest block we know can not be
+    # right, so we do not need to ask the biblepay client
+    prev_height = int(solution_string.get_prev_height())
+    known_height = yield ('chain_height', ())
+    if known_height is not None and prev_height < known_height:
         raise TransactionTampered('Wrong height')
 
+    check_recipient(network, solution_string)
+
+    if full:
+        # next we calculate the biblehash from the elements given
+        # if this is successfull
+        bible_hash = yield ('bible_hash', (
+            solution_string.get_block_hash(),
+            solution_string.get_block_time(),
+            solution_string.get_prev_block_time(),
+            solution_string.get_prev_height(),
+            solution_string.get_nonce(),
+        ))
+        check_bible_hash(solution_string, bible_hash)
+
+        try:
+            coinbase = yield ('hexblocktocoinbase', (solution_string.get_block_hex(), solution_string.get_transaction_hex()))
+        except (JSONRPCException, TypeError):
+            raise TransactionInvalid()
+
+        check_coinbase(network, coinbase)
+
+    # the pinfo and the height are cached. If the solution is for a newer block then
+    # the cached one, or its nonce is over the cached max nonce, biblepayd is asked
+    tip = yield ('chain_tip', (prev_height, int(solution_string.get_nonce())))
+    check_chain_tip(solution_string, tip)
+
     return True
 
+def run_validation_steps(steps, calls):
+    """ runs the steps of validation_steps with calls, a dict name -> function """
+
+    result, error = None, None
+    while True:
+        try:
+            name, args = steps.send(result) if error is None else steps.throw(error)
+        except StopIteration as e:
+            return e.value
+
+        try:
+            result, error = calls[name](*args), None
+        except Exception as e:
+            result, error = None, e
+
+def validate_solution(network, solution_string, work=None, full=True):
+    """ the validation of a solution is a multi-step part
+        done here. We need to:
+        - check the target hash
+        - calculate the biblehash
+        - ensure that the biblehash is unique
+        - and check if the transaction really is for OUR pool address!
+
+        The work can be given if it was already loaded (see process_solution_batch).
+
+        Without full, the checks that need biblepayd (bible hash, cpid) are skipped.
+        The solution is then only accepted provisionally and checked later
+        by audit_solutions """
+
+    client = BiblePayRpcClient(network)
+    verifier = get_bible_hash_verifier(client)
+
+    return run_validation_steps(validation_steps(network, solution_string, work, full), {
+        'worker_miner_id': get_worker_miner_id,
+        'chain_height': lambda: get_chain_height(network),
+        'bible_hash': verifier.bible_hash,
+        'hexblocktocoinbase': client.hexblocktocoinbase,
+        'chain_tip': lambda min_height, min_pinfo: get_chain_tip(network, client, min_height=min_height, min_pinfo=min_pinfo),
+    })
+
 def calculate_multiply(solution_string):
     """ Some miners are punished for being bad at finding blocks,
         while others are boosted for being good at that. """
@@ -150,6 +271,17 @@ def calculate_multiply(solution_string):
 
     return multiply_solution
 
+def calculate_hps(solution_string):
+    """ calculated hashes per second. Only for some statitics and leaderboards,
+        but meaningless for all later calculations
+        Same as on the original pool """
+
+    runtime = solution_string.get_timer_end() - solution_string.get_timer_start()
+    if runtime <= 0:
+        return 0
+
+    return 1000 * solution_string.get_hash_counter() / runtime
+
 @shared_task()
 def process_solution(network, solution_s):
     """ called by the celery task queue
@@ -166,46 +298,59 @@ def process_solution(network, solution_s):
     if multiply_solution == 0: # droped because of low percent_ratio? Then we can leave here
         return
 
+    # while biblepayd does not answer, the solutions are dropped at once. Otherwise
+    # they would wait for the timeouts and fill up the queue
+    if is_circuit_open(network):
+        count('solutions_shed')
+        return
+
     # first, we check if the biblehash already exists. If yes, we ignore the solution
     # This way, we can skip all the later parts of checking the solution and speed up
     # everything
+    # (or is collected by the writer of this process)
+    writer = get_bulk_writer()
+    if writer.is_pending(solution_string.get_bible_hash()):
+        raise BibleHashAlreadyKnown()
+
     hashes = Solution.objects.filter(bible_hash=solution_string.get_bible_hash()).values('bible_hash')
     if len(hashes) > 0:
         raise BibleHashAlreadyKnown()
 
+    # most solutions of trusted miners are only checked by biblepayd later
+    full = should_validate_fully(solution_string.get_miner_id())
+
     valid = False
     try:
-        valid = validate_solution(network, solution_string)
+        valid = validate_solution(network, solution_string, full=full)
+    except ImproperlyConfigured:
+        # the fault of the pool, not of the miner
+        raise
     except Exception as ex:
-        rsol = solution_s
-            
-        exception_type = type(ex).__name__
-
-        rsolution = RejectedSolution(
-            work_id = solution_string.get_work_id(),
-            miner_id = solution_string.get_miner_id(),
-            network = network,
-
-            bible_hash = solution_string.get_bible_hash(),
-            solution = rsol,
-            hps=0,
-           exception_type = exception_type,
-        )
-        rsolution.save()        
+        if is_unavailable(ex):
+            # not the fault of the miner, so it is no rejected solution
+            count('solutions_shed')
+            return
+
+        # counted, and only stored as a sample (see purepool.models.solution.rejections)
+        work = find_work(network, solution_string.get_work_id())
+        rsolution = reject_solution(network, solution_string, solution_s, type(ex).__name__, work)
+        if rsolution is not None:
+            writer.add(rsolution)
+        flush_rejections()
         
         raise # still raise the error to the level above
 
     if not valid: 
         raise InvalidSolution()
 
-    # calculated hashes per second. Only for some statitics and leaderboards,
-    # but meaningless for all later calculations
-    # Same as on the original pool
-    runtime = solution_string.get_timer_end() - solution_string.get_timer_start()
-    hps = 1000 * solution_string.get_hash_counter() / runtime
+    hps = calculate_hps(solution_string)
+
+    # solutions for a work token need a Work row to reference, that is created here
+    work_id = get_work_pk(network, solution_string.get_work_id())
 
     # with everything checked, we insert the solution into the database
     # we also do the multi insert here for good miners
+    solutions = []
     for r in range(0, multiply_solution):
         bible_hash = solution_string.get_bible_hash()
 
@@ -213,49 +358,302 @@ def process_solution(network, solution_s):
             bible_hash += '#'+str(r)
 
         solution = Solution(
-            work_id = solution_string.get_work_id(),
+            work_id = work_id,
             miner_id = solution_string.get_miner_id(),
             network = network,
 
             bible_hash = bible_hash,
-            solution = '', # no longer needed
+            solution = '' if full else solution_s, # only needed for the audit
 
             hps = hps,
+            provisional = not full,
         )
-        solution.save()
-    
-    
-    
+        solutions.append(solution)
+
+    # the rows are written together, see purepool.models.solution.writer
+    writer.add(*solutions)
+
 @shared_task()
-def cleanup_solutions():
-    """ removes old works, solutions and rejected solutions from the database.
-        We use raw sql, as djangos delete queries are very slow as bulk queries """
-    
-    dformat = '%Y-%m-%d %H:%M:%S'
+def process_solution_batch(network, solution_strings):
+    """ the same as process_solution, but for a list of solutions that
+        the interface collected for a few milliseconds (see purepool.interface.batching).
+        The database work is done for all solutions at once: one query to load
+        the works, one for the known bible hashes and one insert for the accepted
+        and the rejected solutions each.
+
+        Rejected solutions do not raise an exception here, as this would stop the
+        processing of the other solutions """
+
+    if is_circuit_open(network):
+        count('solutions_shed', len(solution_strings))
+        return 0, 0
+
+    solutions = []
+    for solution_s in solution_strings:
+        try:
+            solutions.append((solution_s, SolutionString(solution_s)))
+        except InvalidSolutionString:
+            pass
+
+    # we drop the solutions that are already known, including the ones that
+    # are in the batch more than once
+    known_hashes = set(Solution.objects.filter(
+        bible_hash__in=[solution_string.get_bible_hash() for solution_s, solution_string in solutions]
+    ).values_list('bible_hash', flat=True))
+
+    new_solutions = []
+    for solution_s, solution_string in solutions:
+        if solution_string.get_bible_hash() in known_hashes:
+            continue
+
+        known_hashes.add(solution_string.get_bible_hash())
+        new_solutions.append((solution_s, solution_string))
+
+    # the works from the cache or the database are loaded at once, tokens need no query at all
+    works = load_works(network, [solution_string.get_work_id() for solution_s, solution_string in new_solutions if not is_work_token(solution_string.get_work_id())])
+
+    accepted = []
+    rejected = []
+    for solution_s, solution_string in new_solutions:
+        multiply_solution = calculate_multiply(solution_string)
+        if multiply_solution == 0:
+            continue
+
+        work = None
+        full = should_validate_fully(solution_string.get_miner_id())
+        try:
+            if is_work_token(solution_string.get_work_id()):
+                work = load_work(network, solution_string.get_work_id())
+            else:
+                work = works.get(get_work_uuid(solution_string.get_work_id()), None)
+
+            if work is None:
+                raise UnknownWork()
+
+            if not validate_solution(network, solution_string, work=work, full=full):
+                raise InvalidSolution()
+        except Exception as ex:
+            if is_unavailable(ex):
+                count('solutions_shed')
+                continue
+
+            rsolution = reject_solution(network, solution_string, solution_s, type(ex).__name__, work)
+            if rsolution is not None:
+                rejected.append(rsolution)
+            continue
+
+        work_id = get_work_pk(network, solution_string.get_work_id())
+        hps = calculate_hps(solution_string)
+
+        for r in range(0, multiply_solution):
+            bible_hash = solution_string.get_bible_hash()
+
+            if r > 0:
+                bible_hash += '#'+str(r)
+
+            accepted.append(Solution(
+                work_id = work_id,
+                miner_id = solution_string.get_miner_id(),
+                network = network,
+
+                bible_hash = bible_hash,
+                solution = '' if full else solution_s, # only needed for the audit
+
+                hps = hps,
+                provisional = not full,
+            ))
+
+    # another task might have inserted the same bible hash in the meantime,
+    # these rows are skipped instead of failing the whole batch
+    write_solutions(accepted + rejected)
+    flush_rejections()
+
+    return len(accepted), len(rejected)
+
+# the miner tried to cheat, if an audit finds one of these
+AUDIT_CHEATING_EXCEPTIONS = (InvalidSolution, HashTargetExceeded, BibleHashWrong, TransactionInvalid, TransactionTampered, Invalid_CPID)
+
+def audit_solution_batch(network, client, solutions):
+    """ the checks of validate_solution skipped for provisional solutions, with one
+        batch call to biblepayd for all solutions. The checks of the chain height are
+        not done again, they were right when the solution was accepted.
+
+        Returns (passed, failed, unauditable), failed as list of (solution, exception).
+        Solutions without a readable content can not be checked at all, they are
+        unauditable. Solutions biblepayd could not check are in none of them """
+
+    passed = []
+    failed = []
+    unauditable = []
+
+    checked = []
+    for solution in solutions:
+        # the content was stored by the pool when the solution was accepted, so
+        # if it is gone, this is not the fault of the miner
+        try:
+            solution_string = SolutionString(solution.solution)
+        except InvalidSolutionString:
+            unauditable.append(solution)
+            continue
+
+        try:
+            check_solution(network, solution_string, solution.work)
+            check_miner(solution_string, solution.work.worker.miner_id)
+            check_recipient(network, solution_string)
+        except Exception as ex:
+            failed.append((solution, ex))
+        else:
+            checked.append((solution, solution_string))
+
+    if not checked:
+        return passed, failed, unauditable
+
+    bible_hash_items = [(
+        solution_string.get_block_hash(),
+        solution_string.get_block_time(),
+        solution_string.get_prev_block_time(),
+        solution_string.get_prev_height(),
+        solution_string.get_nonce(),
+    ) for solution, solution_string in checked]
 
-    with connection.cursor() as cursor:
+    bible_hashes = get_bible_hash_verifier(client).bible_hash_many(bible_hash_items)
 
-        # rejected solutions are not required for long
-        min_date = timezone.now() - datetime.timedelta(days=settings.POOL_CLEANUP_REJECTED_MAXDAYS)
-        sql = 'DELETE FROM solution_rejectedsolution WHERE inserted_at < "'+min_date.strftime(dformat)+'"'
-        cursor.execute(sql)
+    coinbases = client.hexblocktocoinbase_many([(solution_string.get_block_hex(), solution_string.get_transaction_hex()) for solution, solution_string in checked])
 
-        # and remove old entries
-        min_date = timezone.now() - datetime.timedelta(days=settings.POOL_CLEANUP_MAXDAYS)
-        sql = 'DELETE FROM solution_solution WHERE inserted_at < "'+min_date.strftime(dformat)+'"'
-        cursor.execute(sql)
+    for (solution, solution_string), bible_hash, coinbase in zip(checked, bible_hashes, coinbases):
+        # biblepayd was not able to answer, the solution is checked again later
+        if is_node_error(bible_hash) or is_node_error(coinbase):
+            continue
 
-        min_date = timezone.now() - datetime.timedelta(days=settings.POOL_CLEANUP_MAXDAYS+2) # work is used longer, so we need to keep it longer
-        sql = 'DELETE FROM solution_work WHERE inserted_at < "'+min_date.strftime(dformat)+'"'
-        cursor.execute(sql)
+        try:
+            if isinstance(bible_hash, Exception):
+                raise bible_hash
+            check_bible_hash(solution_string, bible_hash)
 
-        # remove solution content after x days. Solutions entries itself are stored longer, see above
-        min_date_solutions = timezone.now() - datetime.timedelta(days=settings.POOL_SOLUTION_CONTENT_KEEP_DAYS)
-        Solution.objects.filter(inserted_at__lt=min_date_solutions).update(solution='')
+            if isinstance(coinbase, Exception):
+                raise TransactionInvalid()
+            check_coinbase(network, coinbase)
+        except Biblepayd_Outdated:
+            # the fault of the pool, not of the miner
+            continue
+        except Exception as ex:
+            failed.append((solution, ex))
+        else:
+            passed.append(solution)
 
+    return passed, failed, unauditable
 
+def punish_worker(network, work):
+    """ all solutions of the worker of the work that are not yet paid are ignored,
+        if they were mined from the same ip. The other workers of the miner are
+        not touched, so nobody can void the balance of a miner with a few bad shares """
 
+    Solution.objects.filter(
+        network=network, processed=False, work__worker_id=work.worker_id, work__ip=work.ip,
+    ).update(ignore=True, provisional=False)
 
+@shared_task()
+def audit_solutions(network, block_id=None):
+    """ checks the provisionally accepted solutions (see purepool.models.solution.sampling)
+        with biblepayd. If one of them is wrong, the worker is punished.
+        With block_id, only the solutions of the block are checked.
 
+        Returns True if no provisional solution is left """
 
-        
+    qs = Solution.objects.filter(network=network, provisional=True)
+    if block_id is not None:
+        qs = qs.filter(block_id=block_id)
+
+    solution_ids = list(qs.values_list('pk', flat=True))
+    if not solution_ids:
+        return True
+
+    client = BiblePayRpcClient(network)
+    punished_workers = set()
+
+    for i in range(0, len(solution_ids), settings.POOL_AUDIT_BATCH_SIZE):
+        solutions = Solution.objects.filter(
+            pk__in=solution_ids[i:i + settings.POOL_AUDIT_BATCH_SIZE],
+            provisional=True, # not if the worker was punished in the meantime
+        ).select_related('work__worker')
+
+        try:
+            passed, failed, unauditable = audit_solution_batch(network, client, solutions)
+        except Exception as ex:
+            # biblepayd can not answer, the audit is done later
+            if is_unavailable(ex):
+                return False
+            raise
+
+        Solution.objects.filter(pk__in=[solution.pk for solution in passed]).update(provisional=False, solution='')
+
+        # the benefit of the doubt
+        if unauditable:
+            count('audit_unauditable', len(unauditable))
+            Solution.objects.filter(pk__in=[solution.pk for solution in unauditable]).update(provisional=False, solution='')
+
+        rejected = []
+        for solution, ex in failed:
+            if not isinstance(ex, AUDIT_CHEATING_EXCEPTIONS):
+                # not the fault of the miner (like Illegal_CPID), only the solution is ignored
+                Solution.objects.filter(pk=solution.pk).update(ignore=True, provisional=False)
+            elif not (solution.work.worker_id, solution.work.ip) in punished_workers:
+                punish_worker(network, solution.work)
+                punished_workers.add((solution.work.worker_id, solution.work.ip))
+
+            # the solutions of cheaters are all kept, not only a sample
+            count('audit_failed')
+            get_rejection_counter().add(network, solution.miner_id, solution.work.worker_id, type(ex).__name__)
+            rejected.append(RejectedSolution(
+                work_id = solution.work_id,
+                miner_id = solution.miner_id,
+                network = network,
+
+                bible_hash = solution.bible_hash,
+                solution = solution.solution,
+                hps = 0,
+                exception_type = type(ex).__name__,
+            ))
+
+        RejectedSolution.objects.bulk_create(rejected, ignore_conflicts=True)
+        flush_rejections()
+
+    return not qs.exists()
+
+@shared_task()
+def save_works(network, works):
+    """ writes the rows of the Works in the cache (see purepool.interface.work), given
+        as dicts. Works that already have a row (created with their first solution) are skipped """
+
+    works = [values for values in works if values['network'] == network]
+
+    Work.objects.bulk_create([Work(**values) for values in works], ignore_conflicts=True)
+
+    # the solutions for the works need no query from now on, see get_work_pk
+    mark_works_saved([values['id'] for values in works])
+
+# the days before POOL_SOLUTION_CONTENT_KEEP_DAYS that are cleaned with partitions,
+# so a failed run is repeated the next day
+PARTITION_CONTENT_CLEANUP_DAYS = 2
+
+@shared_task()
+def cleanup_solutions():
+    """ removes old works, solutions and rejected solutions from the database """
+
+    # with partitions, the old rows are dropped with their partition
+    if settings.POOL_PARTITIONING:
+        manage_partitions()
+
+        # the content is only removed from the days that became too old since the
+        # last run, so only these partitions are read
+        min_date_solutions = timezone.now() - datetime.timedelta(days=settings.POOL_SOLUTION_CONTENT_KEEP_DAYS)
+        Solution.objects.filter(
+            inserted_at__gte=min_date_solutions - datetime.timedelta(days=PARTITION_CONTENT_CLEANUP_DAYS),
+            inserted_at__lt=min_date_solutions,
+        ).exclude(solution='').exclude(provisional=True).update(solution='')
+
+        # the works, the counts of the rejected solutions and the bible hashes are not partitioned
+        return run_retention(jobs=[job for job in get_retention_jobs() if job.name in ('work', 'rejectedsolutioncount', 'solutionhash')])
+
+    # without partitions, the rows are deleted in small chunks, see purepool.models.solution.retention
+    return run_retention()
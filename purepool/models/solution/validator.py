@@ -0,0 +1,413 @@
+import queue
+import signal
+import socket
+import asyncio
+import threading
+import traceback
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, DatabaseError
+from purepool.interface.formats import SolutionString, InvalidSolutionString
+from purepool.interface.work import load_work, get_work_pk, InvalidWorkToken
+from purepool.models.solution.models import Solution, Work
+from purepool.models.miner.models import get_worker_miner_id
+from purepool.models.solution.biblehash import get_bible_hash_verifier, check_bible_hash_settings, LocalBibleHashVerifier, ShadowBibleHashVerifier
+from purepool.models.solution.sampling import should_validate_fully
+from purepool.models.solution.writer import write_solutions
+from purepool.models.solution.rejections import reject_solution, flush_rejections
+from purepool.models.solution.tasks import (
+    process_solution, process_solution_batch, calculate_multiply, calculate_hps,
+    validation_steps, InvalidSolution, UnknownWork,
+)
+from purepool.models.block.chaintip import aget_chain_height, aget_chain_tip
+from purepool.core.metrics import count
+from biblepay.asyncclient import AsyncBiblePayRpcClient
+from biblepay.nodes import is_circuit_open, is_unavailable
+
+# The validator service: an asyncio replacement for the celery workers of the
+# "standard" queue (see the "run_validator" command).
+#
+# The validation of a solution is nearly only waiting for biblepayd. A celery worker
+# with --concurrency=1 waits for one solution at a time, the validator keeps up to
+# POOL_VALIDATOR_IN_FLIGHT solutions in flight in one process. The checks are the ones
+# of process_solution (the same validation_steps). The database queries run in threads,
+# the accepted and rejected solutions are collected and inserted together
+# (POOL_VALIDATOR_FLUSH_SIZE rows or POOL_VALIDATOR_FLUSH_MS milliseconds, whatever
+# comes first).
+#
+# The messages of the queue are acknowledged after their solutions are in the database.
+# A message that failed on the database goes back to the queue after
+# DATABASE_RETRY_SECONDS. Other tasks of the queue are run like in a celery worker,
+# one thread per task.
+
+DATABASE_RETRY_SECONDS = 1
+
+def run_in_thread(function, *args, **kwargs):
+    """ runs a blocking function (like a database query) without blocking the event loop.
+        The connections of the thread are checked before and after, like celery does
+        for every task, so a connection closed by the database is not used again """
+
+    def run():
+        close_old_connections()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False)()
+
+def is_known_bible_hash(bible_hash):
+    return Solution.objects.filter(bible_hash=bible_hash).exists()
+
+class SolutionWriter(object):
+    """ Collects the rows of the validator and writes them with write_solutions,
+        when max_size rows are collected or max_delay seconds are over.
+        add() returns when the rows are written """
+
+    def __init__(self, max_size, max_delay):
+        self.max_size = max_size
+        self.max_delay = max_delay
+
+        self.pending = [] # (objects, future)
+        self.pending_size = 0
+        self.pending_hashes = set()
+        self.timer = None
+        self.flushes = set()
+
+    def is_pending(self, bible_hash):
+        return bible_hash in self.pending_hashes
+
+    async def add(self, *objects):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        self.pending.append((objects, future))
+        self.pending_size += len(objects)
+        self.pending_hashes.update(o.bible_hash for o in objects if isinstance(o, Solution))
+
+        if self.pending_size >= self.max_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_delay, self.flush)
+
+        await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        if not self.pending:
+            return
+
+        batch = self.pending
+        self.pending = []
+        self.pending_size = 0
+
+        task = asyncio.ensure_future(self.write(batch))
+        self.flushes.add(task)
+        task.add_done_callback(self.flushes.discard)
+
+    async def write(self, batch):
+        try:
+            await run_in_thread(write_solutions, [o for objects, future in batch for o in objects])
+        except Exception as e:
+            for objects, future in batch:
+                future.set_exception(e)
+        else:
+            for objects, future in batch:
+                future.set_result(None)
+        finally:
+            for objects, future in batch:
+                self.pending_hashes.difference_update(o.bible_hash for o in objects if isinstance(o, Solution))
+
+    async def close(self):
+        """ writes everything that is still collected """
+
+        self.flush()
+        if self.flushes:
+            await asyncio.wait(list(self.flushes))
+
+async def arun_validation_steps(steps, calls):
+    """ run_validation_steps, with coroutines as calls """
+
+    result, error = None, None
+    while True:
+        try:
+            name, args = steps.send(result) if error is None else steps.throw(error)
+        except StopIteration as e:
+            return e.value
+
+        try:
+            result, error = await calls[name](*args), None
+        except Exception as e:
+            result, error = None, e
+
+def get_abible_hash(client):
+    """ the bible_hash call of POOL_BIBLEHASH_VERIFIER, as coroutine. The local
+        implementation does not wait but calculates, so it runs in a thread """
+
+    verifier = get_bible_hash_verifier(None)
+
+    if isinstance(verifier, LocalBibleHashVerifier):
+        return lambda *args: run_in_thread(verifier.bible_hash, *args)
+
+    if isinstance(verifier, ShadowBibleHashVerifier):
+        async def bible_hash(*args):
+            result = await client.bible_hash(*args)
+            if verifier.is_sampled():
+                await run_in_thread(verifier.compare, result, *args)
+            return result
+
+        return bible_hash
+
+    return client.bible_hash
+
+async def avalidate_solution(network, solution_string, client, work=None, full=True):
+    """ validate_solution, with the AsyncBiblePayRpcClient """
+
+    return await arun_validation_steps(validation_steps(network, solution_string, work, full), {
+        'worker_miner_id': lambda worker_id: run_in_thread(get_worker_miner_id, worker_id),
+        'chain_height': lambda: aget_chain_height(network),
+        'bible_hash': get_abible_hash(client),
+        'hexblocktocoinbase': client.hexblocktocoinbase,
+        'chain_tip': lambda min_height, min_pinfo: aget_chain_tip(network, client, min_height=min_height, min_pinfo=min_pinfo),
+    })
+
+async def aprocess_solution(network, solution_s, client, writer):
+    """ process_solution, for the validator. Returns True if the solution was accepted """
+
+    try:
+        solution_string = SolutionString(solution_s)
+    except InvalidSolutionString:
+        return False
+
+    multiply_solution = calculate_multiply(solution_string)
+    if multiply_solution == 0:
+        return False
+
+    # see process_solution
+    if is_circuit_open(network):
+        count('solutions_shed')
+        return False
+
+    bible_hash = solution_string.get_bible_hash()
+    if writer.is_pending(bible_hash) or await run_in_thread(is_known_bible_hash, bible_hash):
+        return False
+
+    full = True
+    if settings.POOL_VALIDATION_SAMPLE < 1:
+        full = await run_in_thread(should_validate_fully, solution_string.get_miner_id())
+
+    work = None
+    try:
+        try:
+            work = await run_in_thread(load_work, network, solution_string.get_work_id())
+        except (Work.DoesNotExist, InvalidWorkToken):
+            raise UnknownWork()
+
+        if not await avalidate_solution(network, solution_string, client, work=work, full=full):
+            raise InvalidSolution()
+    except Exception as ex:
+        # not the fault of the miner, the message is handled again
+        if isinstance(ex, DatabaseError):
+            raise
+
+        if is_unavailable(ex):
+            # not the fault of the miner, so it is no rejected solution
+            count('solutions_shed')
+            return False
+
+        rejected = await run_in_thread(reject_solution, network, solution_string, solution_s, type(ex).__name__, work)
+        if rejected is not None:
+            await writer.add(rejected)
+        await run_in_thread(flush_rejections)
+        return False
+
+    work_id = await run_in_thread(get_work_pk, network, solution_string.get_work_id())
+    hps = calculate_hps(solution_string)
+
+    solutions = []
+    for r in range(0, multiply_solution):
+        solutions.append(Solution(
+            work_id = work_id,
+            miner_id = solution_string.get_miner_id(),
+            network = network,
+
+            bible_hash = bible_hash if r == 0 else bible_hash + '#' + str(r),
+            solution = '' if full else solution_s, # only needed for the audit
+
+            hps = hps,
+            provisional = not full,
+        ))
+
+    await writer.add(*solutions)
+    return True
+
+def decode_task_message(body, headers):
+    """ returns (task name, args, kwargs) of a celery task message """
+
+    # task protocol 2: the name is in the headers, the body is (args, kwargs, embed)
+    if headers and 'task' in headers:
+        args, kwargs = body[0], body[1]
+        return headers['task'], list(args), dict(kwargs)
+
+    # task protocol 1
+    return body['task'], list(body.get('args', [])), dict(body.get('kwargs', {}))
+
+def get_solution_args(args, kwargs, *names):
+    """ the arguments of a task by name, given by position or keyword """
+
+    values = list(args) + [kwargs[name] for name in names[len(args):]]
+    return values[:len(names)]
+
+class ValidatorService(object):
+    """ consumes the queue with a kombu consumer in a thread, and handles the
+        messages in the event loop. stop() is thread safe, the messages in
+        flight are finished before run() returns """
+
+    def __init__(self, app, queue_name, in_flight, flush_size, flush_delay):
+        self.app = app
+        self.queue_name = queue_name
+        self.in_flight = in_flight
+        self.flush_size = flush_size
+        self.flush_delay = flush_delay
+
+        self.stopping = threading.Event()
+        self.finished = threading.Event()
+        self.acks = queue.Queue()
+        self.clients = {}
+        self.handled = 0
+
+    def stop(self):
+        self.stopping.set()
+
+    def run(self):
+        check_bible_hash_settings()
+        asyncio.run(self.main(signals=True))
+
+    def get_client(self, network):
+        if not network in self.clients:
+            self.clients[network] = AsyncBiblePayRpcClient(network)
+        return self.clients[network]
+
+    async def main(self, signals=False):
+        loop = asyncio.get_running_loop()
+
+        self.messages = asyncio.Queue()
+        self.semaphore = asyncio.Semaphore(self.in_flight)
+        self.writer = SolutionWriter(self.flush_size, self.flush_delay)
+
+        if signals:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                loop.add_signal_handler(sig, self.stop)
+
+        consumer = threading.Thread(target=self.consume, args=(loop,), daemon=True)
+        consumer.start()
+
+        tasks = set()
+        try:
+            while True:
+                item = await self.messages.get()
+                if item is None:
+                    break
+
+                task = asyncio.ensure_future(self.handle(*item))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+
+            if tasks:
+                await asyncio.wait(list(tasks))
+            await self.writer.close()
+        finally:
+            self.finished.set()
+            await loop.run_in_executor(None, consumer.join)
+
+            for client in self.clients.values():
+                client.close()
+
+    def consume(self, loop):
+        """ runs in its own thread, as kombu blocks """
+
+        try:
+            with self.app.connection_for_read() as connection:
+                task_queue = self.app.amqp.queues[self.queue_name]
+
+                def on_message(body, message):
+                    loop.call_soon_threadsafe(self.messages.put_nowait, (body, message))
+
+                with connection.Consumer(queues=[task_queue], callbacks=[on_message], accept=self.app.conf.accept_content) as consumer:
+                    consumer.qos(prefetch_count=self.in_flight)
+
+                    while not self.stopping.is_set():
+                        self.ack_messages()
+                        try:
+                            connection.drain_events(timeout=0.1)
+                        except socket.timeout:
+                            pass
+
+                    # no new messages, the not acknowledged ones go back to the queue
+                    consumer.cancel()
+                    loop.call_soon_threadsafe(self.messages.put_nowait, None)
+
+                    while not self.finished.wait(0.05):
+                        self.ack_messages()
+                    self.ack_messages()
+        except Exception:
+            traceback.print_exc()
+        finally:
+            self.stopping.set()
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self.messages.put_nowait, None)
+
+    def ack_messages(self):
+        """ kombu is not thread safe, so the messages are acknowledged by the consumer thread """
+
+        while True:
+            try:
+                message, done = self.acks.get_nowait()
+            except queue.Empty:
+                return
+
+            if done:
+                message.ack()
+            else:
+                message.requeue()
+
+    async def handle(self, body, message):
+        try:
+            name, args, kwargs = decode_task_message(body, message.headers)
+
+            if name == process_solution.name:
+                network, solution_s = get_solution_args(args, kwargs, 'network', 'solution_s')
+                await self.validate(network, solution_s)
+            elif name == process_solution_batch.name:
+                network, solution_strings = get_solution_args(args, kwargs, 'network', 'solution_strings')
+                await asyncio.gather(*[self.validate(network, solution_s) for solution_s in solution_strings])
+            else:
+                await run_in_thread(self.app.tasks[name].apply, args=args, kwargs=kwargs)
+        except DatabaseError:
+            # the solutions are not lost, they are validated again later
+            traceback.print_exc()
+            count('validator_requeued')
+            await asyncio.sleep(DATABASE_RETRY_SECONDS)
+
+            self.handled += 1
+            self.acks.put((message, False))
+            return
+        except Exception:
+            # the same as a failed task of a celery worker, the message is done
+            traceback.print_exc()
+
+        self.handled += 1
+        self.acks.put((message, True))
+
+    async def validate(self, network, solution_s):
+        async with self.semaphore:
+            try:
+                return await aprocess_solution(network, solution_s, self.get_client(network), self.writer)
+            except DatabaseError:
+                raise
+            except Exception:
+                traceback.print_exc()
+                return False
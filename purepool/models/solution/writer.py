@@ -0,0 +1,169 @@
+import os
+import uuid
+import atexit
+import traceback
+import threading
+from django.conf import settings
+from django.db import transaction, close_old_connections, DatabaseError
+from celery.signals import worker_process_shutdown
+from purepool.models.solution.models import Solution, RejectedSolution, SolutionHash
+from purepool.core.metrics import count
+
+# The accepted and rejected solutions of a celery worker process are not inserted one
+# by one, but collected and inserted together with bulk_create, every
+# POOL_SOLUTION_WRITE_SIZE rows or POOL_SOLUTION_WRITE_DELAY seconds (whatever comes first).
+#
+# A bible hash that is already in the database only skips its own row. If the insert
+# fails for another reason, the rows are inserted one by one, so only the broken row
+# is lost. The collected rows are written when the worker process stops.
+#
+# With POOL_PARTITIONING, the database does not keep bible_hash of the solutions unique
+# (see purepool.models.solution.partitions). The hashes are inserted into SolutionHash
+# first, and only the solutions with a new hash are inserted.
+
+def claim_solution_hashes(solutions):
+    """ inserts the bible hashes of the solutions into SolutionHash. Returns the
+        solutions whose bible hash was not known before, every hash only once """
+
+    claim = uuid.uuid4()
+    hashes = list(dict.fromkeys(solution.bible_hash for solution in solutions))
+    if not hashes:
+        return []
+
+    SolutionHash.objects.bulk_create([SolutionHash(bible_hash=bible_hash, claim=claim) for bible_hash in hashes], ignore_conflicts=True)
+    claimed = set(SolutionHash.objects.filter(bible_hash__in=hashes, claim=claim).values_list('bible_hash', flat=True))
+
+    new_solutions = []
+    for solution in solutions:
+        if solution.bible_hash in claimed:
+            claimed.remove(solution.bible_hash)
+            new_solutions.append(solution)
+
+    return new_solutions
+
+def write_solutions(objects):
+    """ inserts the Solutions and RejectedSolutions. Another process might have inserted
+        the same bible hash in the meantime, these rows are skipped """
+
+    if settings.POOL_PARTITIONING:
+        objects = claim_solution_hashes([o for o in objects if isinstance(o, Solution)]) + [o for o in objects if not isinstance(o, Solution)]
+
+    try:
+        Solution.objects.bulk_create([o for o in objects if isinstance(o, Solution)], ignore_conflicts=True)
+        RejectedSolution.objects.bulk_create([o for o in objects if isinstance(o, RejectedSolution)], ignore_conflicts=True)
+        return
+    except DatabaseError:
+        pass
+
+    # the rows that were already written are skipped as known bible hashes
+
+    for o in objects:
+        try:
+            with transaction.atomic():
+                type(o).objects.bulk_create([o], ignore_conflicts=True)
+        except DatabaseError as e:
+            count('solutions_write_failed')
+            print("Warning | ", "Solution not written", type(o).__name__, o.bible_hash, e)
+
+class BulkWriter(object):
+    """ Collects the rows and writes them with write_solutions in its own thread,
+        when max_size rows are collected or every max_delay seconds.
+        With a max_size of 1, every row is written at once by the caller. Thread safe """
+
+    def __init__(self, max_size, max_delay):
+        self.max_size = max_size
+        self.max_delay = max_delay
+
+        self.lock = threading.Lock()
+        self.rows = []
+        self.pending_hashes = set()
+        self.writing = threading.Lock() # one write at a time, so flush() waits for the thread
+
+        self.wakeup = threading.Event()
+        self.stopped = False
+        self.thread = None
+
+    def is_pending(self, bible_hash):
+        """ True if the bible hash is collected, but not yet in the database """
+
+        with self.lock:
+            return bible_hash in self.pending_hashes
+
+    def add(self, *objects):
+        if self.max_size <= 1 or self.stopped:
+            write_solutions(list(objects))
+            return
+
+        with self.lock:
+            self.rows.extend(objects)
+            self.pending_hashes.update(o.bible_hash for o in objects)
+            full = len(self.rows) >= self.max_size
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+
+        if full:
+            self.wakeup.set()
+
+    def run(self):
+        while not self.stopped:
+            self.wakeup.wait(self.max_delay)
+            self.wakeup.clear()
+
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+
+            # the connection of this thread is never closed by django itself
+            close_old_connections()
+
+    def flush(self):
+        """ writes everything that is collected """
+
+        with self.writing:
+            with self.lock:
+                rows = self.rows
+                self.rows = []
+
+            if not rows:
+                return
+
+            try:
+                write_solutions(rows)
+            finally:
+                with self.lock:
+                    self.pending_hashes.difference_update(o.bible_hash for o in rows)
+
+    def stop(self):
+        self.stopped = True
+        self.wakeup.set()
+        self.flush()
+
+_bulk_writer = None
+_bulk_writer_pid = None
+_bulk_writer_lock = threading.Lock()
+
+def get_bulk_writer():
+    """ the writer of this process """
+
+    global _bulk_writer, _bulk_writer_pid
+
+    with _bulk_writer_lock:
+        # a forked process has no writer thread, and must not write the rows of its parent
+        if _bulk_writer is None or _bulk_writer_pid != os.getpid():
+            _bulk_writer = BulkWriter(settings.POOL_SOLUTION_WRITE_SIZE, settings.POOL_SOLUTION_WRITE_DELAY)
+            _bulk_writer_pid = os.getpid()
+
+        return _bulk_writer
+
+def flush_bulk_writer(**kwargs):
+    """ writes the collected rows on a normal shutdown. The celery worker processes
+        do not run the atexit handlers, so the signal is used there """
+
+    if _bulk_writer is not None and _bulk_writer_pid == os.getpid():
+        _bulk_writer.stop()
+
+atexit.register(flush_bulk_writer)
+worker_process_shutdown.connect(flush_bulk_writer)
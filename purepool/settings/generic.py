@@ -78,7 +78,10 @@ CELERY_TASK_ROUTES = {
     
     # low priority, but must run with a lot of runners
     'purepool.models.solution.tasks.process_solution': {'queue': 'standard'}, 
+    'purepool.models.solution.tasks.process_solution_batch': {'queue': 'standard'},
     'purepool.models.solution.tasks.cleanup_solutions': {'queue': 'standard'},
+    'purepool.models.solution.tasks.audit_solutions': {'queue': 'standard'},
+    'purepool.models.solution.tasks.save_works': {'queue': 'standard'},
 }
 
 
@@ -117,3 +120,188 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/2.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+
+# Pool defaults. Can be changed in the local.py
+
+# How the Work given to the miners on readytomine2 is stored:
+#  "database" = every Work is a row in the solution_work table
+#  "token" = the work id is a signed token that holds all information about the Work.
+#            No database write is required for readytomine2, the Work row is only created
+#            by the backend when a solution for it is found
+#  "cache" = the Work is written to the cache POOL_WORK_CACHE (an alias of CACHES) for
+#            POOL_WORK_CACHE_TIMEOUT seconds, and the solutions are checked against it.
+#            The rows are written by the save_works task, in batches of POOL_WORK_BATCH_SIZE
+#            or every POOL_WORK_BATCH_DELAY seconds. With POOL_WORK_CACHE_ONLY, a row is
+#            only created by the backend when a solution for the Work is found. Once
+#            a row is written, a marker in the cache tells the backend so, and the
+#            solutions of the Work need no query at all
+# All kind of work ids are always accepted, so the mode can be changed at any time
+POOL_WORK_MODE = 'database'
+
+# The key used to sign the work tokens. Must be the same for the interface and the backend!
+# If None, the SECRET_KEY is used
+POOL_WORK_TOKEN_KEY = None
+
+# Solutions for work tokens older then this (in seconds) are not accepted
+POOL_WORK_TOKEN_MAX_AGE = 60 * 60 * 24
+
+POOL_WORK_CACHE = 'default'
+POOL_WORK_CACHE_TIMEOUT = 60 * 60 * 24
+POOL_WORK_CACHE_ONLY = False
+POOL_WORK_BATCH_SIZE = 100
+POOL_WORK_BATCH_DELAY = 1
+
+# The interface remembers the bible hashes of the solutions it had put into the task queue
+# for this amount of seconds, and answers resubmitted solutions directly. 0 disables the filter
+POOL_DUPLICATE_SOLUTION_TIMEOUT = 60 * 60
+
+# The interface can collect the solutions and send them as one task to the backend.
+# A batch is send when POOL_SOLUTION_BATCH_SIZE solutions are collected, or after
+# POOL_SOLUTION_BATCH_DELAY seconds. A size of 1 sends every solution as its own task
+POOL_SOLUTION_BATCH_SIZE = 1
+POOL_SOLUTION_BATCH_DELAY = 0.02
+
+# The celery workers insert the solutions of process_solution together, every
+# POOL_SOLUTION_WRITE_SIZE rows or after POOL_SOLUTION_WRITE_DELAY seconds. The rows are
+# written when the worker stops normally, but are lost if it is killed.
+# A size of 1 inserts every solution at once
+POOL_SOLUTION_WRITE_SIZE = 1
+POOL_SOLUTION_WRITE_DELAY = 0.05
+
+# The solution and rejected solution tables are partitioned by day (MySQL only), so
+# cleanup_solutions drops the old partitions instead of deleting rows. The tables are
+# converted once with "manage_partitions --setup", see purepool.models.solution.partitions.
+# The bible hashes are then kept unique in the SolutionHash table. The work table is
+# not partitioned, its ids must stay unique.
+# The partitions are created POOL_PARTITIONS_AHEAD days ahead by cleanup_solutions
+POOL_PARTITIONING = False
+POOL_PARTITIONS_AHEAD = 7
+
+# Variable difficulty: the hash target of every worker is changed, so that it sends around
+# POOL_VARDIFF_SHARES_PER_MINUTE solutions. Every solution counts as "difficulty" shares
+# in the shareout. The difficulty is checked every POOL_VARDIFF_RETARGET_SECONDS and is
+# always a power of 2 between 1 and POOL_VARDIFF_MAX_DIFFICULTY
+POOL_VARDIFF_ENABLED = False
+POOL_VARDIFF_SHARES_PER_MINUTE = 6
+POOL_VARDIFF_RETARGET_SECONDS = 120
+POOL_VARDIFF_MAX_DIFFICULTY = 1024
+
+# Every interface process keeps the ids of up to POOL_LOCAL_ID_CACHE_SIZE workers in memory,
+# in front of the shared cache. 0 disables it. It is checked every
+# POOL_LOCAL_ID_CACHE_CHECK_INTERVAL seconds if a miner was disabled in the meantime
+# (with the "set_miner_enabled" command, or any change of Miner.enabled by django). The
+# ids expire after the TIMEOUT of the default cache, like the ones in the shared cache.
+# With POOL_LOCAL_ID_CACHE_WARMUP, the workers of the most active miners are loaded
+# from the database with the first request
+POOL_LOCAL_ID_CACHE_SIZE = 10000
+POOL_LOCAL_ID_CACHE_CHECK_INTERVAL = 30
+POOL_LOCAL_ID_CACHE_WARMUP = True
+
+# Rate limits for the miner requests, as (requests per second, burst) per ip and per miner.
+# None disables the limit. Requests over the limit are answered with an error and counted
+# in the metrics (see the "show_metrics" command).
+# Every process adds its counts to the shared cache after POOL_RATELIMIT_SYNC_REQUESTS
+# requests of an ip/miner, so the limit is also checked for all processes together
+POOL_RATELIMIT_IP = None
+POOL_RATELIMIT_MINER = None
+POOL_RATELIMIT_SYNC_REQUESTS = 20
+
+# The metrics are collected in every process and added to the shared cache
+# every POOL_METRICS_FLUSH_SECONDS seconds
+POOL_METRICS_FLUSH_SECONDS = 10
+
+# The interface rejects solutions that can not be valid (wrong format, bible hash over the
+# hash target, outdated block) before they are put into the task queue. They are not saved
+# as RejectedSolution, only counted in the metrics
+POOL_SOLUTION_PREVALIDATION = True
+
+# The height and max nonce of the chain are cached for this amount of seconds, instead of
+# asking biblepayd for every solution. A new block found by find_new_blocks clears them
+POOL_CHAIN_TIP_TIMEOUT = 10
+
+# The connections to biblepayd are kept open (http keep-alive) and shared in every process.
+# At most POOL_RPC_POOL_SIZE idle connections are kept per biblepayd. A connection
+# idle for more then POOL_RPC_IDLE_SECONDS seconds is closed, as biblepayd closes them too
+POOL_RPC_POOL_SIZE = 4
+POOL_RPC_IDLE_SECONDS = 15
+
+# With more then one biblepayd per network (see BIBLEPAY_RPC), a node that does not answer
+# is not used for POOL_RPC_NODE_RETRY_SECONDS seconds. The heights of the read nodes are
+# compared every POOL_RPC_NODE_CHECK_SECONDS seconds, a node more then POOL_RPC_NODE_MAX_LAG
+# blocks behind the best one is not used until it has catched up
+POOL_RPC_NODE_RETRY_SECONDS = 30
+POOL_RPC_NODE_CHECK_SECONDS = 10
+POOL_RPC_NODE_MAX_LAG = 2
+
+# The timeout of the calls to biblepayd in seconds, and the timeouts of single methods
+# (or "exec" commands). A hanging biblepayd should not block a celery worker for long
+POOL_RPC_TIMEOUT = 15
+POOL_RPC_TIMEOUTS = {
+    'biblehash': 5,
+    'hexblocktocoinbase': 5,
+    'pinfo': 5,
+    'sendtoaddress': 60,
+}
+
+# At most POOL_RPC_MAX_CONCURRENT read calls to biblepayd run at once in a process. A call
+# that waited POOL_RPC_QUEUE_SECONDS for its turn fails
+POOL_RPC_MAX_CONCURRENT = 8
+POOL_RPC_QUEUE_SECONDS = 5
+
+# After POOL_RPC_BREAKER_FAILURES failed read calls in a row (timeouts, no connection),
+# the calls fail at once for POOL_RPC_BREAKER_RESET_SECONDS seconds, and the solutions
+# are dropped without validation. The state is shown by the "show_metrics" command
+POOL_RPC_BREAKER_FAILURES = 5
+POOL_RPC_BREAKER_RESET_SECONDS = 30
+
+# The recipient of a solution is read from its coinbase transaction by the pool itself,
+# so only solutions for the pool address are sent to biblepayd. If False, the recipient
+# of the hexblocktocoinbase rpc call is used
+POOL_COINBASE_LOCAL_CHECK = True
+
+# Who calculates the bible hash of a solution: "rpc" (biblepayd), "local" (the function
+# POOL_BIBLEHASH_FUNCTION, a dotted path) or "shadow" (biblepayd, but the local function
+# is compared for POOL_BIBLEHASH_SHADOW_SAMPLE of the solutions, see "show_metrics").
+# "local" and "shadow" need the function, the validator service does not start without it
+POOL_BIBLEHASH_VERIFIER = 'rpc'
+POOL_BIBLEHASH_FUNCTION = None
+POOL_BIBLEHASH_SHADOW_SAMPLE = 0.01
+
+# Only POOL_VALIDATION_SAMPLE (0 to 1) of the solutions of trusted miners are checked by
+# biblepayd right away, the others are accepted provisionally and checked by the
+# "audit_solutions" task (see deploy/cron), at the latest before the shareout of their
+# block. A worker caught with a wrong solution loses all its unpaid solutions mined from
+# the same ip. A solution is only accepted for the miner its work was given to.
+# Miners are trusted more and more, until they are POOL_VALIDATION_TRUST_DAYS days old.
+# 1 validates every solution at once
+POOL_VALIDATION_SAMPLE = 1
+POOL_VALIDATION_TRUST_DAYS = 7
+POOL_AUDIT_BATCH_SIZE = 100
+
+# The validator service ("run_validator" command) consumes the POOL_VALIDATOR_QUEUE queue
+# instead of celery workers, with up to POOL_VALIDATOR_IN_FLIGHT solutions validated at
+# once. The results are inserted together, every POOL_VALIDATOR_FLUSH_SIZE rows or after
+# POOL_VALIDATOR_FLUSH_MS milliseconds. Every biblepayd gets at most
+# POOL_VALIDATOR_RPC_CONNECTIONS connections from one validator
+POOL_VALIDATOR_QUEUE = 'standard'
+POOL_VALIDATOR_IN_FLIGHT = 500
+POOL_VALIDATOR_FLUSH_SIZE = 200
+POOL_VALIDATOR_FLUSH_MS = 50
+POOL_VALIDATOR_RPC_CONNECTIONS = 32
+
+# Without partitions, cleanup_solutions deletes the old rows in chunks of
+# POOL_RETENTION_CHUNK_SIZE rows with a pause of POOL_RETENTION_SLEEP seconds between them.
+# After POOL_RETENTION_TIME_BUDGET seconds it stops, the next run continues there
+POOL_RETENTION_CHUNK_SIZE = 5000
+POOL_RETENTION_SLEEP = 0.5
+POOL_RETENTION_TIME_BUDGET = 60 * 10
+
+# Rejected solutions are counted per miner, worker, exception and minute. Every process
+# adds its counts to the database every POOL_REJECTION_FLUSH_SECONDS seconds (0 adds them
+# after every task, which costs queries in storms of bad solutions). The raw
+# solution is only kept for the first POOL_REJECTED_SAMPLES_PER_BUCKET rejections of
+# such a minute, and for at most POOL_REJECTED_SAMPLES_PER_MINUTE per process and minute
+POOL_REJECTION_FLUSH_SECONDS = 10
+POOL_REJECTED_SAMPLES_PER_BUCKET = 2
+POOL_REJECTED_SAMPLES_PER_MINUTE = 100
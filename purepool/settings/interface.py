@@ -0,0 +1,17 @@
+# Settings for a pure pool interface installation, running as asgi application
+# (see purepool/asgi.py). Use it with DJANGO_SETTINGS_MODULE=purepool.settings.interface
+#
+# The miners only need the Action.aspx, so everything else (frontend, sessions,
+# auth, csrf, messages...) is not loaded here
+
+from purepool.settings import *
+
+ROOT_URLCONF = 'purepool.interface.urls'
+
+# the mining protocol uses none of the default middlewares
+MIDDLEWARE = [
+    'django.middleware.common.CommonMiddleware',
+]
+
+ENABLE_POOL_INTERFACE = True
+ENABLE_POOL_FRONTEND = False
@@ -0,0 +1,130 @@
+import socket
+import asyncio
+from unittest import mock
+from django.test import TestCase, override_settings
+from bitcoinrpc.authproxy import JSONRPCException
+from biblepay.asyncclient import AsyncBiblePayRpcClient
+from biblepay.clients import UnknownServerMessage
+from biblepay.nodes import NodePool, CircuitOpen
+from tests.biblepay.test_connections import start_server
+
+def get_free_port():
+    """ a port nobody listens on """
+
+    s = socket.socket()
+    s.bind(('127.0.0.1', 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def get_node(port, role=None):
+    node = {'IP': '127.0.0.1', 'PORT': port, 'USER': 'user', 'PASSWORD': 'password'}
+    if role is not None:
+        node['ROLE'] = role
+    return node
+
+class AsyncBiblePayRpcClientTestCase(TestCase):
+
+    def setUp(self):
+        self.server = start_server(self)
+
+        # the height check of the nodes (see test_nodes) would keep a connection
+        # to the server open, that only handles one at a time
+        patcher = mock.patch.object(NodePool, 'start_height_check')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def wait_for_close(self, client):
+        """ until the client knows that biblepayd closed the idle connections """
+
+        for i in range(0, 100):
+            if all(reader.at_eof() for connections in client.connections.values() for reader, writer, released_at in connections.idle):
+                return
+            await asyncio.sleep(0.01)
+
+    async def test_calls(self):
+        with override_settings(BIBLEPAY_RPC={'main': get_node(self.server.server_port)}):
+            client = AsyncBiblePayRpcClient('main')
+
+        self.assertEqual(await client.bible_hash('abc', '1', '2', '3', '4'), 'abc')
+        self.assertEqual(await client.pinfo(), 'exec')
+        self.assertEqual(await client.call('getblockhash', 5), 'hash5')
+
+        with self.assertRaises(UnknownServerMessage):
+            await client.bible_hash('broken', '1', '2', '3', '4')
+
+        with self.assertRaises(JSONRPCException):
+            await client.call('fail')
+
+        # all calls with one connection
+        self.assertEqual(len(self.server.connections), 1)
+        self.assertEqual(self.server.requests, 5)
+
+        client.close()
+
+    async def test_closed_connection(self):
+        with override_settings(BIBLEPAY_RPC={'main': get_node(self.server.server_port)}):
+            client = AsyncBiblePayRpcClient('main')
+
+        self.assertEqual(await client.call('getblockhash', 1), 'hash1')
+
+        # biblepayd closes the idle connection, the call is send with a new one
+        for connection in self.server.connections:
+            connection.shutdown(2)
+        await self.wait_for_close(client)
+
+        self.assertEqual(await client.call('getblockhash', 2), 'hash2')
+        self.assertEqual(len(self.server.connections), 2)
+
+        client.close()
+
+    async def test_failover(self):
+        nodes = [get_node(get_free_port()), get_node(self.server.server_port), get_node(get_free_port(), 'wallet')]
+        with override_settings(BIBLEPAY_RPC={'main': nodes}, POOL_RPC_NODE_RETRY_SECONDS=30):
+            client = AsyncBiblePayRpcClient('main')
+
+            # the wallet node is not used for the validation
+            self.assertEqual(len(client.nodes), 2)
+
+            self.assertEqual(await client.call('getblockhash', 1), 'hash1')
+            self.assertEqual(await client.call('getblockhash', 2), 'hash2')
+
+        # the broken node is not used until POOL_RPC_NODE_RETRY_SECONDS are over
+        self.assertGreater(client.nodes[0].failed_until, 0)
+        self.assertEqual(self.server.requests, 2)
+
+        client.close()
+
+    async def test_lagging(self):
+        nodes = [get_node(self.server.server_port), get_node(get_free_port())]
+        with override_settings(BIBLEPAY_RPC={'main': nodes}):
+            client = AsyncBiblePayRpcClient('main')
+
+        # the lag is found by the height check of the NodePool. The lagging node
+        # would be the first choice otherwise, and fail
+        client.nodes[1].outstanding = -1
+        client.nodes[1].lagging = True
+        self.assertEqual(await client.call('getblockhash', 1), 'hash1')
+        self.assertEqual(client.nodes[1].failed_until, 0)
+
+        client.close()
+
+    async def test_breaker(self):
+        with override_settings(BIBLEPAY_RPC={'main': get_node(get_free_port())}, POOL_RPC_BREAKER_FAILURES=2, POOL_RPC_BREAKER_RESET_SECONDS=30):
+            client = AsyncBiblePayRpcClient('main')
+
+        for i in range(0, 2):
+            with self.assertRaises(OSError):
+                await client.pinfo()
+
+        # the same breaker as the BiblePayRpcClient of the process
+        with self.assertRaises(CircuitOpen):
+            await client.pinfo()
+        self.assertTrue(client.node_pool.breaker.is_open())
+
+    async def test_no_node(self):
+        with override_settings(BIBLEPAY_RPC={'main': get_node(get_free_port())}):
+            client = AsyncBiblePayRpcClient('main')
+
+            with self.assertRaises(OSError):
+                await client.pinfo()
@@ -0,0 +1,42 @@
+from unittest import mock
+from django.test import TestCase
+from biblepay.breaker import CircuitBreaker, STATE_CLOSED, STATE_OPEN, STATE_HALF_OPEN
+
+class CircuitBreakerTestCase(TestCase):
+
+    def test_breaker(self):
+        changes = []
+        breaker = CircuitBreaker(3, 30, on_change=changes.append)
+
+        with mock.patch('biblepay.breaker.time.monotonic', return_value=100):
+            breaker.failure()
+            breaker.failure()
+            breaker.success() # only failures in a row count
+            breaker.failure()
+            breaker.failure()
+            self.assertTrue(breaker.allow())
+
+            breaker.failure()
+            self.assertEqual(breaker.state, STATE_OPEN)
+            self.assertTrue(breaker.is_open())
+            self.assertFalse(breaker.allow())
+
+        # one trial call after the reset time, the others still fail
+        with mock.patch('biblepay.breaker.time.monotonic', return_value=130):
+            self.assertFalse(breaker.is_open())
+            self.assertTrue(breaker.allow())
+            self.assertEqual(breaker.state, STATE_HALF_OPEN)
+            self.assertFalse(breaker.allow())
+
+            # the trial failed
+            breaker.failure()
+            self.assertEqual(breaker.state, STATE_OPEN)
+            self.assertFalse(breaker.allow())
+
+        with mock.patch('biblepay.breaker.time.monotonic', return_value=160):
+            self.assertTrue(breaker.allow())
+            breaker.success()
+            self.assertEqual(breaker.state, STATE_CLOSED)
+            self.assertTrue(breaker.allow())
+
+        self.assertEqual(changes, [STATE_OPEN, STATE_HALF_OPEN, STATE_OPEN, STATE_HALF_OPEN, STATE_CLOSED])
@@ -0,0 +1,35 @@
+from django.test import TestCase
+from biblepay.coinbase import read_coinbase_outputs, get_coinbase_recipient, script_to_address, is_block_coinbase, CoinbaseInvalid
+
+TRANSACTION_HEX = '01000000010000000000000000000000000000000000000000000000000000000000000000ffffffff05026e4b0103ffffffff01ca6940057a0100001976a914e83c22b58de63a91952524084f46415c985d715c88acfdce013c5645523e312e302e382e363c2f5645523e3c4d494e4552475549443e65656635636263622d663637332d343230332d613739312d6637373362313737663164663c2f4d494e4552475549443e3c706f6c6d6573736167653e666531313263363532643964643063663436326135333762636466363561323537663461613331303032396666373432383964396366623665303161396662623c2f706f6c6d6573736167653e3c706f6c7765696768743e35363438302e35313c2f706f6c7765696768743e3c706f6c616d6f756e743e31363437342e30303c2f706f6c616d6f756e743e3c706f6c6176676167653e332e3432393c2f706f6c6176676167653e3c5349475f303e494d3736436d344e57376e554e78614e5050797662373473424d437945586e314d49347339376b4f334d475a6469672f496a59486c48594139637346616b3769756451536c6769596f643366756d4c2f44797075706e593d3c2f5349475f303e3c5349475f313e494e684d7a47487658727a4b654366424e384d4c584671466b45495a36455758694a572f6535334e73384e4c5652755274535877395830337937452b46447a7a68455762744756543868307a42477751484c33305930513d3c2f5349475f313e00000000'
+BLOCK_HEADER_HEX = '000000209928ce1b5ba829fde591237d3876df45daa2dd30ec31805b43dd6b972eae9aff3fab6ced6b34254aeb8c7f004cb82178984dbf22ea5c5316ac33ae6ec90ef17db3797b5aa5aa081d89370000'
+
+class CoinbaseTestCase(TestCase):
+
+    def test_outputs(self):
+        outputs = read_coinbase_outputs(TRANSACTION_HEX)
+
+        self.assertEqual(len(outputs), 1)
+        self.assertEqual(outputs[0][0], 1623585745354)
+        self.assertEqual(outputs[0][1].hex(), '76a914e83c22b58de63a91952524084f46415c985d715c88ac')
+
+    def test_recipient(self):
+        self.assertEqual(get_coinbase_recipient(TRANSACTION_HEX, 'main'), 'BRd2RWkMGZrEVqXycrSh6yUREbezeNNZeF')
+        self.assertEqual(get_coinbase_recipient(TRANSACTION_HEX, 'test'), 'yhVPf12UvK8zYgZwS6kLsPmtccHUQiD3Q9')
+
+    def test_script_to_address(self):
+        # pay to script hash
+        self.assertEqual(script_to_address(bytes.fromhex('a914e83c22b58de63a91952524084f46415c985d715c87'), 'main')[0], '7')
+
+        # a pubkey or anything else has no address here
+        self.assertIsNone(script_to_address(bytes.fromhex('6a0401020304'), 'main'))
+
+    def test_invalid(self):
+        for transaction_hex in (TRANSACTION_HEX[:100], 'XYZ', '', TRANSACTION_HEX.replace('ffffffff05', 'fefefefe05', 1)):
+            with self.assertRaises(CoinbaseInvalid):
+                get_coinbase_recipient(transaction_hex, 'main')
+
+    def test_block_coinbase(self):
+        self.assertTrue(is_block_coinbase(BLOCK_HEADER_HEX + '02' + TRANSACTION_HEX + '0100', TRANSACTION_HEX))
+        self.assertFalse(is_block_coinbase(BLOCK_HEADER_HEX + '02' + '0100' + TRANSACTION_HEX, TRANSACTION_HEX))
+        self.assertFalse(is_block_coinbase('0000', TRANSACTION_HEX))
@@ -0,0 +1,202 @@
+import time
+from django.test import TestCase, override_settings
+from bitcoinrpc.authproxy import JSONRPCException
+from biblepay.breaker import CircuitBreaker
+from biblepay.nodes import Node, NodePool, NodeServiceProxy, NoNodeAvailable, CircuitOpen, TooManyCalls, get_node_pool, ROLE_READ, ROLE_WALLET
+
+class FakeConnectionPool(object):
+    """ answers every call with its name, or raises the error """
+
+    def __init__(self, name, height=100, error=None):
+        self.name = name
+        self.height = height
+        self.error = error
+        self.calls = []
+        self.timeouts = []
+
+    def call(self, method, *args, timeout=None):
+        self.calls.append(method)
+        self.timeouts.append(timeout)
+
+        if self.error is not None:
+            raise self.error
+        if args == ('pinfo',):
+            return {'height': self.height, 'pinfo': 1000}
+
+        return self.name
+
+    def batch(self, calls, timeout=None):
+        return [self.call(method, *args) for method, args in calls]
+
+def create_node(name, roles=(ROLE_READ,), **kwargs):
+    return Node(name, FakeConnectionPool(name, **kwargs), roles)
+
+def create_node_pool(nodes, **kwargs):
+    pool = NodePool(nodes, check_interval=10, max_lag=2, retry_seconds=30, **kwargs)
+
+    # no height checks in the background, they are started by the tests
+    pool.checked_at = time.monotonic()
+
+    return pool
+
+class NodePoolTestCase(TestCase):
+
+    def test_least_outstanding(self):
+        node1, node2 = create_node('node1'), create_node('node2')
+        pool = create_node_pool([node1, node2])
+
+        # node1 is busy
+        node1.outstanding = 3
+        for i in range(0, 4):
+            self.assertEqual(pool.call('getblockcount'), 'node2')
+
+        # both are idle, so the calls are spread
+        node1.outstanding = 0
+        self.assertEqual(set([pool.call('getblockcount'), pool.call('getblockcount')]), set(['node1', 'node2']))
+        self.assertEqual(node1.outstanding, 0)
+        self.assertEqual(node2.outstanding, 0)
+
+    def test_roles(self):
+        pool = create_node_pool([create_node('read'), create_node('wallet', roles=(ROLE_WALLET,))])
+
+        for i in range(0, 4):
+            self.assertEqual(pool.call('exec', 'biblehash'), 'read')
+            self.assertEqual(pool.call('sendtoaddress', 'ADDR', 1), 'wallet')
+
+        self.assertEqual(pool.batch([('getblockhash', (1,)), ('getblockhash', (2,))]), ['read', 'read'])
+
+        # no wallet node
+        pool = create_node_pool([create_node('read')])
+        with self.assertRaises(NoNodeAvailable):
+            pool.call('getwalletinfo')
+
+    def test_failover(self):
+        node1 = create_node('node1', error=ConnectionRefusedError())
+        node2 = create_node('node2')
+        pool = create_node_pool([node1, node2])
+
+        for i in range(0, 4):
+            self.assertEqual(pool.call('getblockcount'), 'node2')
+
+        # node1 is not asked again until retry_seconds are over
+        self.assertEqual(len(node1.pool.calls), 1)
+        self.assertFalse(node1.is_healthy(0))
+
+        # all nodes are down
+        node2.pool.error = ConnectionRefusedError()
+        node2.failed_until = 0
+        with self.assertRaises(ConnectionRefusedError):
+            pool.call('getblockcount')
+
+    def test_no_failover(self):
+        node1 = create_node('node1', roles=(ROLE_WALLET,), error=ConnectionResetError())
+        node2 = create_node('node2', roles=(ROLE_WALLET,), error=ConnectionResetError())
+        pool = create_node_pool([node1, node2])
+
+        # the payment might be done
+        with self.assertRaises(ConnectionResetError):
+            pool.call('sendtoaddress', 'ADDR', 1)
+        self.assertEqual(len(node1.pool.calls) + len(node2.pool.calls), 1)
+
+        # an error answer is no problem of the node
+        node1.pool.error = node2.pool.error = JSONRPCException({'code': -5, 'message': 'Invalid address'})
+        node1.failed_until = node2.failed_until = 0
+        with self.assertRaises(JSONRPCException):
+            pool.call('getwalletinfo')
+        self.assertEqual(len(node1.pool.calls) + len(node2.pool.calls), 2)
+        self.assertTrue(node1.is_healthy(0) and node2.is_healthy(0))
+
+    def test_lagging(self):
+        node1, node2, node3 = create_node('node1', height=100), create_node('node2', height=101), create_node('node3', height=90)
+        pool = create_node_pool([node1, node2, node3])
+
+        pool.check_heights()
+
+        self.assertFalse(node1.lagging)
+        self.assertFalse(node2.lagging)
+        self.assertTrue(node3.lagging)
+
+        for i in range(0, 4):
+            self.assertNotEqual(pool.call('getblockcount'), 'node3')
+
+        # catched up
+        node3.pool.height = 101
+        pool.check_heights()
+        self.assertFalse(node3.lagging)
+
+    def test_pinned(self):
+        node1, node2, node3 = create_node('node1'), create_node('node2'), create_node('node3', roles=(ROLE_WALLET,))
+        pool = create_node_pool([node1, node2, node3])
+
+        proxy = NodeServiceProxy(pool)
+        proxy.getblockhash(1)
+        pinned = proxy.pins[ROLE_READ]
+        other = node2 if pinned is node1 else node1
+
+        # the proxy stays with its node, even if it is busy or lagging
+        pinned.outstanding = 3
+        pinned.lagging = True
+        for i in range(0, 4):
+            self.assertEqual(proxy.getblock('hash'), pinned.name)
+            self.assertEqual(proxy.batch([('getblockhash', (1,))]), [pinned.name])
+
+        # the other proxies are spread as before
+        self.assertEqual(NodeServiceProxy(pool).getblockhash(1), other.name)
+
+        # the wallet calls have their own node
+        self.assertEqual(proxy.getwalletinfo(), 'node3')
+        self.assertEqual(proxy.getblock('hash'), pinned.name)
+
+        # a node that does not answer is left
+        pinned.pool.error = ConnectionRefusedError()
+        self.assertEqual(proxy.getblock('hash'), other.name)
+        self.assertIs(proxy.pins[ROLE_READ], other)
+
+        pinned.failed_until = 0
+        self.assertEqual(proxy.getblock('hash'), other.name)
+
+    @override_settings(BIBLEPAY_RPC={'main': {'IP': '127.0.0.1', 'PORT': '1', 'USER': 'user', 'PASSWORD': 'password'}})
+    def test_single_node_setting(self):
+        node_pool = get_node_pool('main')
+
+        self.assertEqual(len(node_pool.nodes), 1)
+        self.assertEqual(node_pool.nodes[0].roles, (ROLE_READ, ROLE_WALLET))
+        self.assertIs(get_node_pool('main'), node_pool)
+
+    def test_timeouts(self):
+        node = create_node('node1')
+        pool = create_node_pool([node], timeouts={'biblehash': 3, 'getblock': 7})
+
+        pool.call('exec', 'biblehash', 'aa')
+        pool.call('getblock', 'aa')
+        pool.call('getblockcount')
+
+        self.assertEqual(node.pool.timeouts, [3, 7, None])
+
+    def test_breaker(self):
+        node = create_node('node1', error=TimeoutError())
+        pool = create_node_pool([node], breaker=CircuitBreaker(2, 30))
+
+        for i in range(0, 2):
+            with self.assertRaises(TimeoutError):
+                pool.call('getblockcount')
+
+        # biblepayd is not asked anymore
+        with self.assertRaises(CircuitOpen):
+            pool.call('getblockcount')
+        self.assertEqual(len(node.pool.calls), 2)
+
+        # the wallet calls are not stopped
+        node.roles = (ROLE_READ, ROLE_WALLET)
+        with self.assertRaises(TimeoutError):
+            pool.call('getwalletinfo')
+
+    def test_too_many_calls(self):
+        pool = create_node_pool([create_node('node1')], max_concurrent=1, queue_seconds=0.01)
+
+        pool.semaphore.acquire()
+        with self.assertRaises(TooManyCalls):
+            pool.call('getblockcount')
+
+        pool.semaphore.release()
+        self.assertEqual(pool.call('getblockcount'), 'node1')
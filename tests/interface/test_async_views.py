@@ -0,0 +1,55 @@
+from unittest import mock
+from django.urls import reverse
+from django.test import AsyncClient
+from django.test import TransactionTestCase, override_settings
+from django.core.cache import cache
+from purepool.models.miner.models import Miner, Worker, clear_local_id_cache
+from purepool.models.solution.models import Work
+
+@override_settings(ROOT_URLCONF='purepool.interface.urls', MIDDLEWARE=[], POOL_ADDRESS={'main': 'ABCDEFG'})
+class AsyncActionViewTestCase(TransactionTestCase):
+
+    def setUp(self):
+        self.client = AsyncClient()
+
+        # the miner and worker ids are cached, so we start with an empty cache
+        cache.clear()
+        clear_local_id_cache()
+
+    async def test_invalid_action(self):
+        response = await self.client.post(reverse('action_aspx'))
+
+        self.assertEqual(response.content, b'<RESPONSE>UNKNOWN ACTION EMPTY</RESPONSE><ERROR>UNKNOWN ACTION EMPTY</ERROR><EOF>')
+
+    async def test_readytomine2(self):
+        response = await self.client.post(reverse('action_aspx'), Action="readytomine2")
+        self.assertEqual(response.content, b'<RESPONSE>Invalid network</RESPONSE><ERROR>Invalid network</ERROR><EOF>')
+
+        response = await self.client.post(reverse('action_aspx'), Action="readytomine2", NetworkID='main')
+        self.assertEqual(response.content, b'<RESPONSE>WorkerID is missing</RESPONSE><ERROR>WorkerID is missing</ERROR><EOF>')
+
+        response = await self.client.post(reverse('action_aspx'), Action="readytomine2", NetworkID='main', Miner="B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx/123", ThreadID="40")
+
+        miner = await Miner.objects.aget()
+        work = await Work.objects.aget()
+        rs = "<RESPONSE> <ADDRESS>ABCDEFG</ADDRESS><HASHTARGET>0000011110000000000000000000000000000000000000000000000000000000</HASHTARGET><MINERGUID>%s</MINERGUID><WORKID>%s</WORKID></RESPONSE>" % (miner.id, work.pk)
+        self.assertEqual(response.content, rs.encode('ascii'))
+        self.assertEqual(work.thread_id, "40")
+
+        # the second request is answered from the cache
+        response = await self.client.post(reverse('action_aspx'), Action="readytomine2", NetworkID='main', Miner="B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx/123")
+
+        self.assertEqual(await Miner.objects.acount(), 1)
+        self.assertEqual(await Worker.objects.acount(), 1)
+        self.assertEqual(await Work.objects.acount(), 2)
+
+    async def test_solution(self):
+        response = await self.client.post(reverse('action_aspx'), Action="solution", NetworkID='main')
+        self.assertEqual(response.content, b'<RESPONSE>Solution is missing</RESPONSE><ERROR>Solution is missing</ERROR><EOF>')
+
+        s = "4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96,1516741759,1516741614,5,0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11,SOMERANDOMMINERID,e5161e2a,4,12763,1516741681340,73728,1516741681759,1516741762590,12762,999999,888888"
+        with mock.patch('purepool.interface.async_views.process_solution.delay') as mock_delay:
+            response = await self.client.post(reverse('action_aspx'), Action="solution", NetworkID='main', Solution=s)
+
+        mock_delay.assert_called_once_with('main', s)
+        self.assertEqual(response.content, b'<RESPONSE><STATUS>ok</STATUS><WORKID>e5161e2a</WORKID></RESPONSE><END></HTML>')
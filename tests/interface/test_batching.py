@@ -0,0 +1,48 @@
+from unittest import mock
+from django.test import TestCase
+from purepool.interface.batching import SolutionBatcher, WorkBatcher
+
+class SolutionBatcherTestCase(TestCase):
+
+    @mock.patch('purepool.interface.batching.process_solution_batch.delay')
+    def test_max_size(self, mock_delay):
+        batcher = SolutionBatcher(max_size=3, max_delay=60)
+
+        batcher.add('main', 'a')
+        batcher.add('test', 'b')
+        batcher.add('main', 'c')
+        self.assertEqual(mock_delay.call_count, 0)
+
+        batcher.add('main', 'd')
+        mock_delay.assert_called_once_with('main', ['a', 'c', 'd'])
+
+        # the rest is send on flush
+        batcher.flush()
+        mock_delay.assert_called_with('test', ['b'])
+        self.assertEqual(mock_delay.call_count, 2)
+
+        # nothing left
+        batcher.flush()
+        self.assertEqual(mock_delay.call_count, 2)
+
+    @mock.patch('purepool.interface.batching.process_solution_batch.delay')
+    def test_max_delay(self, mock_delay):
+        batcher = SolutionBatcher(max_size=100, max_delay=0.01)
+
+        batcher.add('main', 'a')
+        batcher.add('main', 'b')
+
+        # the timer sends the batch
+        batcher.timer.join(1)
+        mock_delay.assert_called_once_with('main', ['a', 'b'])
+        self.assertEqual(batcher.timer, None)
+
+class WorkBatcherTestCase(TestCase):
+
+    @mock.patch('purepool.interface.batching.save_works.delay')
+    def test_send(self, mock_delay):
+        batcher = WorkBatcher(max_size=2, max_delay=60)
+
+        batcher.add('main', {'id': 'a'})
+        batcher.add('main', {'id': 'b'})
+        mock_delay.assert_called_once_with('main', [{'id': 'a'}, {'id': 'b'}])
@@ -1,6 +1,6 @@
 from django.test import TestCase
 from purepool.models.miner.models import Miner, Worker, MinerNotFound
-from purepool.interface.formats import SolutionString, WorkerId, InvalidWorkerdId
+from purepool.interface.formats import SolutionString, WorkerId, InvalidWorkerdId, InvalidSolutionString
 
 class WorkerIdTestCase(TestCase):
 
@@ -69,4 +69,43 @@ class SolutionStringTestCase(TestCase):
         self.assertEqual(solutionstr.get_timer_end(), 1516741762590)
         self.assertEqual(solutionstr.get_nonce(), "12762")
         self.assertEqual(solutionstr.get_block_hex(), "999999")
-        self.assertEqual(solutionstr.get_transaction_hex(), "888888")
\ No newline at end of file
+        self.assertEqual(solutionstr.get_transaction_hex(), "888888")
+
+    def test_lazy_fields(self):
+        s = "12345,1516741759,1516741614,5,54321,SOMERANDOMMINERID,e5161e2a,4,12763,1516741681340,73728,1516741681759,1516741762590,12762,999999,888888"
+        solutionstr = SolutionString(s)
+
+        # unchanged solutions are returned as they are
+        self.assertEqual(solutionstr.as_string(), s)
+
+        # the large fields are sliced from the string, the content dict is not used
+        self.assertEqual(solutionstr.get_block_hex(), "999999")
+        self.assertEqual(solutionstr.values, {})
+
+        # changes to the content are used in the string
+        solutionstr.content['work_id'] = 'abcdef'
+        self.assertEqual(solutionstr.get_work_id(), 'abcdef')
+        self.assertEqual(solutionstr.as_string(), s.replace('e5161e2a', 'abcdef'))
+
+        # the last field ends at a trailing comma
+        self.assertEqual(SolutionString(s + ',').get_transaction_hex(), "888888")
+
+        with self.assertRaises(InvalidSolutionString):
+            SolutionString("12345,1516741759")
+
+    def test_check_format(self):
+        s = ','.join(['a' * 64, '1516741759', '1516741614', '5', 'B' * 64, 'SOMERANDOMMINERID', 'e5161e2a', '4', '12763', '1516741681340',
+                      '73728', '1516741681759', '1516741762590', '12762', '0011aabb', 'ccdd00'])
+        SolutionString(s).check_format()
+
+        # to short bible hash
+        with self.assertRaises(InvalidSolutionString):
+            SolutionString(s.replace('B' * 64, 'B' * 63)).check_format()
+
+        # no hex
+        with self.assertRaises(InvalidSolutionString):
+            SolutionString(s.replace('ccdd00', 'ccxx00')).check_format()
+
+        # no number
+        with self.assertRaises(InvalidSolutionString):
+            SolutionString(s.replace('12762', '12x62')).check_format()
@@ -2,7 +2,7 @@ from django.urls import reverse
 from django.test import Client
 from django.test import TestCase
 from purepool.models.miner.models import Miner
-from purepool.interface.hash import GetHashTarget
+from purepool.interface.hash import GetHashTarget, get_difficulty_from_target
 
 class GetHashTargetTestCase(TestCase):
 
@@ -33,4 +33,15 @@ class GetHashTargetTestCase(TestCase):
         
         self.miner.rating = 3
         self.miner.save()
-        self.assertEqual(GetHashTarget(self.miner.id, 'main'), '0000011110000000000000000000000000000000000000000000000000000000')                
\ No newline at end of file
+        self.assertEqual(GetHashTarget(self.miner.id, 'main'), '0000011110000000000000000000000000000000000000000000000000000000')
+
+    def test_difficulty(self):
+        self.assertEqual(GetHashTarget(self.miner.id, 'main', 1), '0000011110000000000000000000000000000000000000000000000000000000')
+        self.assertEqual(GetHashTarget(self.miner.id, 'main', 2), '0000008888000000000000000000000000000000000000000000000000000000')
+        self.assertEqual(GetHashTarget(self.miner.id, 'main', 16), '0000001111000000000000000000000000000000000000000000000000000000')
+
+        for difficulty in [1, 2, 4, 64, 1024]:
+            self.assertEqual(get_difficulty_from_target(GetHashTarget(self.miner.id, 'main', difficulty)), difficulty)
+
+        self.assertEqual(get_difficulty_from_target('xyz'), 1)
+
@@ -0,0 +1,69 @@
+from django.urls import reverse
+from django.test import Client
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from purepool.core.metrics import get_metrics, reset_metrics
+from purepool.interface.formats import SolutionString
+from purepool.interface.hash import GetHashTarget
+from purepool.interface.work import WorkToken
+from purepool.interface.prevalidate import get_rejection_reason, prevalidate_solution
+from purepool.models.block.chaintip import set_chain_height
+
+SOLUTION = "4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96,1518041523,1518041437,19309,0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11,SOMERANDOMMINERID,b0181b3a-9868-4139-bef5-8c7e5d4239f4,0,332694,1518040817888,1769512,1518037739857,1518041527556,14217,abcd,ef01"
+
+MINER_ID = 'fa5b6fd6-3de5-4c2f-8a59-7e6c8e9ea3b5'
+
+class PrevalidateTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+
+    def test_reasons(self):
+        self.assertEqual(get_rejection_reason('main', SolutionString(SOLUTION), None), None)
+
+        # wrong format
+        self.assertEqual(get_rejection_reason('main', SolutionString(SOLUTION.replace(',14217,', ',14x17,')), None), 'format')
+        self.assertEqual(get_rejection_reason('main', SolutionString(SOLUTION.replace(',1769512,', ',,')), None), 'format')
+        self.assertEqual(get_rejection_reason('main', SolutionString(SOLUTION.replace(',abcd,', ',xyz,')), None), 'format')
+
+        # over the highest hash target
+        s = SOLUTION.replace('0000000e5bced1fc', '0000100e5bced1fc')
+        self.assertEqual(get_rejection_reason('main', SolutionString(s), None), 'hash_target')
+
+        # outdated block
+        self.assertEqual(get_rejection_reason('main', SolutionString(SOLUTION), 19309), None)
+        self.assertEqual(get_rejection_reason('main', SolutionString(SOLUTION), 19310), 'outdated')
+
+        # a newer block then we know is fine, we might be behind
+        self.assertEqual(get_rejection_reason('main', SolutionString(SOLUTION), 19300), None)
+
+    def test_token(self):
+        # the work token knows the real hash target
+        token = WorkToken('main', 1, MINER_ID, GetHashTarget(None, 'main', 1024), '0').as_string()
+        s = SOLUTION.replace('b0181b3a-9868-4139-bef5-8c7e5d4239f4', token)
+        self.assertEqual(get_rejection_reason('main', SolutionString(s), None), 'hash_target')
+
+        token = WorkToken('main', 1, MINER_ID, GetHashTarget(None, 'main', 2), '0').as_string()
+        s = SOLUTION.replace('b0181b3a-9868-4139-bef5-8c7e5d4239f4', token)
+        self.assertEqual(get_rejection_reason('main', SolutionString(s), None), None)
+
+        # and a wrong signature is found, too
+        s = SOLUTION.replace('b0181b3a-9868-4139-bef5-8c7e5d4239f4', token[:-2] + 'xx')
+        self.assertEqual(get_rejection_reason('main', SolutionString(s), None), 'work')
+
+    @override_settings(POOL_METRICS_FLUSH_SECONDS=0)
+    def test_metrics(self):
+        set_chain_height('main', 20000)
+        self.addCleanup(set_chain_height, 'main', None)
+
+        self.assertEqual(prevalidate_solution('main', SolutionString(SOLUTION)), 'outdated')
+        self.assertEqual(prevalidate_solution('test', SolutionString(SOLUTION)), None)
+        self.assertEqual(get_metrics(), {'prevalidation_rejected_outdated': 1})
+
+    def test_view(self):
+        client = Client()
+        s = SOLUTION.replace(',14217,', ',14x17,')
+
+        response = client.post(reverse('action_aspx'), Action="solution", NetworkID='main', Solution=s)
+        self.assertEqual(response.content, b'<RESPONSE>Rejected solution (format)</RESPONSE><ERROR>Rejected solution (format)</ERROR><EOF>')
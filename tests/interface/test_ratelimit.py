@@ -0,0 +1,98 @@
+from unittest import mock
+from django.urls import reverse
+from django.test import Client
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from purepool.core.metrics import get_metrics, reset_metrics
+from purepool.interface.ratelimit import TokenBucket, RateLimiter, RATELIMIT_WINDOW
+
+class TokenBucketTestCase(TestCase):
+
+    def test_take(self):
+        bucket = TokenBucket(rate=2, burst=3, now=100)
+
+        self.assertTrue(bucket.take(100))
+        self.assertTrue(bucket.take(100))
+        self.assertTrue(bucket.take(100))
+        self.assertFalse(bucket.take(100))
+
+        # 2 new tokens per second
+        self.assertTrue(bucket.take(100.5))
+        self.assertFalse(bucket.take(100.5))
+
+        # but never more then the burst
+        self.assertTrue(bucket.take(200))
+        self.assertTrue(bucket.take(200))
+        self.assertTrue(bucket.take(200))
+        self.assertFalse(bucket.take(200))
+
+class RateLimiterTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+
+    @override_settings(POOL_METRICS_FLUSH_SECONDS=0)
+    def test_local(self):
+        limiter = RateLimiter('ip', rate=1, burst=2, sync_requests=100)
+
+        with mock.patch('purepool.interface.ratelimit.time.time', return_value=1000):
+            self.assertTrue(limiter.allow('1.1.1.1'))
+            self.assertTrue(limiter.allow('1.1.1.1'))
+            self.assertFalse(limiter.allow('1.1.1.1'))
+
+            # every ip has its own bucket
+            self.assertTrue(limiter.allow('2.2.2.2'))
+
+        self.assertEqual(get_metrics(), {'throttled_ip': 1})
+
+    def test_shared(self):
+        limiter = RateLimiter('ip', rate=1, burst=10, sync_requests=5)
+
+        # the other processes already had a lot of requests of this ip
+        window = int(1000 // RATELIMIT_WINDOW)
+        cache.set(limiter.get_shared_key('1.1.1.1', window), limiter.get_window_limit() - 2)
+
+        with mock.patch('purepool.interface.ratelimit.time.time', return_value=1000):
+            for i in range(0, 5):
+                self.assertTrue(limiter.allow('1.1.1.1'))
+
+            # the local bucket has tokens left, but the limit of all processes is reached
+            self.assertFalse(limiter.allow('1.1.1.1'))
+
+        # until the window is over
+        with mock.patch('purepool.interface.ratelimit.time.time', return_value=(window + 1) * RATELIMIT_WINDOW):
+            self.assertTrue(limiter.allow('1.1.1.1'))
+
+    def test_shared_key(self):
+        limiter = RateLimiter('miner', rate=1, burst=10, sync_requests=5)
+
+        # the address is send by the miner, it might be no valid memcache key
+        key = limiter.get_shared_key('x' * 300 + '\n\x00 ', 1)
+        self.assertEqual(len(key), len('ratelimit__miner____1') + 40)
+        self.assertRegex(key, '^[a-z0-9_]+$')
+
+class ThrottledViewTestCase(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    @override_settings(POOL_RATELIMIT_MINER=(0.001, 1))
+    def test_solution(self):
+        s = "4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96,1516741759,1516741614,5,0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11,SOMERANDOMMINERID,e5161e2a,4,12763,1516741681340,73728,1516741681759,1516741762590,12762,999999,888888"
+
+        with mock.patch('purepool.interface.views.process_solution.delay') as mock_delay:
+            self.client.post(reverse('action_aspx'), Action="solution", NetworkID='main', Solution=s)
+            response = self.client.post(reverse('action_aspx'), Action="solution", NetworkID='main', Solution=s.replace('5a11,', '5a12,'))
+
+        self.assertEqual(response.content, b'<RESPONSE>Too many requests</RESPONSE><ERROR>Too many requests</ERROR><EOF>')
+        self.assertEqual(mock_delay.call_count, 1)
+
+    @override_settings(POOL_RATELIMIT_IP=(0.001, 1))
+    def test_ip(self):
+        response = self.client.post(reverse('action_aspx'), Action="EMPTY", REMOTE_ADDR='1.2.3.5')
+        self.assertEqual(response.content, b'<RESPONSE>UNKNOWN ACTION EMPTY</RESPONSE><ERROR>UNKNOWN ACTION EMPTY</ERROR><EOF>')
+
+        response = self.client.post(reverse('action_aspx'), Action="EMPTY", REMOTE_ADDR='1.2.3.5')
+        self.assertEqual(response.content, b'<RESPONSE>Too many requests</RESPONSE><ERROR>Too many requests</ERROR><EOF>')
@@ -0,0 +1,107 @@
+import warnings
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from purepool.models.miner.models import Miner, Worker
+from purepool.interface.hash import GetHashTarget
+from purepool.interface.work import WorkToken
+from purepool.interface.vardiff import retarget, get_difficulty, register_work, record_share, aregister_work, arecord_share
+
+@override_settings(POOL_VARDIFF_ENABLED=True, POOL_VARDIFF_SHARES_PER_MINUTE=6, POOL_VARDIFF_RETARGET_SECONDS=60, POOL_VARDIFF_MAX_DIFFICULTY=1024)
+class VardiffTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.miner = Miner(address='B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx', network='main')
+        self.miner.save()
+
+        self.worker = Worker(miner=self.miner, name='abc')
+        self.worker.save()
+
+    def test_retarget(self):
+        # the expected amount of shares keeps the difficulty
+        self.assertEqual(retarget(8, 6, 60), 8)
+        self.assertEqual(retarget(8, 8, 60), 8)
+
+        # power of 2 steps, but at most a factor of 4
+        self.assertEqual(retarget(8, 12, 60), 16)
+        self.assertEqual(retarget(8, 600, 60), 32)
+        self.assertEqual(retarget(8, 3, 60), 4)
+        self.assertEqual(retarget(8, 0, 60), 2)
+
+        # and always between 1 and the max difficulty
+        self.assertEqual(retarget(1, 0, 60), 1)
+        self.assertEqual(retarget(1024, 600, 60), 1024)
+
+    def test_disabled(self):
+        with self.settings(POOL_VARDIFF_ENABLED=False):
+            self.assertEqual(get_difficulty('main', self.worker.id), 1)
+
+            register_work('main', 'abc', self.worker.id)
+            record_share('main', 'abc')
+
+        self.assertEqual(cache.get('vardiff_work__main__abc'), None)
+
+    def test_database_work(self):
+        with mock.patch('purepool.interface.vardiff.time.time', return_value=1000):
+            self.assertEqual(get_difficulty('main', self.worker.id), 1)
+
+        register_work('main', '1b4e28ba-2fa1-11d2-883f-0016d3cca427', self.worker.id)
+        for i in range(0, 30):
+            record_share('main', '1b4e28ba-2fa1-11d2-883f-0016d3cca427')
+
+        # unknown work is ignored
+        record_share('main', 'c2a3e1f0-2fa1-11d2-883f-0016d3cca427')
+
+        # no retarget before the time is over
+        with mock.patch('purepool.interface.vardiff.time.time', return_value=1030):
+            self.assertEqual(get_difficulty('main', self.worker.id), 1)
+
+        # 30 shares in a minute are 5 times more then wanted
+        with mock.patch('purepool.interface.vardiff.time.time', return_value=1060):
+            self.assertEqual(get_difficulty('main', self.worker.id), 4)
+
+        # the counter starts again
+        with mock.patch('purepool.interface.vardiff.time.time', return_value=1120):
+            self.assertEqual(get_difficulty('main', self.worker.id), 1)
+
+    def test_token_work(self):
+        with mock.patch('purepool.interface.vardiff.time.time', return_value=1000):
+            get_difficulty('main', self.worker.id)
+
+        token = WorkToken('main', self.worker.id, self.miner.id, GetHashTarget(self.miner.id, 'main'), '1').as_string()
+        for i in range(0, 12):
+            record_share('main', token)
+
+        # invalid tokens are ignored
+        record_share('main', token[:-2] + 'xx')
+
+        with mock.patch('purepool.interface.vardiff.time.time', return_value=1060):
+            self.assertEqual(get_difficulty('main', self.worker.id), 2)
+
+    def test_invalid_work_id(self):
+        # the work id is send by the miner, and must not break the cache keys (memcached
+        # allows no spaces and at most 250 chars)
+        work_ids = ['a b c', 'x' * 300, '1B4E28BA-2FA1-11D2-883F-0016D3CCA427']
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+
+            register_work('main', '1b4e28ba-2fa1-11d2-883f-0016d3cca427', self.worker.id)
+            for work_id in work_ids:
+                record_share('main', work_id)
+
+        # the same uuid in another notation is the same work
+        self.assertEqual(cache.get('vardiff_shares__main__%s' % self.worker.id), 1)
+
+    async def test_ainvalid_work_id(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+
+            await aregister_work('main', '1b4e28ba-2fa1-11d2-883f-0016d3cca427', self.worker.id)
+            for work_id in ['a b c', 'x' * 300, '1B4E28BA-2FA1-11D2-883F-0016D3CCA427']:
+                await arecord_share('main', work_id)
+
+        self.assertEqual(await cache.aget('vardiff_shares__main__%s' % self.worker.id), 1)
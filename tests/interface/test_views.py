@@ -1,14 +1,23 @@
+import time
+from unittest import mock
 from django.urls import reverse
 from django.test import Client
 from django.test import TestCase
-from purepool.models.miner.models import Miner, Worker
+from django.core.cache import cache
+from purepool.models.miner.models import Miner, Worker, clear_local_id_cache
 from purepool.models.solution.models import Work
+from purepool.interface.work import load_work
+from purepool.interface.vardiff import get_vardiff_key
 
 class ActionViewTestCase(TestCase):
 
     def setUp(self):
         self.client = Client()
 
+        # the miner and worker ids are cached, so we start with an empty cache
+        cache.clear()
+        clear_local_id_cache()
+
     def test_invalid_action(self):        
         response = self.client.post(reverse('action_aspx'))
 
@@ -55,8 +64,54 @@ class ActionViewTestCase(TestCase):
         self.assertEqual(Worker.objects.all().count(), 1)
         worker = Worker.objects.all()[0]
         self.assertEqual(worker.name, "123")
-        
-        
-        
-        
-        
\ No newline at end of file
+
+    def test_readytomine2_token(self):
+        with self.settings(POOL_ADDRESS={'main': 'ABCDEFG'}, POOL_WORK_MODE='token'):
+            response = self.client.post(reverse('action_aspx'), Action="readytomine2", NetworkID='main', Miner="B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx/123", ThreadID="3")
+
+        # no work is stored in the database
+        self.assertEqual(Work.objects.all().count(), 0)
+
+        work_id = response.content.decode('ascii').split('<WORKID>')[1].split('</WORKID>')[0]
+        work = load_work('main', work_id)
+        self.assertEqual(work.worker_id, Worker.objects.all()[0].id)
+        self.assertEqual(work.thread_id, "3")
+        self.assertEqual(work.hash_target, '0000011110000000000000000000000000000000000000000000000000000000')
+
+    def test_readytomine2_vardiff(self):
+        with self.settings(POOL_ADDRESS={'main': 'ABCDEFG'}, POOL_VARDIFF_ENABLED=True):
+            self.client.post(reverse('action_aspx'), Action="readytomine2", NetworkID='main', Miner="B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx/123")
+
+            # the worker got a higher difficulty
+            worker = Worker.objects.all()[0]
+            cache.set(get_vardiff_key('main', worker.id), (4, time.time()))
+
+            response = self.client.post(reverse('action_aspx'), Action="readytomine2", NetworkID='main', Miner="B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx/123")
+
+        work_id = response.content.decode('ascii').split('<WORKID>')[1].split('</WORKID>')[0]
+        work = Work.objects.get(pk=work_id)
+        self.assertEqual(work.difficulty, 4)
+        self.assertEqual(work.hash_target, '0000004444000000000000000000000000000000000000000000000000000000')
+        self.assertIn('<HASHTARGET>0000004444000000000000000000000000000000000000000000000000000000</HASHTARGET>', response.content.decode('ascii'))
+
+    def test_solution_duplicate(self):
+        s = "4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96,1516741759,1516741614,5,0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11,SOMERANDOMMINERID,e5161e2a,4,12763,1516741681340,73728,1516741681759,1516741762590,12762,999999,888888"
+
+        with mock.patch('purepool.interface.views.process_solution.delay') as mock_delay:
+            response = self.client.post(reverse('action_aspx'), Action="solution", NetworkID='main', Solution=s)
+            self.assertEqual(response.content, b'<RESPONSE><STATUS>ok</STATUS><WORKID>e5161e2a</WORKID></RESPONSE><END></HTML>')
+
+            # the same solution again is answered directly
+            response = self.client.post(reverse('action_aspx'), Action="solution", NetworkID='main', Solution=s)
+            self.assertEqual(response.content, b'<RESPONSE>Duplicate solution</RESPONSE><ERROR>Duplicate solution</ERROR><EOF>')
+
+            # but not in a different network
+            response = self.client.post(reverse('action_aspx'), Action="solution", NetworkID='test', Solution=s)
+            self.assertEqual(response.content, b'<RESPONSE><STATUS>ok</STATUS><WORKID>e5161e2a</WORKID></RESPONSE><END></HTML>')
+
+            # or if the filter is disabled
+            with self.settings(POOL_DUPLICATE_SOLUTION_TIMEOUT=0):
+                response = self.client.post(reverse('action_aspx'), Action="solution", NetworkID='main', Solution=s)
+                self.assertEqual(response.content, b'<RESPONSE><STATUS>ok</STATUS><WORKID>e5161e2a</WORKID></RESPONSE><END></HTML>')
+
+        self.assertEqual(mock_delay.call_count, 3)
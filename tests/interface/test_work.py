@@ -0,0 +1,161 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import Work
+from purepool.models.solution.tasks import save_works
+from django.core.cache import cache
+from purepool.interface.work import WorkToken, InvalidWorkToken, WorkTokenExpired, create_work, load_work, load_works, get_work_pk, is_work_token
+
+HASH_TARGET = '0000011110000000000000000000000000000000000000000000000000000000'
+
+class WorkTokenTestCase(TestCase):
+
+    def setUp(self):
+        # the markers of the written rows
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.miner = Miner(address='B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx', network='main')
+        self.miner.save()
+
+        self.worker = Worker(miner=self.miner, name='abc')
+        self.worker.save()
+
+    def test_roundtrip(self):
+        token = WorkToken('main', self.worker.id, self.miner.id, HASH_TARGET, '4').as_string()
+
+        self.assertTrue(is_work_token(token))
+        self.assertNotIn(',', token)
+
+        work_token = WorkToken.from_string('main', token)
+        self.assertEqual(work_token.worker_id, self.worker.id)
+        self.assertEqual(work_token.miner_id, self.miner.id)
+        self.assertEqual(work_token.hash_target, HASH_TARGET)
+        self.assertEqual(work_token.thread_id, '4')
+
+        # the thread id is send by the miner, so we only accept simple values
+        token = WorkToken('main', self.worker.id, self.miner.id, HASH_TARGET, '4,5').as_string()
+        self.assertEqual(WorkToken.from_string('main', token).thread_id, '1')
+
+    def test_invalid(self):
+        token = WorkToken('main', self.worker.id, self.miner.id, HASH_TARGET, '4').as_string()
+
+        # the network is part of the signature
+        with self.assertRaises(InvalidWorkToken):
+            WorkToken.from_string('test', token)
+
+        # a higher hash target
+        with self.assertRaises(InvalidWorkToken):
+            WorkToken.from_string('main', token.replace('000001111', '000011111'))
+
+        with self.assertRaises(InvalidWorkToken):
+            WorkToken.from_string('main', 'T1.2.3')
+
+        with self.assertRaises(InvalidWorkToken):
+            WorkToken.from_string('main', '')
+
+        # a different key
+        with self.settings(POOL_WORK_TOKEN_KEY='another key'):
+            with self.assertRaises(InvalidWorkToken):
+                WorkToken.from_string('main', token)
+
+    def test_expired(self):
+        token = WorkToken('main', self.worker.id, self.miner.id, HASH_TARGET, '4', issued_at=1000).as_string()
+
+        with self.assertRaises(WorkTokenExpired):
+            WorkToken.from_string('main', token, max_age=3600)
+
+        with self.assertRaises(WorkTokenExpired):
+            load_work('main', token)
+
+    @override_settings(POOL_WORK_MODE='token')
+    def test_token_mode(self):
+        work_id = create_work('main', self.worker.id, self.miner.id, '4', HASH_TARGET, '1.1.1.1', 'LIN', '1.0')
+
+        # no database write for the work
+        self.assertEqual(Work.objects.all().count(), 0)
+
+        work = load_work('main', work_id)
+        self.assertEqual(work.worker_id, self.worker.id)
+        self.assertEqual(work.hash_target, HASH_TARGET)
+        self.assertEqual(Work.objects.all().count(), 0)
+
+        # the work row is created on first use, and only once
+        self.assertEqual(get_work_pk('main', work_id), work.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_work_pk('main', work_id), work.pk)
+        self.assertEqual(Work.objects.all().count(), 1)
+        self.assertEqual(Work.objects.all()[0].worker_id, self.worker.id)
+
+    def test_database_mode(self):
+        work_id = create_work('main', self.worker.id, self.miner.id, '4', HASH_TARGET, '1.1.1.1', 'LIN', '1.0')
+
+        self.assertFalse(is_work_token(work_id))
+        self.assertEqual(Work.objects.all().count(), 1)
+        self.assertEqual(str(load_work('main', work_id).pk), work_id)
+        self.assertEqual(get_work_pk('main', work_id), work_id)
+
+        with self.assertRaises(Work.DoesNotExist):
+            load_work('test', work_id)
+
+    @override_settings(POOL_WORK_MODE='cache', POOL_WORK_CACHE_ONLY=True)
+    def test_cache_only_mode(self):
+        work_id = create_work('main', self.worker.id, self.miner.id, '4', HASH_TARGET, '1.1.1.1', 'LIN', '1.0', 8)
+        self.assertFalse(is_work_token(work_id))
+        self.assertEqual(Work.objects.all().count(), 0)
+
+        # the validation needs no query
+        with self.assertNumQueries(0):
+            work = load_work('main', work_id)
+            works = load_works('main', [work_id])
+
+        self.assertEqual(str(work.pk), work_id)
+        self.assertEqual(work.hash_target, HASH_TARGET)
+        self.assertEqual(work.difficulty, 8)
+        self.assertEqual(list(works.keys()), [work.pk])
+
+        with self.assertRaises(Work.DoesNotExist):
+            load_work('test', work_id)
+
+        # the row is created with the first solution, with a single insert
+        with self.assertNumQueries(1):
+            self.assertEqual(get_work_pk('main', work_id), work_id)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_work_pk('main', work_id), work_id)
+        self.assertEqual(Work.objects.get().worker_id, self.worker.id)
+
+        # after the timeout of the cache, the row is used
+        cache.clear()
+        self.assertEqual(str(load_work('main', work_id).pk), work_id)
+        self.assertEqual(list(load_works('main', [work_id]).keys()), [work.pk])
+
+    @override_settings(POOL_WORK_MODE='cache')
+    def test_cache_mode(self):
+        with mock.patch('purepool.interface.batching.WorkBatcher.add') as mock_add:
+            work_id = create_work('main', self.worker.id, self.miner.id, '4', HASH_TARGET, '1.1.1.1', 'LIN', '1.0')
+
+        # the row is written by the save_works task
+        network, values = mock_add.call_args[0]
+        self.assertEqual(network, 'main')
+        self.assertEqual(values['id'], work_id)
+        self.assertEqual(values['worker_id'], self.worker.id)
+        self.assertEqual(Work.objects.all().count(), 0)
+
+        save_works('main', [values])
+        save_works('main', [values])
+        self.assertEqual(str(Work.objects.get().pk), work_id)
+
+        # the solutions do not write the row again
+        with self.assertNumQueries(0):
+            self.assertEqual(get_work_pk('main', work_id), work_id)
+
+    @override_settings(POOL_WORK_MODE='cache')
+    def test_cache_mode_solution_first(self):
+        with mock.patch('purepool.interface.batching.WorkBatcher.add') as mock_add:
+            work_id = create_work('main', self.worker.id, self.miner.id, '4', HASH_TARGET, '1.1.1.1', 'LIN', '1.0')
+
+        # the solution is faster then save_works
+        self.assertEqual(get_work_pk('main', work_id), work_id)
+        save_works('main', [mock_add.call_args[0][1]])
+
+        self.assertEqual(str(Work.objects.get().pk), work_id)
@@ -0,0 +1,55 @@
+import io
+from unittest import mock
+from django.test import TestCase
+from django.core.cache import cache
+from purepool.models.miner.models import Miner, clear_local_id_cache
+from purepool.models.solution.models import Work
+from purepool.interface.wsgi import application
+
+class InterfaceWsgiTestCase(TestCase):
+
+    def setUp(self):
+        # the miner and worker ids are cached, so we start with an empty cache
+        cache.clear()
+        clear_local_id_cache()
+
+    def request(self, **headers):
+        environ = {
+            'REQUEST_METHOD': 'POST',
+            'PATH_INFO': '/Action.aspx',
+            'REMOTE_ADDR': '1.2.3.4',
+            'wsgi.input': io.BytesIO(b''),
+        }
+        for key, value in headers.items():
+            environ['HTTP_' + key.upper()] = value
+
+        status = []
+        content = b''.join(application(environ, lambda s, h: status.append(s)))
+
+        self.assertEqual(status, ['200 OK'])
+        return content
+
+    def test_action(self):
+        self.assertEqual(self.request(), b'<RESPONSE>UNKNOWN ACTION EMPTY</RESPONSE><ERROR>UNKNOWN ACTION EMPTY</ERROR><EOF>')
+        self.assertEqual(self.request(Action='readytomine2'), b'<RESPONSE>Invalid network</RESPONSE><ERROR>Invalid network</ERROR><EOF>')
+
+    def test_readytomine2(self):
+        with self.settings(POOL_ADDRESS={'main': 'ABCDEFG'}):
+            content = self.request(Action='readytomine2', NetworkID='main', Miner='B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx/123', OS='LIN')
+
+        miner = Miner.objects.all()[0]
+        work = Work.objects.all()[0]
+        rs = "<RESPONSE> <ADDRESS>ABCDEFG</ADDRESS><HASHTARGET>0000011110000000000000000000000000000000000000000000000000000000</HASHTARGET><MINERGUID>%s</MINERGUID><WORKID>%s</WORKID></RESPONSE>" % (miner.id, work.pk)
+
+        self.assertEqual(content, rs.encode('ascii'))
+        self.assertEqual(work.ip, '1.2.3.4')
+        self.assertEqual(work.os, 'LIN')
+
+    def test_solution(self):
+        s = "4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96,1516741759,1516741614,5,0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11,SOMERANDOMMINERID,e5161e2a,4,12763,1516741681340,73728,1516741681759,1516741762590,12762,999999,888888"
+
+        with mock.patch('purepool.interface.views.process_solution.delay') as mock_delay:
+            content = self.request(Action='solution', NetworkID='main', Solution=s)
+
+        mock_delay.assert_called_once_with('main', s)
+        self.assertEqual(content, b'<RESPONSE><STATUS>ok</STATUS><WORKID>e5161e2a</WORKID></RESPONSE><END></HTML>')
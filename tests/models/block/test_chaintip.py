@@ -0,0 +1,53 @@
+from unittest import mock
+from django.test import TestCase
+from django.core.cache import cache
+from purepool.models.block.chaintip import get_chain_tip, get_chain_height, set_chain_height, invalidate_chain_tip
+
+class ChainTipTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(set_chain_height, 'test', None)
+
+        self.client = mock.Mock()
+        self.client.pinfo.return_value = {'pinfo': 7424, 'height': 31369}
+
+    def test_cached(self):
+        self.assertEqual(get_chain_tip('test', self.client), {'pinfo': 7424, 'height': 31369})
+        self.assertEqual(get_chain_tip('test', self.client), {'pinfo': 7424, 'height': 31369})
+        self.assertEqual(get_chain_tip('test', self.client, min_height=31369), {'pinfo': 7424, 'height': 31369})
+        self.assertEqual(self.client.pinfo.call_count, 1)
+
+        # the height is known to the interface, too
+        self.assertEqual(get_chain_height('test'), 31369)
+
+        # a solution for a newer block
+        self.client.pinfo.return_value = {'pinfo': 8000, 'height': 31370}
+        self.assertEqual(get_chain_tip('test', self.client, min_height=31370), {'pinfo': 8000, 'height': 31370})
+        self.assertEqual(self.client.pinfo.call_count, 2)
+        self.assertEqual(get_chain_height('test'), 31370)
+
+        # a new block was found
+        invalidate_chain_tip('test')
+        get_chain_tip('test', self.client)
+        self.assertEqual(self.client.pinfo.call_count, 3)
+
+    def test_nonce(self):
+        get_chain_tip('test', self.client)
+
+        # the max nonce grew since the tip was cached
+        self.client.pinfo.return_value = {'pinfo': 7500, 'height': 31369}
+        with mock.patch('purepool.models.block.chaintip._refetched_at', {}):
+            self.assertEqual(get_chain_tip('test', self.client, min_pinfo=7450), {'pinfo': 7500, 'height': 31369})
+            self.assertEqual(self.client.pinfo.call_count, 2)
+
+            # a nonce that is still too high does not ask again right away
+            self.assertEqual(get_chain_tip('test', self.client, min_pinfo=9000), {'pinfo': 7500, 'height': 31369})
+            self.assertEqual(self.client.pinfo.call_count, 2)
+
+    def test_height(self):
+        set_chain_height('test', 40000)
+
+        # the known height never goes back
+        get_chain_tip('test', self.client)
+        self.assertEqual(get_chain_height('test'), 40000)
@@ -6,6 +6,7 @@ from biblepay.clients import BiblePayRpcClient, BlockNotFound
 from purepool.models.miner.models import Miner, Worker
 from purepool.models.block.tasks import find_new_blocks, process_next_block, shareout_next_block
 from purepool.models.block.models import Block
+from purepool.models.block.chaintip import get_chain_height
 from purepool.models.solution.models import Solution, Work
 from puretransaction.models import Transaction
 
@@ -77,6 +78,9 @@ class find_new_blocksTestCase(TestCase):
             self.assertEqual(block3.network, 'test')
             self.assertEqual(block3.recipient, 'rec')
             self.assertEqual(block3.inserted_at, test_block_time3)
+
+            # the interface knows the new height
+            self.assertEqual(get_chain_height('test'), 3)
             
             # execute a second time
             mock_subsidy.side_effect = [
@@ -386,6 +390,40 @@ class shareout_next_blockTestCase(TestCase):
         blockmain = Block.objects.get(height=1, network="main")
         self.assertEqual(blockmain.process_status, 'BP')
         
+    @override_settings(POOL_ADDRESS={'POOL_BLOCK_MATURE_HOURS': {'test': 48, 'main': 48}})
+    @override_settings(POOL_ADDRESS={'test': 'abc', 'main': 'xyz'})
+    @override_settings(POOL_FEE_PERCENT=5)
+    @mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.subsidy', return_value={'subsidy': '100', 'recipient': 'abc'})
+    def test_process_difficulty(self, mock_subsidy):
+        # the solutions of miner 2 are worth 3 shares each (vardiff)
+        work = Work(worker=self.worker2, ip="1.1.1.1", difficulty=3)
+        work.save()
+        Solution.objects.filter(miner=self.miner2).update(work=work)
+
+        shareout_next_block('test')
+
+        # 3 shares for miner1, 6 shares for miner 2
+        trans1 = Transaction.objects.get(miner=self.miner1)
+        trans2 = Transaction.objects.get(miner=self.miner2, category='MS')
+
+        self.assertEqual(round(trans1.amount), 32)
+        self.assertEqual(round(trans2.amount), 63)
+        self.assertEqual(trans2.internal_note, 'BLOCK:1|SOLUTIONS:2|SHARES:6')
+
+    @override_settings(POOL_ADDRESS={'test': 'abc', 'main': 'xyz'})
+    @mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.subsidy', return_value={'subsidy': '100', 'recipient': 'abc'})
+    def test_process_unaudited(self, mock_subsidy):
+        Solution.objects.filter(bible_hash='1').update(provisional=True)
+
+        # the provisional solution could not be checked, so the block waits
+        with mock.patch('purepool.models.block.tasks.audit_solutions', return_value=False) as mock_audit_solutions:
+            shareout_next_block('test')
+
+        block1 = Block.objects.get(height=1, network="test")
+        mock_audit_solutions.assert_called_once_with('test', block_id=block1.pk)
+        self.assertEqual(block1.process_status, 'BP')
+        self.assertEqual(Transaction.objects.all().count(), 1) # one old
+
     @override_settings(POOL_ADDRESS={'POOL_BLOCK_MATURE_HOURS': {'test': 48, 'main': 48}})
     @override_settings(POOL_ADDRESS={'test': 'abc', 'main': 'xyz'})
     def test_stale(self):
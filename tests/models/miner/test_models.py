@@ -1,5 +1,8 @@
-from django.test import TestCase
-from purepool.models.miner.models import Miner
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from purepool.core.lru import LRUCache, VersionedLRUCache
+from purepool.models.miner.models import Miner, Worker, MinerNotEnabled, ID_CACHE_VERSION_KEY, get_or_create_miner_worker, get_local_id_cache, clear_local_id_cache
 from puretransaction.models import Transaction
 
 
@@ -27,4 +30,142 @@ class MinerCalculationTestCase(TestCase):
         self.miner2.update_balance()
         
         self.assertEqual(self.miner1.balance, 13)
-        self.assertEqual(self.miner2.balance, 9)
\ No newline at end of file
+        self.assertEqual(self.miner2.balance, 9)
+
+
+class LRUCacheTestCase(TestCase):
+
+    def test_basic(self):
+        lru = LRUCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+
+        # a is used, so b is the oldest entry
+        self.assertEqual(lru.get('a'), 1)
+        lru.set('c', 3)
+
+        self.assertEqual(lru.get('a'), 1)
+        self.assertEqual(lru.get('b'), None)
+        self.assertEqual(lru.get('c'), 3)
+        self.assertEqual(len(lru), 2)
+
+    def test_timeout(self):
+        lru = LRUCache(2, timeout=10)
+
+        with mock.patch('purepool.core.lru.time.monotonic', return_value=100):
+            lru.set('a', 1)
+
+        with mock.patch('purepool.core.lru.time.monotonic', return_value=109):
+            self.assertEqual(lru.get('a'), 1)
+
+        with mock.patch('purepool.core.lru.time.monotonic', return_value=110):
+            self.assertEqual(lru.get('a'), None)
+        self.assertEqual(len(lru), 0)
+
+class LocalIdCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        clear_local_id_cache()
+
+        self.miner = Miner(network="main", address="B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx")
+        self.miner.save()
+
+        self.worker = Worker(miner=self.miner, name="abc")
+        self.worker.save()
+
+    def test_known_worker(self):
+        ids = get_or_create_miner_worker('main', self.miner.address, 'abc')
+        self.assertEqual(ids, (self.miner.id, self.worker.id))
+
+        # known workers need no database and no shared cache at all
+        with self.assertNumQueries(0), mock.patch('purepool.models.miner.models.cache.get_many') as mock_get_many:
+            self.assertEqual(get_or_create_miner_worker('main', self.miner.address, 'abc'), ids)
+        self.assertEqual(mock_get_many.call_count, 0)
+
+        # without the local cache, the shared cache is asked (with a single request)
+        clear_local_id_cache()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_or_create_miner_worker('main', self.miner.address, 'abc'), ids)
+
+    def test_disable(self):
+        get_or_create_miner_worker('main', self.miner.address, 'abc')
+
+        self.miner.set_enabled(False)
+
+        with self.assertRaises(MinerNotEnabled):
+            get_or_create_miner_worker('main', self.miner.address, 'abc')
+
+        # and enabled again
+        self.miner.set_enabled(True)
+
+        self.assertEqual(get_or_create_miner_worker('main', self.miner.address, 'abc'), (self.miner.id, self.worker.id))
+
+    def test_disable_update(self):
+        # every change of "enabled" by django invalidates the ids
+        get_or_create_miner_worker('main', self.miner.address, 'abc')
+        Miner.objects.filter(address=self.miner.address).update(enabled=False)
+
+        with self.assertRaises(MinerNotEnabled):
+            get_or_create_miner_worker('main', self.miner.address, 'abc')
+
+        miner = Miner.objects.get(pk=self.miner.pk)
+        miner.enabled = True
+        miner.save()
+        self.assertEqual(get_or_create_miner_worker('main', self.miner.address, 'abc'), (self.miner.id, self.worker.id))
+
+        miner.enabled = False
+        miner.save()
+        with self.assertRaises(MinerNotEnabled):
+            get_or_create_miner_worker('main', self.miner.address, 'abc')
+
+    @mock.patch('purepool.models.miner.models._local_id_cache', None)
+    def test_timeout(self):
+        # a miner disabled with sql is seen after the timeout of the shared cache
+        local_id_cache = get_local_id_cache()
+        self.assertEqual(local_id_cache.timeout, cache.default_timeout)
+
+    def test_version(self):
+        local_id_cache = get_local_id_cache()
+        local_id_cache.set('x', 1)
+
+        # another process changed the version
+        cache.set(local_id_cache.version_key, 99)
+        local_id_cache.checked_at = None
+        local_id_cache.check()
+
+        self.assertEqual(local_id_cache.get('x'), None)
+
+    def test_invalidate(self):
+        other_miner = Miner.objects.create(network="main", address="B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxx2")
+        Worker.objects.create(miner=other_miner, name="abc")
+
+        get_or_create_miner_worker('main', self.miner.address, 'abc')
+        get_or_create_miner_worker('main', other_miner.address, 'abc')
+
+        # the copy of another process
+        other_cache = VersionedLRUCache(10, ID_CACHE_VERSION_KEY, 0)
+        other_cache.check()
+        other_cache.set_many({key: 1 for key in get_local_id_cache().entries})
+
+        # only the keys of the disabled miner are removed
+        with self.assertNumQueries(3):
+            other_miner.set_enabled(False)
+        self.assertEqual(len(get_local_id_cache()), 1)
+
+        other_cache.check()
+        self.assertEqual(list(other_cache.entries), ['miner_id__main__B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx__abc'])
+
+        # a process that missed the changes clears everything
+        cache.delete(other_cache.get_changes_key(cache.get(ID_CACHE_VERSION_KEY)))
+        self.miner.set_enabled(False)
+        cache.delete(other_cache.get_changes_key(cache.get(ID_CACHE_VERSION_KEY)))
+        other_cache.check()
+        self.assertEqual(len(other_cache), 0)
+
+    @override_settings(POOL_LOCAL_ID_CACHE_WARMUP=True)
+    @mock.patch('purepool.models.miner.models._local_id_cache', None)
+    def test_warmup(self):
+        local_id_cache = get_local_id_cache()
+        self.assertEqual(local_id_cache.get('miner_id__main__B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx__abc'), (self.miner.id, self.worker.id))
+        self.assertEqual(cache.get('miner_id__main__B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx'), self.miner.id)
@@ -0,0 +1,189 @@
+import datetime
+from unittest import mock
+from django.utils import timezone
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from purepool.interface.formats import SolutionString
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import Solution, Work, RejectedSolution
+from purepool.models.solution.sampling import get_validation_sample_rate, should_validate_fully
+from purepool.models.solution.tasks import audit_solutions
+from biblepay.nodes import CircuitOpen
+from tests.biblepay.test_coinbase import TRANSACTION_HEX, BLOCK_HEADER_HEX
+
+POOL_ADDRESS = 'yhVPf12UvK8zYgZwS6kLsPmtccHUQiD3Q9'
+
+COINBASE = {'recipient': POOL_ADDRESS, 'cpid_sig_valid': True, 'cpid_legal': True}
+
+class samplingTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.miner = Miner(network='test', address='yhVPf12UvK8zYgZwS6kLsPmtccHUQiD3Q9')
+        self.miner.save()
+
+    def test_validate_all(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(get_validation_sample_rate(self.miner.id), 1)
+            self.assertTrue(should_validate_fully(self.miner.id))
+
+    @override_settings(POOL_VALIDATION_SAMPLE=0.1, POOL_VALIDATION_TRUST_DAYS=10)
+    def test_trust(self):
+        # a new miner is not trusted
+        self.assertGreater(get_validation_sample_rate(self.miner.id), 0.99)
+
+        Miner.objects.filter(pk=self.miner.id).update(inserted_at=timezone.now() - datetime.timedelta(days=5))
+        cache.clear()
+        self.assertAlmostEqual(get_validation_sample_rate(self.miner.id), 0.5, places=2)
+
+        Miner.objects.filter(pk=self.miner.id).update(inserted_at=timezone.now() - datetime.timedelta(days=50))
+        cache.clear()
+        self.assertEqual(get_validation_sample_rate(self.miner.id), 0.1)
+
+        # the age is cached
+        with self.assertNumQueries(0):
+            get_validation_sample_rate(self.miner.id)
+
+@override_settings(POOL_ADDRESS={'test': POOL_ADDRESS})
+class audit_solutionsTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+        self.miner = Miner(network='test', address='yhVPf12UvK8zYgZwS6kLsPmtccHUQiD3Q9')
+        self.miner.save()
+
+        self.other_miner = Miner(network='test', address='yiCwAb9qeaQqzDX5jQZJgBQ9mRy2aqk2Tb')
+        self.other_miner.save()
+
+        self.work = self.create_work(self.miner, "1.1.1.1")
+        self.other_work = self.create_work(self.other_miner, "1.1.1.1")
+
+    def create_work(self, miner, ip):
+        return Work.objects.create(hash_target="0000001111000000000000000000000000000000000000000000000000000000", worker=Worker.objects.create(miner=miner), ip=ip, network="test")
+
+    def create_solution(self, bible_hash, miner, provisional=True, work=None):
+        work = work or self.work
+
+        solution_string = SolutionString()
+        solution_string.content = {
+            'transaction_hex': TRANSACTION_HEX,
+            'thread_hash_counter': '332694',
+            'prev_block_time': '1518041437',
+            'prev_height': '19309',
+            'nonce': '14217',
+            'block_hash': '4adfaf0c3ad50afecad53ad1e57340e9735bca7d104b2b3565835a346e1c6c96',
+            'miner_id': miner.id,
+            'work_id': work.id,
+            'block_time': '1518041523',
+            'thread_id': '0',
+            'timer_start': '1518037739857',
+            'thread_start': '1518040817888',
+            'bible_hash': bible_hash,
+            'hash_counter': '1769512',
+            'timer_end': '1518041527556',
+            'block_hex': BLOCK_HEADER_HEX + '01' + TRANSACTION_HEX,
+        }
+
+        return Solution.objects.create(
+            work=work, miner=miner, network='test', bible_hash=bible_hash,
+            solution=solution_string.as_string() if provisional else '', provisional=provisional,
+        )
+
+    def test_passed(self):
+        solution = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11', self.miner)
+
+        with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash_many', return_value=[solution.bible_hash]) as mock_bible_hash_many, \
+             mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.hexblocktocoinbase_many', return_value=[COINBASE]):
+            self.assertTrue(audit_solutions('test'))
+
+        solution.refresh_from_db()
+        self.assertFalse(solution.provisional)
+        self.assertFalse(solution.ignore)
+        self.assertEqual(solution.solution, '')
+
+        # nothing left to audit, biblepayd is not asked
+        self.assertTrue(audit_solutions('test'))
+        self.assertEqual(mock_bible_hash_many.call_count, 1)
+
+    def test_cheater(self):
+        cheated = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11', self.miner)
+        honest = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a12', self.miner)
+        validated = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a13', self.miner, provisional=False)
+        other = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a14', self.other_miner, work=self.other_work)
+
+        # another worker of the same miner, and the same worker from another ip
+        other_worker = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a15', self.miner, provisional=False, work=self.create_work(self.miner, "1.1.1.1"))
+        other_ip = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a16', self.miner, provisional=False, work=Work.objects.create(
+            hash_target=self.work.hash_target, worker=self.work.worker, ip="2.2.2.2", network="test",
+        ))
+
+        bible_hashes = ['0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a00', honest.bible_hash, other.bible_hash]
+
+        with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash_many', return_value=bible_hashes), \
+             mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.hexblocktocoinbase_many', return_value=[COINBASE] * 3):
+            self.assertTrue(audit_solutions('test'))
+
+        # the unpaid solutions of the worker from this ip are ignored
+        for solution in (cheated, honest, validated):
+            solution.refresh_from_db()
+            self.assertTrue(solution.ignore)
+            self.assertFalse(solution.provisional)
+
+        # the miner keeps the rest
+        for solution in (other, other_worker, other_ip):
+            solution.refresh_from_db()
+            self.assertFalse(solution.ignore)
+            self.assertFalse(solution.provisional)
+
+        self.miner.refresh_from_db()
+        self.assertTrue(self.miner.enabled)
+
+        rsolution = RejectedSolution.objects.get()
+        self.assertEqual(rsolution.bible_hash, cheated.bible_hash)
+        self.assertEqual(rsolution.exception_type, 'BibleHashWrong')
+
+    def test_wrong_miner(self):
+        # a solution in the name of the other miner, with the work of the miner
+        forged = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11', self.other_miner)
+        honest = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a12', self.miner)
+
+        with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash_many', return_value=[honest.bible_hash]), \
+             mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.hexblocktocoinbase_many', return_value=[COINBASE]):
+            self.assertTrue(audit_solutions('test'))
+
+        # only the forged solution is ignored
+        forged.refresh_from_db()
+        self.assertTrue(forged.ignore)
+
+        honest.refresh_from_db()
+        self.assertFalse(honest.ignore)
+        self.assertFalse(honest.provisional)
+
+        self.assertEqual(RejectedSolution.objects.get().exception_type, 'WrongMiner')
+
+    def test_unauditable(self):
+        solution = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11', self.miner)
+        Solution.objects.filter(pk=solution.pk).update(solution='')
+
+        with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash_many') as mock_bible_hash_many:
+            self.assertTrue(audit_solutions('test'))
+
+        # the content is gone, the miner gets the benefit of the doubt
+        self.assertEqual(mock_bible_hash_many.call_count, 0)
+
+        solution.refresh_from_db()
+        self.assertFalse(solution.ignore)
+        self.assertFalse(solution.provisional)
+        self.assertFalse(RejectedSolution.objects.exists())
+
+    def test_unavailable(self):
+        solution = self.create_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11', self.miner)
+
+        with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash_many', side_effect=CircuitOpen()):
+            self.assertFalse(audit_solutions('test'))
+
+        solution.refresh_from_db()
+        self.assertTrue(solution.provisional)
+        self.assertFalse(solution.ignore)
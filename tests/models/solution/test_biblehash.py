@@ -0,0 +1,122 @@
+from unittest import mock
+from django.test import TestCase, override_settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from purepool.core.metrics import get_metrics, reset_metrics
+from purepool.models.solution.biblehash import get_bible_hash_verifier, get_last_mismatch, RpcBibleHashVerifier, LocalBibleHashVerifier, ShadowBibleHashVerifier
+from purepool.models.solution.validator import get_abible_hash
+
+def fake_bible_hash(block_hash, block_time, prev_block_time, prev_height, nonce):
+    return 'local%s' % nonce
+
+class FakeClient(object):
+
+    def bible_hash(self, block_hash, block_time, prev_block_time, prev_height, nonce):
+        return 'local%s' % nonce if nonce != '2' else 'rpc'
+
+    def bible_hash_many(self, items):
+        return [self.bible_hash(*item) if item[4] != '3' else OSError() for item in items]
+
+class FakeAsyncClient(FakeClient):
+
+    async def bible_hash(self, *args):
+        return FakeClient.bible_hash(self, *args)
+
+@override_settings(POOL_BIBLEHASH_FUNCTION='tests.models.solution.test_biblehash.fake_bible_hash', POOL_METRICS_FLUSH_SECONDS=0)
+class BibleHashVerifierTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+
+    def test_modes(self):
+        client = FakeClient()
+
+        with self.settings(POOL_BIBLEHASH_VERIFIER='rpc'):
+            self.assertIsInstance(get_bible_hash_verifier(client), RpcBibleHashVerifier)
+            self.assertEqual(get_bible_hash_verifier(client).bible_hash('aa', '1', '2', '3', '2'), 'rpc')
+
+        with self.settings(POOL_BIBLEHASH_VERIFIER='local'):
+            self.assertIsInstance(get_bible_hash_verifier(client), LocalBibleHashVerifier)
+            self.assertEqual(get_bible_hash_verifier(client).bible_hash('aa', '1', '2', '3', '2'), 'local2')
+
+        # the rpc needs no local implementation
+        with self.settings(POOL_BIBLEHASH_VERIFIER='rpc', POOL_BIBLEHASH_FUNCTION=None):
+            self.assertIsInstance(get_bible_hash_verifier(client), RpcBibleHashVerifier)
+
+        for mode in ('local', 'shadow'):
+            with self.settings(POOL_BIBLEHASH_VERIFIER=mode, POOL_BIBLEHASH_FUNCTION=None):
+                with self.assertRaises(ImproperlyConfigured):
+                    get_bible_hash_verifier(client)
+
+        with self.settings(POOL_BIBLEHASH_VERIFIER='local', POOL_BIBLEHASH_FUNCTION='tests.models.solution.test_biblehash.missing'):
+            with self.assertRaises(ImproperlyConfigured):
+                get_bible_hash_verifier(client)
+
+        with self.settings(POOL_BIBLEHASH_VERIFIER='x11'):
+            with self.assertRaises(ImproperlyConfigured):
+                get_bible_hash_verifier(client)
+
+    @override_settings(POOL_BIBLEHASH_VERIFIER='shadow', POOL_BIBLEHASH_SHADOW_SAMPLE=1)
+    def test_shadow(self):
+        verifier = get_bible_hash_verifier(FakeClient())
+        self.assertIsInstance(verifier, ShadowBibleHashVerifier)
+
+        # the rpc result is used, also if the local one is different
+        self.assertEqual(verifier.bible_hash('aa', '1', '2', '3', '1'), 'local1')
+        self.assertIsNone(get_last_mismatch())
+        self.assertEqual(verifier.bible_hash('aa', '1', '2', '3', '2'), 'rpc')
+
+        self.assertEqual(get_metrics(), {'biblehash_shadow_checked': 2, 'biblehash_mismatch': 1})
+        self.assertEqual(get_last_mismatch(), 'aa 1 2 3 2 rpc local2')
+
+    @override_settings(POOL_BIBLEHASH_VERIFIER='shadow', POOL_BIBLEHASH_SHADOW_SAMPLE=1)
+    def test_shadow_many(self):
+        verifier = get_bible_hash_verifier(FakeClient())
+
+        # the failed rpc call of nonce 3 is not compared
+        bible_hashes = verifier.bible_hash_many([('aa', '1', '2', '3', str(nonce)) for nonce in range(1, 4)])
+        self.assertEqual(bible_hashes[:2], ['local1', 'rpc'])
+        self.assertIsInstance(bible_hashes[2], OSError)
+
+        self.assertEqual(get_metrics(), {'biblehash_shadow_checked': 2, 'biblehash_mismatch': 1})
+
+    @override_settings(POOL_BIBLEHASH_VERIFIER='shadow', POOL_BIBLEHASH_SHADOW_SAMPLE=0)
+    def test_shadow_sample(self):
+        verifier = get_bible_hash_verifier(FakeClient())
+        self.assertEqual(verifier.bible_hash('aa', '1', '2', '3', '2'), 'rpc')
+
+        self.assertEqual(get_metrics(), {})
+
+    @override_settings(POOL_BIBLEHASH_VERIFIER='shadow', POOL_BIBLEHASH_SHADOW_SAMPLE=1)
+    async def test_abible_hash(self):
+        bible_hash = get_abible_hash(FakeAsyncClient())
+
+        self.assertEqual(await bible_hash('aa', '1', '2', '3', '2'), 'rpc')
+        self.assertEqual(get_last_mismatch(), 'aa 1 2 3 2 rpc local2')
+
+        with self.settings(POOL_BIBLEHASH_VERIFIER='local'):
+            self.assertEqual(await get_abible_hash(FakeAsyncClient())('aa', '1', '2', '3', '2'), 'local2')
+
+    def test_benchmark(self):
+        with mock.patch('purepool.models.solution.management.commands.benchmark_biblehash.BiblePayRpcClient', return_value=FakeClient()):
+            with mock.patch('builtins.print') as mock_print:
+                call_command('benchmark_biblehash', hashes=5, batch_size=2)
+
+        lines = [' '.join(str(arg) for arg in c.args) for c in mock_print.call_args_list]
+        self.assertEqual([line.split()[0] for line in lines[:3]], ['rpc', 'rpc', 'local'])
+        self.assertTrue(lines[1].startswith('rpc batch'))
+
+        # nonce 2 is different, nonce 3 failed in the batch
+        self.assertEqual(lines[3:], ['rpc batch: 1 of 5 hashes differ from rpc', 'local: 1 of 5 hashes differ from rpc'])
+
+        with mock.patch('purepool.models.solution.management.commands.benchmark_biblehash.BiblePayRpcClient', return_value=FakeClient()):
+            with mock.patch('builtins.print') as mock_print:
+                call_command('benchmark_biblehash', hashes=5, function=None)
+
+        lines = [' '.join(str(arg) for arg in c.args) for c in mock_print.call_args_list]
+        self.assertEqual(len(lines), 4)
+        self.assertTrue(lines[2].startswith('local') and 'not measured' in lines[2])
@@ -0,0 +1,87 @@
+import uuid
+from django.test import TestCase
+from purepool.core.fields import hex_to_bytes, bytes_to_hex, BinaryUUIDField, get_binary_uuid_sql
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import Solution, Work
+
+class hex_to_bytesTestCase(TestCase):
+
+    def test_roundtrip(self):
+        values = ['ab' * 32, 'ab' * 32 + '#1', 'AB' * 32, '00000003', '', 'x' * 31, 'x' * 32, 'x' * 33]
+        for value in values:
+            self.assertEqual(bytes_to_hex(hex_to_bytes(value)), value)
+
+        # only the full hashes are compact
+        self.assertEqual(len(hex_to_bytes('ab' * 32)), 32)
+        self.assertEqual(len(hex_to_bytes('x' * 31)), 33)
+
+class HexBinaryFieldTestCase(TestCase):
+
+    def test_solution(self):
+        miner = Miner.objects.create()
+        worker = Worker.objects.create(miner=miner)
+        work = Work.objects.create(hash_target='0' * 64, worker=worker, ip='1.1.1.1', network='test')
+
+        for bible_hash in ['ab' * 32, 'ab' * 32 + '#1', '00000003']:
+            Solution.objects.create(work=work, miner=miner, network='test', bible_hash=bible_hash)
+
+        self.assertEqual(Solution.objects.get(bible_hash='ab' * 32).bible_hash, 'ab' * 32)
+        self.assertEqual(Solution.objects.filter(bible_hash__in=['ab' * 32 + '#1', '00000003', 'cd' * 32]).count(), 2)
+        self.assertEqual(sorted(Solution.objects.values_list('bible_hash', flat=True)), ['00000003', 'ab' * 32, 'ab' * 32 + '#1'])
+
+class FakeCursor(object):
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def execute(self, sql, params=None):
+        pass
+
+    def fetchall(self):
+        return self.rows
+
+class BinaryUUIDFieldTestCase(TestCase):
+
+    def test_from_db_value(self):
+        field = BinaryUUIDField()
+        value = uuid.uuid4()
+
+        self.assertEqual(field.from_db_value(value.bytes, None, None), value)
+        self.assertEqual(field.from_db_value(value.hex, None, None), value)
+        self.assertIsNone(field.from_db_value(None, None, None))
+
+    def test_foreign_keys(self):
+        miner = Miner.objects.create(address='B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx')
+        worker = Worker.objects.create(miner=miner)
+        work = Work.objects.create(hash_target='0' * 64, worker=worker, ip='1.1.1.1', network='test')
+        Solution.objects.create(work=work, miner=miner, network='test', bible_hash='ab' * 32)
+
+        self.assertEqual(Solution.objects.get(work_id=str(work.id), miner_id=miner.id.hex).work_id, work.id)
+        self.assertEqual(list(Worker.objects.filter(miner=miner).values_list('miner_id', flat=True)), [miner.id])
+
+    def test_sql(self):
+        columns = [('miner_miner', 'id', False), ('miner_worker', 'miner_id', False), ('block_block', 'miner_id', True)]
+
+        # block_block has a second foreign key, to another table
+        cursor = FakeCursor([
+            ('miner_worker', 'worker_miner_fk', 'miner_id', 'miner_miner', 'id'),
+            ('solution_solution', 'solution_block_fk', 'block_id', 'block_block', 'id'),
+        ])
+
+        self.assertEqual(get_binary_uuid_sql(cursor, columns), [
+            'ALTER TABLE miner_worker DROP FOREIGN KEY worker_miner_fk',
+            'ALTER TABLE block_block MODIFY miner_id varbinary(32) NULL',
+            'UPDATE block_block SET miner_id = UNHEX(miner_id)',
+            'ALTER TABLE block_block MODIFY miner_id binary(16) NULL',
+            'ALTER TABLE miner_miner MODIFY id varbinary(32) NOT NULL',
+            'UPDATE miner_miner SET id = UNHEX(id)',
+            'ALTER TABLE miner_miner MODIFY id binary(16) NOT NULL',
+            'ALTER TABLE miner_worker MODIFY miner_id varbinary(32) NOT NULL',
+            'UPDATE miner_worker SET miner_id = UNHEX(miner_id)',
+            'ALTER TABLE miner_worker MODIFY miner_id binary(16) NOT NULL',
+            'ALTER TABLE miner_worker ADD CONSTRAINT worker_miner_fk FOREIGN KEY (miner_id) REFERENCES miner_miner (id)',
+        ])
+
+        statements = get_binary_uuid_sql(cursor, columns, to_binary=False)
+        self.assertIn('UPDATE miner_miner SET id = LOWER(HEX(id))', statements)
+        self.assertIn('ALTER TABLE miner_miner MODIFY id char(32) NOT NULL', statements)
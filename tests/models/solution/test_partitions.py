@@ -0,0 +1,89 @@
+import datetime
+from unittest import mock
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import Solution, Work
+from purepool.models.solution.tasks import cleanup_solutions, save_works
+from purepool.models.solution.partitions import get_partition_changes, get_partition_day, get_create_sql, get_drop_sql, get_partition_sql, get_partitioned_tables
+from purepool.interface.work import create_work, load_work, get_work_pk
+
+TODAY = datetime.date(2018, 3, 10)
+
+def day(offset):
+    return TODAY + datetime.timedelta(days=offset)
+
+class PartitionTestCase(TestCase):
+
+    def test_changes(self):
+        # partitions from 14 days ago until in 6 days
+        days = [day(i) for i in range(-14, 7)]
+
+        create, drop = get_partition_changes(days, TODAY, ahead=7, keep_days=14)
+        self.assertEqual(create, [day(7)])
+        self.assertEqual(drop, [])
+
+        # two days later
+        create, drop = get_partition_changes(days, day(2), ahead=7, keep_days=14)
+        self.assertEqual(create, [day(7), day(8), day(9)])
+        self.assertEqual(drop, [day(-14), day(-13)])
+
+        # nothing to do
+        create, drop = get_partition_changes(days, day(-1), ahead=7, keep_days=14)
+        self.assertEqual((create, drop), ([], []))
+
+    def test_sql(self):
+        self.assertEqual(get_partition_day('p20180310'), TODAY)
+        self.assertEqual(get_partition_day('pfuture'), None)
+
+        self.assertEqual(
+            get_create_sql('solution_solution', [day(0), day(1)]),
+            "ALTER TABLE solution_solution REORGANIZE PARTITION pfuture INTO (PARTITION p20180310 VALUES LESS THAN (TO_DAYS('2018-03-11')), "
+            "PARTITION p20180311 VALUES LESS THAN (TO_DAYS('2018-03-12')), PARTITION pfuture VALUES LESS THAN MAXVALUE)",
+        )
+        self.assertEqual(get_drop_sql('solution_work', [day(-1), day(0)]), 'ALTER TABLE solution_work DROP PARTITION p20180309, p20180310')
+        self.assertEqual(
+            get_partition_sql('solution_work', [day(0)]),
+            "ALTER TABLE solution_work PARTITION BY RANGE (TO_DAYS(inserted_at)) (PARTITION p20180310 VALUES LESS THAN (TO_DAYS('2018-03-11')), "
+            "PARTITION pfuture VALUES LESS THAN MAXVALUE)",
+        )
+
+    @override_settings(POOL_PARTITIONING=True)
+    def test_cleanup(self):
+        with mock.patch('purepool.models.solution.tasks.manage_partitions') as mock_manage_partitions:
+            # the content of the solutions, the works, the counts of the rejected solutions and the bible hashes
+            with self.assertNumQueries(4):
+                cleanup_solutions()
+
+        self.assertEqual(mock_manage_partitions.call_count, 1)
+
+    @override_settings(POOL_PARTITIONING=True)
+    def test_work_modes(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        # the work ids must stay unique, so the work table is not partitioned
+        self.assertNotIn('solution_work', get_partitioned_tables())
+
+        miner = Miner.objects.create(address='B91RjV9UoZa5qLNbWZFXJ42sFWbJCyxxxx', network='main')
+        worker = Worker.objects.create(miner=miner, name='abc')
+        hash_target = '0000011110000000000000000000000000000000000000000000000000000000'
+
+        # the first solution is faster then save_works
+        with self.settings(POOL_WORK_MODE='cache'), mock.patch('purepool.interface.batching.WorkBatcher.add') as mock_add:
+            work_id = create_work('main', worker.id, miner.id, '4', hash_target, '1.1.1.1', 'LIN', '1.0')
+
+        get_work_pk('main', work_id)
+        save_works('main', [mock_add.call_args[0][1]])
+        get_work_pk('main', work_id)
+
+        # two first solutions for one token
+        with self.settings(POOL_WORK_MODE='token'):
+            token = create_work('main', worker.id, miner.id, '4', hash_target, '1.1.1.1', 'LIN', '1.0')
+
+        self.assertEqual(get_work_pk('main', token), get_work_pk('main', token))
+
+        self.assertEqual(Work.objects.count(), 2)
+
+        cache.clear()
+        self.assertEqual(str(load_work('main', work_id).pk), work_id)
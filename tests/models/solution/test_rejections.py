@@ -0,0 +1,65 @@
+import datetime
+from django.test import TestCase
+from django.core.cache import cache
+from django.utils import timezone
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import RejectedSolutionCount
+from purepool.models.solution.rejections import RejectionCounter
+from purepool.frontend.statistics import miner_error_message_statistic
+
+class RejectionCounterTestCase(TestCase):
+
+    def setUp(self):
+        self.miner = Miner.objects.create()
+        self.worker = Worker.objects.create(miner=self.miner, name='worker1')
+        self.now = timezone.now().replace(second=30)
+
+    def test_samples(self):
+        counter = RejectionCounter(max_delay=60, samples_per_bucket=2, samples_per_minute=3)
+
+        # the first two of every bucket, but only three per minute
+        self.assertEqual([counter.add('test', self.miner.id, self.worker.id, 'BibleHashWrong', now=self.now) for i in range(0, 3)], [True, True, False])
+        self.assertEqual([counter.add('test', self.miner.id, None, 'UnknownWork', now=self.now) for i in range(0, 2)], [True, False])
+
+        # the next minute starts again
+        self.assertTrue(counter.add('test', self.miner.id, self.worker.id, 'BibleHashWrong', now=self.now + datetime.timedelta(minutes=1)))
+
+    def test_flush(self):
+        counter = RejectionCounter(max_delay=60, samples_per_bucket=2, samples_per_minute=100)
+
+        for i in range(0, 3):
+            counter.add('test', self.miner.id, self.worker.id, 'BibleHashWrong', now=self.now)
+        counter.add('test', self.miner.id, None, 'UnknownWork', now=self.now)
+        counter.add('test', 'not a miner', None, 'UnknownWork', now=self.now)
+
+        # not due yet
+        counter.flush_if_due()
+        self.assertEqual(RejectedSolutionCount.objects.count(), 0)
+
+        # the unknown miner is skipped
+        counter.flush()
+        self.assertEqual(RejectedSolutionCount.objects.count(), 2)
+
+        # added to the existing buckets
+        counter.add('test', self.miner.id, self.worker.id, 'BibleHashWrong', now=self.now)
+        counter.add('test', self.miner.id, None, 'UnknownWork', now=self.now)
+        counter.flush()
+
+        counts = dict(RejectedSolutionCount.objects.values_list('exception_type', 'total'))
+        self.assertEqual(counts, {'BibleHashWrong': 4, 'UnknownWork': 2})
+        self.assertEqual(RejectedSolutionCount.objects.get(exception_type='BibleHashWrong').minute, self.now.replace(second=0, microsecond=0))
+
+    def test_statistic(self):
+        counter = RejectionCounter(max_delay=0, samples_per_bucket=2, samples_per_minute=100)
+        for minutes in range(0, 3):
+            counter.add('test', self.miner.id, self.worker.id, 'BibleHashWrong', now=self.now - datetime.timedelta(minutes=minutes))
+        counter.add('test', self.miner.id, self.worker.id, 'TransactionTampered', now=self.now)
+        counter.add('test', self.miner.id, self.worker.id, 'UnknownWork', now=self.now - datetime.timedelta(days=2))
+        counter.flush()
+
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.assertEqual(list(miner_error_message_statistic('test', self.miner.id)), [
+            {'exception_type': 'BibleHashWrong', 'worker__name': 'worker1', 'total': 3},
+        ])
@@ -0,0 +1,65 @@
+import datetime
+from django.conf import settings
+from django.utils import timezone
+from django.test import TestCase
+from django.core.cache import cache
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import Solution, Work
+from purepool.models.solution.retention import RetentionJob, clear_content, run_job, run_retention, get_retention_cursor_key
+
+class RetentionTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.miner = Miner.objects.create()
+        self.worker = Worker.objects.create(miner=self.miner)
+        self.work = Work.objects.create(worker=self.worker, ip="1.1.1.1")
+
+        for i in range(0, 10):
+            Solution.objects.create(work=self.work, miner=self.miner, bible_hash='%064d' % i, solution='content %s' % i if i < 7 else '')
+
+    def test_chunks(self):
+        job = RetentionJob('test', Solution.objects.filter(bible_hash__lt='%064d' % 7))
+
+        # the time budget is used after the first chunk, the next run continues
+        rows, finished, seconds = run_job(job, chunk_size=3, sleep_seconds=0, deadline=0)
+        self.assertEqual((rows, finished, seconds), (0, False, 0))
+
+        # three chunks, with a select and a delete each
+        with self.assertNumQueries(6):
+            rows, finished, seconds = run_job(job, chunk_size=3, sleep_seconds=0, deadline=float('inf'))
+        self.assertEqual((rows, finished), (7, True))
+        self.assertEqual(Solution.objects.count(), 3)
+
+        # there is nothing left, the job starts at the beginning
+        self.assertIsNone(cache.get(get_retention_cursor_key('test')))
+
+    def test_pauses(self):
+        job = RetentionJob('test', Solution.objects.all())
+
+        # two pauses between the three chunks are not counted
+        rows, finished, seconds = run_job(job, chunk_size=4, sleep_seconds=0.1, deadline=float('inf'))
+        self.assertEqual((rows, finished), (10, True))
+        self.assertLess(seconds, 0.1)
+
+    def test_clear_content(self):
+        job = RetentionJob('test', Solution.objects.all(), clear_content)
+
+        # the provisional solution is not audited yet
+        Solution.objects.filter(bible_hash='%064d' % 0).update(provisional=True)
+
+        self.assertEqual(run_job(job, chunk_size=100, sleep_seconds=0, deadline=float('inf'))[:2], (6, True))
+        self.assertEqual(list(Solution.objects.exclude(solution='').values_list('solution', flat=True)), ['content 0'])
+
+    def test_retention(self):
+        older = timezone.now() - datetime.timedelta(days=settings.POOL_CLEANUP_MAXDAYS + 1)
+        Solution.objects.filter(bible_hash__lt='%064d' % 4).update(inserted_at=older)
+
+        results = run_retention(chunk_size=2, sleep_seconds=0, time_budget=60)
+
+        self.assertEqual(results['solution'][0], 4)
+        self.assertEqual(results['solution'][2], True)
+        self.assertEqual(Solution.objects.count(), 6)
+        self.assertEqual(Work.objects.count(), 1)
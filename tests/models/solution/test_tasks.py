@@ -2,11 +2,18 @@ import datetime
 from unittest import mock
 from django.conf import settings
 from django.utils import timezone
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from purepool.interface.formats import SolutionString
 from purepool.models.miner.models import Miner, Worker
 from purepool.models.solution.models import Solution, Work, RejectedSolution
-from purepool.models.solution.tasks import calculate_multiply, process_solution, validate_solution, cleanup_solutions, UnknownWork, HashTargetExceeded, BibleHashWrong, TransactionInvalid, TransactionTampered, InvalidSolution, Invalid_CPID, Biblepayd_Outdated, Illegal_CPID
+from purepool.interface.work import WorkToken
+from purepool.models.block.chaintip import set_chain_height
+from purepool.core.metrics import get_metrics, reset_metrics
+from biblepay.nodes import CircuitOpen
+from purepool.models.solution.writer import BulkWriter
+from purepool.models.solution.rejections import reset_rejection_counter
+from purepool.models.solution.tasks import BibleHashAlreadyKnown, calculate_multiply, process_solution, process_solution_batch, validate_solution, cleanup_solutions, UnknownWork, HashTargetExceeded, BibleHashWrong, TransactionInvalid, TransactionTampered, InvalidSolution, Invalid_CPID, Biblepayd_Outdated, Illegal_CPID, WrongMiner
 
 class calculate_multiplyTestCase(TestCase):
     
@@ -63,6 +70,9 @@ class calculate_multiplyTestCase(TestCase):
 class validate_solutionTestCase(TestCase):
     
     def setUp(self):
+        # the miner of the worker is cached
+        cache.clear()
+
         self.miner = Miner()
         self.miner.save()
         
@@ -89,6 +99,8 @@ class validate_solutionTestCase(TestCase):
             'block_hex': '000000209928ce1b5ba829fde591237d3876df45daa2dd30ec31805b43dd6b972eae9aff3fab6ced6b34254aeb8c7f004cb82178984dbf22ea5c5316ac33ae6ec90ef17db3797b5aa5aa081d893700000201000000010000000000000000000000000000000000000000000000000000000000000000ffffffff05026e4b0103ffffffff01ca6940057a0100001976a914e83c22b58de63a91952524084f46415c985d715c88acfdce013c5645523e312e302e382e363c2f5645523e3c4d494e4552475549443e65656635636263622d663637332d343230332d613739312d6637373362313737663164663c2f4d494e4552475549443e3c706f6c6d6573736167653e666531313263363532643964643063663436326135333762636466363561323537663461613331303032396666373432383964396366623665303161396662623c2f706f6c6d6573736167653e3c706f6c7765696768743e35363438302e35313c2f706f6c7765696768743e3c706f6c616d6f756e743e31363437342e30303c2f706f6c616d6f756e743e3c706f6c6176676167653e332e3432393c2f706f6c6176676167653e3c5349475f303e494d3736436d344e57376e554e78614e5050797662373473424d437945586e314d49347339376b4f334d475a6469672f496a59486c48594139637346616b3769756451536c6769596f643366756d4c2f44797075706e593d3c2f5349475f303e3c5349475f313e494e684d7a47487658727a4b654366424e384d4c584671466b45495a36455758694a572f6535334e73384e4c5652755274535877395830337937452b46447a7a68455762744756543868307a42477751484c33305930513d3c2f5349475f313e00000000010000000223e3f54cbfd562a065218f2f5be70a9d22e6ff7820dd0d1f701a53afb53767170000000049483045022100d612e1ee658823964ebdc3dedcecf2e9c19c7a9891ba264b8ba170cdfed58fbd02201d4de4c922afa8c218aa8fe6b73eadd62f00109cd777b3f7489f50eab83d3da301feffffff3fab86d7035b899793e1264899b1838fd6b988a7adc1866365dbd06250c65f260000000048473044022005004171fbc47a417c5c68e3abfd8a76e375029866b779ae117730d61ff64bab0220268e22a951608a7050747fa9e373d7610b11eb3de663f954affdf394941b777501feffffff0225b74458390000001976a9146ebc0349fad92dbb1b277ea9209609b5a485e4f988ac1f3c706f6c7765696768743e31343031312e30303c2f706f6c7765696768743ed6e9123b46010000232103dbeb934062e53b5deef24a89825b225eeea09c31037693ac7d192c5c581e1fbcac1f3c706f6c7765696768743e31343031312e30303c2f706f6c7765696768743e6d4b0000'
         }
 
+    # the recipient from the hexblocktocoinbase rpc call, see test_local_coinbase
+    @override_settings(POOL_COINBASE_LOCAL_CHECK=False)
     def test_basic(self):
         
         # work missing
@@ -106,6 +118,12 @@ class validate_solutionTestCase(TestCase):
         work.hash_target = '0000001111000000000000000000000000000000000000000000000000000000'
         work.save()
 
+        # the work was given to another miner
+        other_miner = Miner.objects.create(address='yiCwAb9qeaQqzDX5jQZJgBQ9mRy2aqk2Tb')
+        with mock.patch.dict(self.solution_string.content, {'miner_id': other_miner.id}):
+            with self.assertRaises(WrongMiner):
+                validate_solution('test', self.solution_string)
+
         with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash', return_value="1234"):
             with self.assertRaises(BibleHashWrong):
                 validate_solution('test', self.solution_string)
@@ -176,6 +194,46 @@ class validate_solutionTestCase(TestCase):
                         self.assertTrue(validate_solution('test', self.solution_string))
         
         
+    def test_local_coinbase(self):
+        work = Work(pk='b0181b3a-9868-4139-bef5-8c7e5d4239f4', hash_target="0000001111000000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1", network="test")
+        work.save()
+
+        trans_result = {'recipient': 'ignored', 'cpid_sig_valid': True, 'cpid_legal': True}
+
+        # another address, biblepayd is not asked
+        with self.settings(POOL_ADDRESS={'test': 'yiCwAb9qeaQqzDX5jQZJgBQ9mRy2aqk2Tb'}):
+            with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash') as mock_bible_hash:
+                with self.assertRaises(TransactionTampered):
+                    validate_solution('test', self.solution_string)
+            self.assertEqual(mock_bible_hash.call_count, 0)
+
+        # the transaction is not the coinbase of the block
+        self.solution_string.content['transaction_hex'] = self.solution_string.get_transaction_hex().replace('e83c22b5', 'e83c22b6')
+        with self.settings(POOL_ADDRESS={'test': 'yhVPf12UvK8zYgZwS6kLsPmtccHUQiD3Q9'}):
+            with self.assertRaises(TransactionInvalid):
+                validate_solution('test', self.solution_string)
+
+        self.solution_string.content['transaction_hex'] = self.solution_string.get_transaction_hex().replace('e83c22b6', 'e83c22b5')
+        with self.settings(POOL_ADDRESS={'test': 'yhVPf12UvK8zYgZwS6kLsPmtccHUQiD3Q9'}), \
+             mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash', return_value=self.solution_string.get_bible_hash()), \
+             mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.hexblocktocoinbase', return_value=trans_result), \
+             mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.pinfo', return_value={'pinfo': 999999, 'height': 19309}):
+            self.assertTrue(validate_solution('test', self.solution_string))
+
+    def test_outdated_height(self):
+        work = Work(pk='b0181b3a-9868-4139-bef5-8c7e5d4239f4', hash_target="0000001111000000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1", network="test")
+        work.save()
+
+        # a newer block is known, so biblepayd is not asked at all
+        set_chain_height('test', 19310)
+        self.addCleanup(set_chain_height, 'test', None)
+
+        with mock.patch('purepool.models.solution.tasks.BiblePayRpcClient.bible_hash') as mock_bible_hash:
+            with self.assertRaises(TransactionTampered):
+                validate_solution('test', self.solution_string)
+
+        self.assertEqual(mock_bible_hash.call_count, 0)
+
 class process_solutionTestCase(TestCase):
     
     def setUp(self):
@@ -185,8 +243,12 @@ class process_solutionTestCase(TestCase):
         self.worker = Worker(miner=self.miner)
         self.worker.save()
         
-        self.work = Work(hash_target="0000000111100000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1")
+        self.work = Work(hash_target="0000000111100000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1", network="test")
         self.work.save()        
+
+        # the samples of the rejected solutions are counted per process
+        reset_rejection_counter()
+        self.addCleanup(reset_rejection_counter)
         
         self.solution_string = SolutionString()
         self.solution_string.content = {
@@ -227,6 +289,34 @@ class process_solutionTestCase(TestCase):
         self.assertEqual(solution.solution, '') #self.solution_s)
         self.assertEqual(solution.hps, 467)
 
+    def test_valid_writer(self):
+        writer = BulkWriter(max_size=100, max_delay=60)
+
+        with mock.patch('purepool.models.solution.tasks.validate_solution', return_value=True), \
+             mock.patch('purepool.models.solution.tasks.get_bulk_writer', return_value=writer):
+            process_solution('test', self.solution_s)
+
+            # the solution is collected, but known
+            self.assertEqual(len(Solution.objects.all()), 0)
+            with self.assertRaises(BibleHashAlreadyKnown):
+                process_solution('test', self.solution_s)
+
+        writer.stop()
+        self.assertEqual(len(Solution.objects.all()), 1)
+
+    def test_valid_token(self):
+        work_token = WorkToken('test', self.worker.id, self.miner.id, self.work.hash_target, '0')
+        self.solution_string.content['work_id'] = work_token.as_string()
+
+        with mock.patch('purepool.models.solution.tasks.validate_solution', return_value=True):
+            process_solution('test', self.solution_string.as_string())
+
+        # the work row for the token was created with the solution
+        solution = Solution.objects.all()[0]
+        self.assertEqual(solution.work_id, work_token.get_uuid())
+        self.assertEqual(solution.work.worker_id, self.worker.id)
+        self.assertEqual(solution.work.network, 'test')
+
     def test_valid_multiply(self):
 
         self.assertEqual(len(Solution.objects.all()), 0)
@@ -268,6 +358,115 @@ class process_solutionTestCase(TestCase):
         self.assertEqual(rsolution.solution, self.solution_s)
         self.assertEqual(rsolution.hps, 0)
 
+    @override_settings(POOL_VALIDATION_SAMPLE=0, POOL_VALIDATION_TRUST_DAYS=0)
+    def test_provisional(self):
+        with mock.patch('purepool.models.solution.tasks.validate_solution', return_value=True) as mock_validate_solution:
+            process_solution('test', self.solution_s)
+
+        self.assertFalse(mock_validate_solution.call_args[1]['full'])
+
+        # the solution is kept for the audit
+        solution = Solution.objects.get()
+        self.assertTrue(solution.provisional)
+        self.assertEqual(solution.solution, self.solution_s)
+
+    @override_settings(POOL_METRICS_FLUSH_SECONDS=0)
+    def test_shed(self):
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+
+        # the breaker is open, so the solution is not even validated
+        with mock.patch('purepool.models.solution.tasks.is_circuit_open', return_value=True), \
+             mock.patch('purepool.models.solution.tasks.validate_solution') as mock_validate_solution:
+            process_solution('test', self.solution_s)
+        self.assertFalse(mock_validate_solution.called)
+
+        # the breaker opened while the solution was validated
+        with mock.patch('purepool.models.solution.tasks.validate_solution', side_effect=CircuitOpen()):
+            process_solution('test', self.solution_s)
+
+        # no node answered
+        with mock.patch('purepool.models.solution.tasks.validate_solution', side_effect=ConnectionRefusedError()):
+            process_solution('test', self.solution_s)
+
+        self.assertEqual(len(RejectedSolution.objects.all()), 0)
+        self.assertEqual(len(Solution.objects.all()), 0)
+        self.assertEqual(get_metrics()['solutions_shed'], 3)
+
+class process_solution_batchTestCase(TestCase):
+
+    def setUp(self):
+        self.miner = Miner()
+        self.miner.save()
+
+        self.worker = Worker(miner=self.miner)
+        self.worker.save()
+
+        self.work = Work(hash_target="0000000111100000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1", network="test")
+        self.work.save()
+
+        reset_rejection_counter()
+        self.addCleanup(reset_rejection_counter)
+
+    def get_solution_s(self, bible_hash, work_id=None):
+        solution_string = SolutionString()
+        solution_string.content = {
+            'transaction_hex': 'TransHex',
+            'thread_hash_counter': '332694',
+            'prev_block_time': '1518041437',
+            'prev_height': '19309',
+            'nonce': '14217',
+            'block_hash': 'ABCD',
+            'miner_id': self.miner.id,
+            'work_id': self.work.id if work_id is None else work_id,
+            'block_time': '1518041523',
+            'thread_id': '0',
+            'timer_start': '1518037739857',
+            'thread_start': '1518040817888',
+            'bible_hash': bible_hash,
+            'hash_counter': '1769512',
+            'timer_end': '1518041527556',
+            'block_hex': 'BlockHex'}
+        return solution_string.as_string()
+
+    @override_settings(POOL_REJECTION_FLUSH_SECONDS=60)
+    def test_batch(self):
+        Solution(work=self.work, miner=self.miner, network='test', bible_hash='00000001').save()
+
+        solutions = [
+            self.get_solution_s('00000002'),
+            self.get_solution_s('00000002'), # twice in the batch
+            self.get_solution_s('00000001'), # already known
+            self.get_solution_s('00000003'), # rejected
+            self.get_solution_s('00000004', work_id='b0181b3a-9868-4139-bef5-8c7e5d4239f4'), # unknown work
+            self.get_solution_s('00000005', work_id='invalid'),
+            'not a solution',
+        ]
+
+        def fake_validate_solution(network, solution_string, work=None, full=True):
+            self.assertEqual(work, self.work)
+            if solution_string.get_bible_hash() == '00000003':
+                raise BibleHashWrong()
+            return True
+
+        with mock.patch('purepool.models.solution.tasks.validate_solution', side_effect=fake_validate_solution):
+            # the work and the known hashes are loaded with one query each,
+            # and everything is saved with one insert per table (the rejections
+            # are counted later)
+            with self.assertNumQueries(4):
+                self.assertEqual(process_solution_batch('test', solutions), (1, 1))
+
+        self.assertEqual(sorted(Solution.objects.values_list('bible_hash', flat=True)), ['00000001', '00000002'])
+
+        solution = Solution.objects.get(bible_hash='00000002')
+        self.assertEqual(solution.work_id, self.work.id)
+        self.assertEqual(solution.hps, 467)
+
+        rsolution = RejectedSolution.objects.get()
+        self.assertEqual(rsolution.bible_hash, '00000003')
+        self.assertEqual(rsolution.exception_type, 'BibleHashWrong')
+        self.assertEqual(rsolution.solution, solutions[3])
+
 class cleanup_solutionsTestCase(TestCase):
     
     def setUp(self):
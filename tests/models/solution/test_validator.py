@@ -0,0 +1,269 @@
+import time
+import asyncio
+from unittest import mock
+from celery import Celery
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.core.cache import cache
+from django.db import OperationalError
+from purepool.interface.formats import SolutionString
+from purepool.models.miner.models import Miner, Worker, get_worker_miner_id
+from purepool.models.solution.models import Solution, Work, RejectedSolution
+from purepool.models.solution.tasks import process_solution, process_solution_batch, BibleHashWrong, TransactionTampered
+from purepool.models.solution.rejections import reset_rejection_counter
+from purepool.core.metrics import get_metrics, reset_metrics
+from biblepay.nodes import NoNodeAvailable, CircuitOpen
+from purepool.models.solution.validator import SolutionWriter, ValidatorService, avalidate_solution, aprocess_solution, decode_task_message, run_in_thread
+from tests.models.solution import test_tasks
+
+class FakeAsyncClient(object):
+
+    def __init__(self, bible_hash, coinbase, pinfo):
+        self.bible_hash_result = bible_hash
+        self.coinbase = coinbase
+        self.pinfo_result = pinfo
+        self.calls = 0
+
+    async def bible_hash(self, *args):
+        self.calls += 1
+        return self.bible_hash_result
+
+    async def hexblocktocoinbase(self, block_hex, transaction_hex):
+        self.calls += 1
+        return self.coinbase
+
+    async def pinfo(self):
+        self.calls += 1
+        return self.pinfo_result
+
+class decode_task_messageTestCase(TestCase):
+
+    def test_protocols(self):
+        self.assertEqual(
+            decode_task_message([['main', 'abc'], {}, {}], {'task': process_solution.name}),
+            (process_solution.name, ['main', 'abc'], {}),
+        )
+        self.assertEqual(
+            decode_task_message({'task': process_solution.name, 'args': [], 'kwargs': {'network': 'main'}}, {}),
+            (process_solution.name, [], {'network': 'main'}),
+        )
+
+@override_settings(POOL_ADDRESS={'test': 'yhVPf12UvK8zYgZwS6kLsPmtccHUQiD3Q9'})
+class avalidate_solutionTestCase(TestCase):
+
+    def setUp(self):
+        # the solution of the validate_solution tests
+        test_tasks.validate_solutionTestCase.setUp(self)
+
+        # the chain tip is cached by the validation
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        self.work = Work(pk='b0181b3a-9868-4139-bef5-8c7e5d4239f4', hash_target="0000001111000000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1", network="test")
+        self.work.save()
+
+        # the miner of the worker is read in another thread, that can not
+        # see the rows of the test transaction
+        get_worker_miner_id(self.worker.id)
+
+        self.coinbase = {'recipient': 'ignored', 'cpid_sig_valid': True, 'cpid_legal': True}
+
+    async def test_valid(self):
+        client = FakeAsyncClient(self.solution_string.get_bible_hash(), self.coinbase, {'pinfo': 999999, 'height': 19309})
+        self.assertTrue(await avalidate_solution('test', self.solution_string, client, work=self.work))
+        self.assertEqual(client.calls, 3)
+
+        # the chain tip is cached now
+        self.assertTrue(await avalidate_solution('test', self.solution_string, client, work=self.work))
+        self.assertEqual(client.calls, 5)
+
+        # provisionally, only the tip is needed
+        self.assertTrue(await avalidate_solution('test', self.solution_string, client, work=self.work, full=False))
+        self.assertEqual(client.calls, 5)
+
+    async def test_invalid(self):
+        client = FakeAsyncClient('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a12', self.coinbase, {'pinfo': 999999, 'height': 19309})
+        with self.assertRaises(BibleHashWrong):
+            await avalidate_solution('test', self.solution_string, client, work=self.work)
+
+        client = FakeAsyncClient(self.solution_string.get_bible_hash(), self.coinbase, {'pinfo': 10, 'height': 19309})
+        with self.assertRaises(TransactionTampered):
+            await avalidate_solution('test', self.solution_string, client, work=self.work)
+
+class ValidatorTransactionTestCase(TransactionTestCase):
+    """ the database is written in other threads, so the rows must be committed """
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+        reset_rejection_counter()
+        self.addCleanup(reset_rejection_counter)
+
+        self.miner = Miner.objects.create()
+        self.worker = Worker.objects.create(miner=self.miner)
+        self.work = Work.objects.create(hash_target="0000000111100000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1", network="test")
+
+    def get_solution(self, bible_hash):
+        solution_string = SolutionString()
+        solution_string.content = {
+            'transaction_hex': 'TransHex',
+            'thread_hash_counter': '332694',
+            'prev_block_time': '1518041437',
+            'prev_height': '19309',
+            'nonce': '14217',
+            'block_hash': 'ABCD',
+            'miner_id': self.miner.id,
+            'work_id': self.work.id,
+            'block_time': '1518041523',
+            'thread_id': '0',
+            'timer_start': '1518037739857',
+            'thread_start': '1518040817888',
+            'bible_hash': bible_hash,
+            'hash_counter': '1769512',
+            'timer_end': '1518041527556',
+            'block_hex': 'BlockHex'}
+        return solution_string.as_string()
+
+class SolutionWriterTestCase(ValidatorTransactionTestCase):
+
+    def get_row(self, i):
+        return Solution(work=self.work, miner=self.miner, network='test', bible_hash='%064d' % i)
+
+    async def test_flush_size(self):
+        writer = SolutionWriter(max_size=3, max_delay=60)
+
+        await asyncio.gather(*[writer.add(self.get_row(i)) for i in range(0, 3)])
+        self.assertEqual(await Solution.objects.acount(), 3)
+
+    async def test_flush_delay(self):
+        writer = SolutionWriter(max_size=100, max_delay=0.05)
+
+        start = time.monotonic()
+        await asyncio.gather(writer.add(self.get_row(1)), writer.add(self.get_row(2), self.get_row(3)))
+        self.assertGreaterEqual(time.monotonic() - start, 0.05)
+        self.assertEqual(await Solution.objects.acount(), 3)
+
+        # a known bible hash does not fail the others
+        await writer.add(self.get_row(1), self.get_row(4))
+        self.assertEqual(await Solution.objects.acount(), 4)
+
+    async def test_close(self):
+        writer = SolutionWriter(max_size=100, max_delay=60)
+
+        task = asyncio.ensure_future(writer.add(self.get_row(1)))
+        await asyncio.sleep(0)
+        self.assertTrue(writer.is_pending('%064d' % 1))
+
+        await writer.close()
+        await task
+        self.assertEqual(await Solution.objects.acount(), 1)
+        self.assertFalse(writer.is_pending('%064d' % 1))
+
+class aprocess_solutionTestCase(ValidatorTransactionTestCase):
+
+    async def test_process(self):
+        writer = SolutionWriter(max_size=100, max_delay=0.01)
+        solution_s = self.get_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11')
+
+        with mock.patch('purepool.models.solution.validator.avalidate_solution', return_value=True):
+            self.assertTrue(await aprocess_solution('test', solution_s, None, writer))
+
+            # the second time, the bible hash is known
+            self.assertFalse(await aprocess_solution('test', solution_s, None, writer))
+
+        solution = await Solution.objects.aget()
+        self.assertEqual(solution.work_id, self.work.id)
+        self.assertEqual(solution.hps, 467)
+
+        solution_s = self.get_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a12')
+        with mock.patch('purepool.models.solution.validator.avalidate_solution', side_effect=BibleHashWrong):
+            self.assertFalse(await aprocess_solution('test', solution_s, None, writer))
+
+        rejected = await RejectedSolution.objects.aget()
+        self.assertEqual(rejected.exception_type, 'BibleHashWrong')
+        self.assertEqual(rejected.solution, solution_s)
+
+    @override_settings(POOL_METRICS_FLUSH_SECONDS=0)
+    async def test_shed(self):
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+
+        writer = SolutionWriter(max_size=100, max_delay=0.01)
+        solution_s = self.get_solution('0000000e5bced1fccc7110dfd386cf461b82852ce4eec5e124ca8f5e5bcc5a11')
+
+        # biblepayd did not answer, or the breaker is open. Not the fault of the miner
+        for error in (asyncio.TimeoutError(), NoNodeAvailable(), CircuitOpen()):
+            with mock.patch('purepool.models.solution.validator.avalidate_solution', side_effect=error):
+                self.assertFalse(await aprocess_solution('test', solution_s, None, writer))
+
+        with mock.patch('purepool.models.solution.validator.is_circuit_open', return_value=True):
+            self.assertFalse(await aprocess_solution('test', solution_s, None, writer))
+
+        self.assertEqual(await RejectedSolution.objects.acount(), 0)
+        self.assertEqual(await Solution.objects.acount(), 0)
+        self.assertEqual(get_metrics()['solutions_shed'], 4)
+
+class ValidatorServiceTestCase(ValidatorTransactionTestCase):
+
+    async def test_consume(self):
+        app = Celery('test', broker='memory://')
+
+        solutions = [self.get_solution('%064d' % i) for i in range(0, 5)]
+        app.send_task(process_solution.name, args=['test', solutions[0]], queue='standard')
+        app.send_task(process_solution_batch.name, args=['test', solutions[1:]], queue='standard')
+
+        service = ValidatorService(app, 'standard', in_flight=10, flush_size=100, flush_delay=0.01)
+        validated = []
+
+        async def fake_validate(network, solution_string, client, work=None, full=True):
+            validated.append(solution_string.get_bible_hash())
+            return True
+
+        with mock.patch('purepool.models.solution.validator.avalidate_solution', side_effect=fake_validate):
+            main = asyncio.ensure_future(service.main())
+
+            # both messages are done
+            for i in range(0, 100):
+                if service.handled == 2:
+                    break
+                await asyncio.sleep(0.05)
+
+            service.stop()
+            await main
+
+        self.assertEqual(len(validated), 5)
+        self.assertEqual(await Solution.objects.acount(), 5)
+
+        # the messages were acknowledged
+        with app.connection_for_read() as connection:
+            self.assertIsNone(app.amqp.queues['standard'](connection.default_channel).get())
+
+    @mock.patch('purepool.models.solution.validator.DATABASE_RETRY_SECONDS', 0)
+    async def test_database_error(self):
+        app = Celery('test', broker='memory://')
+        app.send_task(process_solution.name, args=['test', self.get_solution('%064d' % 1)], queue='standard')
+
+        service = ValidatorService(app, 'standard', in_flight=10, flush_size=100, flush_delay=0.01)
+
+        # the database connection was lost the first time
+        with mock.patch('purepool.models.solution.validator.aprocess_solution', side_effect=[OperationalError(), True]) as mock_aprocess_solution:
+            main = asyncio.ensure_future(service.main())
+
+            for i in range(0, 100):
+                if service.handled == 2:
+                    break
+                await asyncio.sleep(0.05)
+
+            service.stop()
+            await main
+
+        # the message was handled again
+        self.assertEqual(mock_aprocess_solution.call_count, 2)
+        with app.connection_for_read() as connection:
+            self.assertIsNone(app.amqp.queues['standard'](connection.default_channel).get())
+
+    async def test_connections(self):
+        # the connections of the threads are checked before and after
+        with mock.patch('purepool.models.solution.validator.close_old_connections') as mock_close_old_connections:
+            self.assertEqual(await run_in_thread(lambda: mock_close_old_connections.call_count), 1)
+        self.assertEqual(mock_close_old_connections.call_count, 2)
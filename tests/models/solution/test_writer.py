@@ -0,0 +1,106 @@
+import time
+import uuid
+from django.test import TestCase, TransactionTestCase, override_settings
+from purepool.models.miner.models import Miner, Worker
+from purepool.models.solution.models import Solution, SolutionHash, Work, RejectedSolution
+from purepool.models.solution.writer import BulkWriter, write_solutions
+from purepool.core.metrics import get_metrics, reset_metrics
+
+class WriterTestMixin(object):
+
+    def create_work(self):
+        self.miner = Miner.objects.create()
+        self.worker = Worker.objects.create(miner=self.miner)
+        self.work = Work.objects.create(hash_target="0000000111100000000000000000000000000000000000000000000000000000", worker=self.worker, ip="1.1.1.1", network="test")
+
+    def wait_for_rows(self, count):
+        for i in range(0, 100):
+            if Solution.objects.count() == count:
+                break
+            time.sleep(0.01)
+
+    def get_row(self, i, work_id=None):
+        return Solution(work_id=work_id or self.work.id, miner=self.miner, network='test', bible_hash='%064d' % i)
+
+class write_solutionsTestCase(WriterTestMixin, TestCase):
+
+    def setUp(self):
+        self.create_work()
+
+    def test_conflicts(self):
+        write_solutions([self.get_row(1)])
+
+        # the known bible hash is skipped, the others are written
+        rejected = RejectedSolution(work=self.work, miner=self.miner, network='test', bible_hash='%064d' % 2, exception_type='BibleHashWrong')
+        write_solutions([self.get_row(1), self.get_row(2), self.get_row(3), rejected])
+
+        self.assertEqual(Solution.objects.count(), 3)
+        self.assertEqual(RejectedSolution.objects.count(), 1)
+
+    @override_settings(POOL_PARTITIONING=True)
+    def test_partitioning(self):
+        # the partitioned table would take the known hash again, SolutionHash does not
+        SolutionHash.objects.create(bible_hash='%064d' % 1, claim=uuid.uuid4())
+
+        write_solutions([self.get_row(1), self.get_row(2), self.get_row(2), self.get_row(3)])
+
+        self.assertEqual(sorted(Solution.objects.values_list('bible_hash', flat=True)), ['%064d' % 2, '%064d' % 3])
+        self.assertEqual(SolutionHash.objects.count(), 3)
+
+class BulkWriterTestCase(WriterTestMixin, TransactionTestCase):
+    """ the rows are written by the thread of the writer, so they must be committed.
+        sqlite also checks the foreign keys only on commit """
+
+    def setUp(self):
+        self.create_work()
+
+    @override_settings(POOL_METRICS_FLUSH_SECONDS=0)
+    def test_broken_row(self):
+        reset_metrics()
+        self.addCleanup(reset_metrics)
+
+        # the row with an unknown work can not be written, but the others are
+        write_solutions([self.get_row(1), self.get_row(2, work_id=uuid.uuid4()), self.get_row(3)])
+
+        self.assertEqual(sorted(Solution.objects.values_list('bible_hash', flat=True)), ['%064d' % 1, '%064d' % 3])
+        self.assertEqual(get_metrics()['solutions_write_failed'], 1)
+
+    def test_max_size(self):
+        writer = BulkWriter(max_size=3, max_delay=60)
+        self.addCleanup(writer.stop)
+
+        writer.add(self.get_row(1))
+        writer.add(self.get_row(2))
+        self.assertTrue(writer.is_pending('%064d' % 1))
+        self.assertEqual(Solution.objects.count(), 0)
+
+        writer.add(self.get_row(3))
+        self.wait_for_rows(3)
+        self.assertEqual(Solution.objects.count(), 3)
+        self.assertFalse(writer.is_pending('%064d' % 1))
+
+    def test_max_delay(self):
+        writer = BulkWriter(max_size=100, max_delay=0.01)
+        self.addCleanup(writer.stop)
+
+        writer.add(self.get_row(1), self.get_row(2))
+        self.wait_for_rows(2)
+        self.assertEqual(Solution.objects.count(), 2)
+
+    def test_stop(self):
+        writer = BulkWriter(max_size=100, max_delay=60)
+
+        writer.add(self.get_row(1))
+        writer.stop()
+        self.assertEqual(Solution.objects.count(), 1)
+
+        # after the stop, rows are written at once
+        writer.add(self.get_row(2))
+        self.assertEqual(Solution.objects.count(), 2)
+
+    def test_single(self):
+        writer = BulkWriter(max_size=1, max_delay=60)
+
+        writer.add(self.get_row(1))
+        self.assertEqual(Solution.objects.count(), 1)
+        self.assertIsNone(writer.thread)